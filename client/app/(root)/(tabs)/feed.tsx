@@ -116,56 +116,65 @@ const Feed = () => {
   const [refreshing, setRefreshing] = useState<boolean>(false);
   const [followVisible, setFollowVisible] = useState<boolean>(false);
 
-  const processFollowingReviews = (userData: any) => {
-    if (!userData?.following) return [];
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
 
-    const allReviews: Review[] = [];
-
-    console.log("User Data: ", userData);
-
-    userData.following.forEach((followedUser: any) => {
-      if (followedUser.reviews) {
-        console.log("Followed User Reviews: ", followedUser.reviews);
-        followedUser.reviews.forEach((review: Review) => {
-          allReviews.push({
-            ...review,
-            image: review.image,
-            username: followedUser.username,
-            user_id: followedUser.id,
-          });
-        });
-      }
-    });
-
-    allReviews.sort((a, b) => {
-      const dateA = new Date(a.updated_at).getTime();
-      const dateB = new Date(b.updated_at).getTime();
-      return dateB - dateA;
-    });
-
-    console.log("All user: ", allReviews);
-    return allReviews;
-  };
+  const fetchFeedPage = useCallback(
+    async (cursor?: string | null) => {
+      const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      return fetchAPI(
+        `${process.env.EXPO_PUBLIC_BACKEND_URL}/feed/${clerkUser?.id}${params}`
+      );
+    },
+    [clerkUser?.id]
+  );
 
   const getUser = useCallback(async () => {
     setLoading(true);
     try {
-      const userResponse = await fetchAPI(
-        `${process.env.EXPO_PUBLIC_BACKEND_URL}/profile/${clerkUser?.id}`
-      );
-      console.log("user response: ", userResponse.data[0].following);
+      const [userResponse, feedResponse] = await Promise.all([
+        fetchAPI(
+          `${process.env.EXPO_PUBLIC_BACKEND_URL}/profile/${clerkUser?.id}`
+        ),
+        fetchFeedPage(),
+      ]);
       if (userResponse?.data[0]) {
         setUser(userResponse.data[0]);
       }
-      const processedReviews = processFollowingReviews(userResponse.data[0]);
-      setFollowingReviews(processedReviews);
-      console.log("Processed Reviews: ", processedReviews);
+      setFollowingReviews(feedResponse.data);
+      setNextCursor(feedResponse.next_cursor);
     } catch (err) {
-      console.error("Error fetching or inserting place:", err);
+      console.error("Error fetching feed:", err);
       setError(true);
     }
     setLoading(false);
-  }, [clerkUser?.id]);
+  }, [clerkUser?.id, fetchFeedPage]);
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const feedResponse = await fetchFeedPage(nextCursor);
+      setFollowingReviews((reviews) => [
+        ...(reviews || []),
+        ...feedResponse.data,
+      ]);
+      setNextCursor(feedResponse.next_cursor);
+    } catch (err) {
+      console.error("Error fetching more reviews:", err);
+    }
+    setLoadingMore(false);
+  }, [nextCursor, loadingMore, fetchFeedPage]);
+
+  const onScroll = ({ nativeEvent }: any) => {
+    const { layoutMeasurement, contentOffset, contentSize } = nativeEvent;
+    if (
+      layoutMeasurement.height + contentOffset.y >=
+      contentSize.height - 400
+    ) {
+      loadMore();
+    }
+  };
 
   const onRefresh = useCallback(async () => {
     setRefreshing(true);
@@ -212,6 +221,8 @@ const Feed = () => {
 
       <ScrollView
         className="flex-1"
+        onScroll={onScroll}
+        scrollEventThrottle={200}
         refreshControl={
           <RefreshControl refreshing={refreshing} onRefresh={onRefresh} />
         }
@@ -250,6 +261,7 @@ const Feed = () => {
               </TouchableOpacity>
             </View>
           )}
+          {loadingMore && <ActivityIndicator color="#6366f1" />}
         </View>
       </ScrollView>
       <FollowerModal
@@ -14,7 +14,7 @@ import {
 } from "react-native";
 import { SafeAreaView } from "react-native-safe-area-context";
 
-import { useFetch } from "@/lib/fetch";
+import { backendFetch, useFetch } from "@/lib/fetch";
 
 const Profile = () => {
   const { user } = useUser();
@@ -32,8 +32,8 @@ const Profile = () => {
   );
   const [newBio, setNewBio] = useState(userResult?.[0]?.bio ?? "");
 
-  const followersCount = userResult?.[0]?.followers?.length ?? 0;
-  const followingCount = userResult?.[0]?.following?.length ?? 0;
+  const followersCount = userResult?.[0]?.follower_count ?? 0;
+  const followingCount = userResult?.[0]?.following_count ?? 0;
 
   const onRefresh = useCallback(async () => {
     setRefreshing(true);
@@ -52,7 +52,7 @@ const Profile = () => {
     image_url?: string;
   }) => {
     try {
-      const response = await fetch(
+      const response = await backendFetch(
         `${process.env.EXPO_PUBLIC_BACKEND_URL}/profile/update`,
         {
           method: "PUT",
@@ -30,7 +30,7 @@ import type { Place } from "@/components/Map";
 import CustomButton from "@/components/CustomButton";
 import { fetchPhotoUrl } from "@/components/Map";
 import { icons } from "@/constants";
-import { fetchAPI } from "@/lib/fetch";
+import { backendFetch, fetchAPI } from "@/lib/fetch";
 
 export interface NeonPlace {
   id: number;
@@ -68,6 +68,9 @@ export interface User {
   image_url: string;
   followers: string;
   following: string;
+  follower_count?: number;
+  following_count?: number;
+  is_following?: boolean;
 }
 
 interface Match {
@@ -180,6 +183,22 @@ const PlaceView = () => {
     setSelectedRating(index);
   };
 
+  // The profile only embeds the first page of reviews, the binary search needs all
+  // of them in ranking order
+  const fetchRankedReviews = useCallback(async () => {
+    const reviews: Review[] = [];
+    let cursor: string | null = null;
+    do {
+      const params = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
+      const page = await fetchAPI(
+        `${process.env.EXPO_PUBLIC_BACKEND_URL}/profile/${user?.id}/reviews?order=rating&limit=100${params}`
+      );
+      reviews.push(...page.data);
+      cursor = page.next_cursor;
+    } while (cursor);
+    return reviews;
+  }, [user?.id]);
+
   const calibrateSearch = (
     result: string,
     teamOne: number | null,
@@ -248,7 +267,7 @@ const PlaceView = () => {
     console.log("Api Info: ", apiInfo);
 
     try {
-      const rawResponse = await fetch(
+      const rawResponse = await backendFetch(
         `${process.env.EXPO_PUBLIC_BACKEND_URL ?? ""}/process-matches`,
         {
           method: "POST",
@@ -335,6 +354,7 @@ const PlaceView = () => {
             setError(true);
             return;
           }
+          userResult.data[0].reviews = await fetchRankedReviews();
 
           // Calibrate Bin search index
           setLeftBound(0);
@@ -354,6 +374,7 @@ const PlaceView = () => {
             setError(true);
             return;
           }
+          userResult.data[0].reviews = await fetchRankedReviews();
 
           const foundReview = userResult.data[0].reviews.find(
             (review: Review) => review.place_id === result.data[0]?.id
@@ -384,7 +405,7 @@ const PlaceView = () => {
       }
       setLoading(false);
     },
-    [setCurrentPlace, user?.id]
+    [setCurrentPlace, user?.id, fetchRankedReviews]
   );
 
   useEffect(() => {
@@ -50,7 +50,7 @@ const FollowerModal = ({
   const debouncedSearchQuery = useDebounce(searchQuery, 500);
 
   const { data: suggestions, loading: suggestionsLoading } = useFetch<User[]>(
-    `${process.env.EXPO_PUBLIC_BACKEND_URL}/users`
+    `${process.env.EXPO_PUBLIC_BACKEND_URL}/users/${user?.id ?? 0}/suggestions?limit=3`
   );
 
   // Initialize follow status whenever users list changes
@@ -61,6 +61,10 @@ const FollowerModal = ({
       const newFollowStatus: Record<number, boolean> = {};
       users.forEach((displayUser) => {
         try {
+          if (typeof displayUser.is_following === "boolean") {
+            newFollowStatus[displayUser.id] = displayUser.is_following;
+            return;
+          }
           const followers: User[] =
             typeof displayUser.followers === "string"
               ? JSON.parse(displayUser.followers)
@@ -128,7 +132,7 @@ const FollowerModal = ({
     try {
       setLoading(true);
       const searchResult = await fetchAPI(
-        `${process.env.EXPO_PUBLIC_BACKEND_URL}/users/search?username=${query}`
+        `${process.env.EXPO_PUBLIC_BACKEND_URL}/users/search?username=${encodeURIComponent(query)}&viewer_id=${user?.id ?? ""}`
       );
       setSearchResults(searchResult || []);
     } catch (error) {
@@ -137,7 +141,7 @@ const FollowerModal = ({
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [user?.id]);
 
   useEffect(() => {
     handleSearch(debouncedSearchQuery);
@@ -1,8 +1,30 @@
 import { useState, useEffect, useCallback } from "react";
 
+// Position of this client's last write. Sending it back keeps our reads on a database
+// replica that has caught up with it, so we always see our own updates.
+let readAfter: { token: string; expires: number } | null = null;
+const READ_AFTER_MS = 60_000;
+
+export const backendFetch = async (url: string, options?: RequestInit) => {
+  const headers = new Headers(options?.headers);
+  if (readAfter && readAfter.expires > Date.now()) {
+    headers.set("X-Read-After", readAfter.token);
+  }
+  const response = await fetch(url, { ...options, headers });
+  const token = response.headers.get("X-Read-After");
+  if (token) {
+    readAfter = { token, expires: Date.now() + READ_AFTER_MS };
+  }
+  return response;
+};
+
 export const fetchAPI = async (url: string, options?: RequestInit) => {
   try {
-    const response = await fetch(url, options);
+    const backendUrl = process.env.EXPO_PUBLIC_BACKEND_URL;
+    const response =
+      backendUrl && url.startsWith(backendUrl)
+        ? await backendFetch(url, options)
+        : await fetch(url, options);
     if (!response.ok) {
       new Error(`HTTP error! status: ${response.status}`);
     }
@@ -1,21 +1,111 @@
-from quart import Quart
+import asyncio
+import logging
+import time
+from quart import Quart, g, request
 from config import Config
-from app.db import NeonDB
+from app.db import BUS, NeonDB, format_lsn, parse_lsn, read_after, track_queries
+from app.utils.metrics import REGISTRY
+from app.utils.serialization import OrjsonProvider
+from app.services.ranking_service import RankingService
+from app.services.geo_service import GeoService
+from app.services.search_service import SearchService
+from app.services.graph_service import GraphService
+from app.services.place_filter_service import PlaceFilterService
+
+# Queries per request
+_QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUESTS = REGISTRY.counter('http_requests_total', 'Requests served', ('method', 'route', 'status'))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time to produce a response', ('method', 'route')
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries', 'Statements run per request', ('route',), _QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_SECONDS = REGISTRY.histogram(
+    'http_request_db_seconds', 'Time spent running statements per request', ('route',)
+)
 
 def create_app():
+    logging.basicConfig(level=Config.LOG_LEVEL)
     app = Quart(__name__)
     app.config.from_object(Config)
+    app.json = OrjsonProvider(app)
     
+    from app.routes.api import api_bp, vote_queue
+    from app.commands import register_commands
+
     @app.before_serving
     async def startup():
-        await NeonDB.get_pool()
+        await NeonDB.open()
+        if app.config['INVALIDATION_ENABLED']:
+            # Listen before loading, so changes committed meanwhile aren't missed
+            await BUS.start(app.config['DATABASE_URL'])
+        await RankingService.load()
+        await GeoService.load()
+        await SearchService.load()
+        await GraphService.load()
+        if app.config['PLACE_FILTER_ENABLED']:
+            await PlaceFilterService.load()
+        if app.config['INGEST_MODE'] == 'async':
+            await vote_queue.start()
 
     @app.after_serving
     async def shutdown():
+        # Apply whatever is still queued before the pool goes away
+        await vote_queue.stop()
+        await BUS.stop()
         await NeonDB.close_pool()
 
-    from app.routes.api import api_bp
+    @app.before_request
+    async def start_request_metrics():
+        if app.config['METRICS_ENABLED']:
+            g.request_started = time.perf_counter()
+            g.request_queries = track_queries(
+                request.url_rule.rule if request.url_rule else 'unmatched'
+            )
+
+    @app.before_request
+    async def apply_read_token():
+        # Clients send back the position of their last write, as a header or cookie
+        token = request.headers.get('X-Read-After') or request.cookies.get('read_after')
+        if token:
+            try:
+                read_after(parse_lsn(token))
+            except ValueError:
+                pass
+
+    @app.after_request
+    async def record_request_metrics(response):
+        # Registered before the other after_request hooks so it runs after them, and
+        # counts their queries. Streamed bodies are timed up to their first byte.
+        started = g.get('request_started')
+        if started is None:
+            return response
+        # asyncpg reports statements with call_soon, let the last ones land
+        await asyncio.sleep(0)
+        queries = g.request_queries
+        REQUESTS.inc(method=request.method, route=queries.route, status=response.status_code)
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started, method=request.method, route=queries.route
+        )
+        REQUEST_QUERIES.observe(queries.count, route=queries.route)
+        REQUEST_QUERY_SECONDS.observe(queries.seconds, route=queries.route)
+        return response
+
+    @app.after_request
+    async def issue_read_token(response):
+        # A 202 only queued the write, a token taken now would not cover it
+        if NeonDB.has_replicas() and request.method not in ('GET', 'HEAD', 'OPTIONS') \
+                and 200 <= response.status_code < 300 and response.status_code != 202:
+            token = format_lsn(await NeonDB.current_position())
+            response.headers['X-Read-After'] = token
+            response.set_cookie(
+                'read_after', token, max_age=app.config['READ_YOUR_WRITES_SECONDS'], httponly=True
+            )
+        return response
 
     app.register_blueprint(api_bp)
+    register_commands(app)
 
     return app
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import click
+from app.db import NeonDB
+from app.db import migrations
+from app.db.plans import CHECKED_MODULES, check_plans, collect_statements
+from app.services.rating_service import RatingService
+from app.services.replay_service import ReplayService
+
+def register_commands(app):
+    @app.cli.command('repair-ratings')
+    @click.option('--dry-run', is_flag=True, help='Only report places whose aggregates drifted')
+    def repair_ratings(dry_run):
+        """Verify places' running rating aggregates against their reviews and repair drift"""
+        async def run():
+            rating_service = RatingService()
+            try:
+                drifted = await rating_service.repair_rating_aggregates(dry_run=dry_run)
+                if drifted and not dry_run:
+                    await rating_service.update_rankings()
+                return drifted
+            finally:
+                await NeonDB.close_pool()
+
+        drifted = asyncio.run(run())
+        for place_id, avg_rating in sorted(drifted.items()):
+            click.echo(f"place {place_id}: avg_rating {avg_rating:.4f}")
+        verb = 'drifted' if dry_run else 'repaired'
+        click.echo(f"{len(drifted)} place(s) {verb}")
+
+    @app.cli.command('replay-ratings')
+    @click.option('--k-min', type=float, default=None, help='Override DynamicEloSystem k_min')
+    @click.option('--k-max', type=float, default=None, help='Override DynamicEloSystem k_max')
+    @click.option('--decay-rate', type=float, default=None, help='Override DynamicEloSystem decay_rate')
+    @click.option('--uncertainty/--no-uncertainty', default=None, help='Override ELO_UNCERTAINTY')
+    @click.option('--workers', type=int, default=None, help='Size of the process pool')
+    @click.option('--batch-size', type=int, default=50000, help='Events fetched per cursor round trip')
+    @click.option('--dry-run', is_flag=True, help='Rebuild ratings without writing them back')
+    def replay_ratings(k_min, k_max, decay_rate, uncertainty, workers, batch_size, dry_run):
+        """
+        Rebuild every place's current ELO rating, comparison count and rating deviation
+        by replaying the match event log from the baseline rating. Votes applied while
+        the replay runs are overwritten.
+        """
+        elo_params = {
+            name: value
+            for name, value in (
+                ('k_min', k_min), ('k_max', k_max), ('decay_rate', decay_rate),
+                ('uncertainty', uncertainty),
+            )
+            if value is not None
+        }
+
+        async def run():
+            try:
+                return await ReplayService(elo_params, workers, batch_size).replay(dry_run=dry_run)
+            finally:
+                await NeonDB.close_pool()
+
+        summary = asyncio.run(run())
+        click.echo(
+            f"Replayed {summary['events']} events over {summary['places']} places "
+            f"in {summary['components']} components"
+        )
+        click.echo(f"Mean absolute rating change: {summary['mean_abs_change']:.4f}")
+        if dry_run:
+            click.echo("Dry run, ratings were not written")
+
+    @app.cli.command('migrate')
+    @click.option('--target', default=None, help='Stop after this version, e.g. 0008')
+    @click.option('--status', 'show_status', is_flag=True, help='List migrations and whether they were applied')
+    @click.option('--dry-run', is_flag=True, help='List the migrations that would be applied')
+    @click.option('--fake', is_flag=True, help='Record pending migrations as applied without running them')
+    def migrate(target, show_status, dry_run, fake):
+        """Apply pending schema migrations from migrations/ in order"""
+        async def run():
+            try:
+                async with NeonDB.connection() as conn:
+                    if show_status:
+                        return await migrations.status(conn)
+                    return await migrations.migrate(conn, target=target, dry_run=dry_run, fake=fake)
+            finally:
+                await NeonDB.close_pool()
+
+        result = asyncio.run(run())
+        if show_status:
+            for row in result:
+                applied_at = f" {row['applied_at']:%Y-%m-%d %H:%M}" if row['applied_at'] else ''
+                click.echo(f"{row['state']:<8} {row['name']}{applied_at}")
+            return
+
+        for migration in result:
+            click.echo(migration.name)
+        verb = 'would be applied' if dry_run else 'recorded' if fake else 'applied'
+        click.echo(f"{len(result)} migration(s) {verb}")
+
+    @app.cli.command('check-plans')
+    @click.option('--module', 'modules', multiple=True, help='Module to check, repeatable')
+    @click.option('--verbose', is_flag=True, help='Also list statements that passed')
+    def check_plans_command(modules, verbose):
+        """
+        EXPLAIN every statement in the hot modules and fail if any is planned with a
+        sequential scan. Run it against a migrated database with data in it.
+        """
+        statements, skipped = collect_statements(modules or CHECKED_MODULES)
+
+        async def run():
+            try:
+                async with NeonDB.connection() as conn:
+                    return await check_plans(conn, statements)
+            finally:
+                await NeonDB.close_pool()
+
+        results = asyncio.run(run())
+        failed = [r for r in results if not r.ok]
+        for result in results:
+            location = result.statement.location
+            if result.error:
+                click.echo(f"ERROR     {location}: {result.error}")
+            elif result.seq_scans:
+                click.echo(f"SEQ SCAN  {location}: {', '.join(result.seq_scans)}")
+            elif verbose:
+                click.echo(f"ok        {location}")
+        for location, reason in skipped:
+            click.echo(f"skipped   {location}: {reason}")
+
+        click.echo(
+            f"{len(results)} statement(s) checked, {len(failed)} failed, "
+            f"{len(skipped)} could not be resolved"
+        )
+        if failed:
+            sys.exit(1)
@@ -1,11 +1,77 @@
+import asyncio
+import logging
 import os
 import asyncpg
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+from app.db.notify import BUS
+from app.db.pool import InstrumentedPool, prepare_statements, register_statement
+from app.db.querylog import log_query, track_queries
+from app.db.replicas import (
+    PositionHistory, Replica, format_lsn, parse_lsn, read_after, required_position
+)
+from app.utils.metrics import REGISTRY
+from config import Config
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = REGISTRY.gauge(
+    'db_pool_connections', 'Pooled connections by state', ('pool', 'state')
+)
+POOL_WAITING = REGISTRY.gauge(
+    'db_pool_waiting', 'Acquires waiting for a free connection', ('pool',)
+)
+
+async def _init_connection(conn) -> None:
+    if Config.DB_PREPARE_STATEMENTS:
+        await prepare_statements(conn)
+    # Added after warming, so the warm-up statements aren't counted
+    if Config.METRICS_ENABLED:
+        conn.add_query_logger(log_query)
+
+async def _create_pool(dsn: str, name: str = 'primary') -> InstrumentedPool:
+    # Opens min_size connections, each with the hot statements prepared
+    return await InstrumentedPool(
+        dsn,
+        name=name,
+        min_size=Config.DB_POOL_MIN_SIZE,
+        max_size=Config.DB_POOL_MAX_SIZE,
+        max_queries=Config.DB_MAX_QUERIES,
+        max_inactive_connection_lifetime=Config.DB_MAX_INACTIVE_LIFETIME,
+        setup=None,
+        init=_init_connection,
+        loop=None,
+        connection_class=asyncpg.Connection,
+        record_class=asyncpg.Record,
+        acquire_timeout=Config.DB_ACQUIRE_TIMEOUT,
+        statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE,
+        timeout=Config.DB_CONNECT_TIMEOUT
+    )
+
 class NeonDB:
+    """
+    The primary pool, used for writes, and optional read replica pools.
+
+    Read-only queries go through read_connection(), which picks a healthy replica
+    within REPLICA_MAX_LAG_SECONDS of the primary. A request that carries a
+    read-your-writes position (see read_after) is only served by a replica that has
+    replayed up to it, otherwise by the primary.
+    """
     _pool = None
+    _replicas: List[Replica] = []
+    _history = PositionHistory()
+    _monitor: Optional[asyncio.Task] = None
+    _primary_reads = 0
+
+    # WAL position after the latest local write, for reads that fill shared caches
+    _fence = 0
+    _fence_stale = False
+    _fence_pending: Optional[asyncio.Future] = None
 
     @classmethod
     async def get_pool(cls):
@@ -13,16 +79,174 @@ class NeonDB:
             connection_string = os.getenv('DATABASE_URL')
             if not connection_string:
                 raise ValueError("DATABASE_URL environment variable is not set")
-            cls._pool = await asyncpg.create_pool(
-                connection_string,
-                min_size=1,
-                max_size=10,
-                timeout=30
-            )
+            cls._pool = await _create_pool(connection_string)
         return cls._pool
 
+    @classmethod
+    async def open(cls) -> None:
+        """Open the primary and replica pools and start watching the replicas"""
+        await cls.get_pool()
+        if cls._replicas or not Config.DATABASE_REPLICA_URLS:
+            return
+
+        for i, dsn in enumerate(Config.DATABASE_REPLICA_URLS):
+            cls._replicas.append(Replica(urlparse(dsn).hostname or f'replica-{i}', dsn))
+        await cls.check_replicas()
+        cls._monitor = asyncio.create_task(cls._watch_replicas())
+
+    @classmethod
+    def has_replicas(cls) -> bool:
+        return bool(cls._replicas)
+
+    @classmethod
+    async def current_position(cls) -> int:
+        """The primary's current WAL position, covering every committed write"""
+        async with cls.connection() as conn:
+            return parse_lsn(await conn.fetchval('SELECT pg_current_wal_lsn()::text'))
+
+    @classmethod
+    async def check_replicas(cls) -> None:
+        try:
+            cls._history.add(await cls.current_position())
+        except Exception as e:
+            logger.warning(f"Could not read the primary's WAL position: {e}")
+            return
+
+        async def check(replica: Replica):
+            if replica.pool is None:
+                try:
+                    replica.pool = await _create_pool(replica.dsn, replica.name)
+                except Exception as e:
+                    replica.healthy, replica.error = False, str(e)
+                    logger.warning(f"Could not open replica {replica.name}: {e}")
+                    return
+            await replica.check(cls._history)
+
+        await asyncio.gather(*(check(replica) for replica in cls._replicas))
+
+    @classmethod
+    async def _watch_replicas(cls) -> None:
+        while True:
+            await asyncio.sleep(Config.REPLICA_CHECK_INTERVAL)
+            await cls.check_replicas()
+
+    @classmethod
+    def mark_written(cls) -> None:
+        """Note a committed write, the next cache fill must read at or after it"""
+        cls._fence_stale = True
+
+    @classmethod
+    async def write_fence(cls) -> int:
+        """WAL position covering every write marked so far, shared by concurrent callers"""
+        if not cls._replicas:
+            return 0
+        if cls._fence_pending is not None:
+            return await asyncio.shield(cls._fence_pending)
+        if not cls._fence_stale:
+            return cls._fence
+
+        cls._fence_stale = False
+        cls._fence_pending = asyncio.get_running_loop().create_future()
+        try:
+            cls._fence = await cls.current_position()
+            cls._fence_pending.set_result(cls._fence)
+        except Exception as e:
+            cls._fence_stale = True
+            cls._fence_pending.set_exception(e)
+            cls._fence_pending.exception()
+            raise
+        finally:
+            cls._fence_pending = None
+        return cls._fence
+
+    @classmethod
+    async def _acquire_replica(cls, position: int) -> Tuple[Optional[Replica], Any]:
+        usable = [r for r in cls._replicas if r.usable(Config.REPLICA_MAX_LAG_SECONDS)]
+        # Least busy first
+        usable.sort(key=lambda r: r.pool.get_size() - r.pool.get_idle_size())
+        for replica in usable:
+            try:
+                conn = await replica.pool.acquire()
+            except Exception as e:
+                replica.healthy, replica.error = False, str(e)
+                continue
+            try:
+                if not position or await replica.has_replayed(conn, position):
+                    return replica, conn
+            except Exception as e:
+                replica.healthy, replica.error = False, str(e)
+            await replica.pool.release(conn)
+        return None, None
+
+    @classmethod
+    @asynccontextmanager
+    async def read_connection(cls, conn=None):
+        """
+        Yield the given connection, or one for read-only queries: from a replica when
+        one is usable and has caught up with the request's writes, else the primary
+        """
+        if conn is not None:
+            yield conn
+            return
+
+        replica, acquired = await cls._acquire_replica(required_position())
+        if acquired is None:
+            cls._primary_reads += 1
+            async with cls.connection() as conn:
+                yield conn
+            return
+
+        replica.reads += 1
+        try:
+            yield acquired
+        finally:
+            await replica.pool.release(acquired)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        if cls._pool is None:
+            return {'size': 0}
+        if not cls._replicas:
+            return cls._pool.stats()
+        return {
+            **cls._pool.stats(),
+            'primary_reads': cls._primary_reads,
+            'replicas': [replica.stats() for replica in cls._replicas],
+        }
+
+    @classmethod
+    def _collect_metrics(cls) -> None:
+        POOL_CONNECTIONS.clear()
+        POOL_WAITING.clear()
+        pools = [cls._pool] + [replica.pool for replica in cls._replicas]
+        for pool in filter(None, pools):
+            idle = pool.get_idle_size()
+            POOL_CONNECTIONS.set(idle, pool=pool.name, state='idle')
+            POOL_CONNECTIONS.set(pool.get_size() - idle, pool=pool.name, state='in_use')
+            POOL_WAITING.set(pool.waiting, pool=pool.name)
+
+    @classmethod
+    @asynccontextmanager
+    async def connection(cls, conn=None):
+        """Yield the given connection, or acquire one from the pool if none is given"""
+        if conn is not None:
+            yield conn
+            return
+        pool = await cls.get_pool()
+        async with pool.acquire() as acquired:
+            yield acquired
+
     @classmethod
     async def close_pool(cls):
+        if cls._monitor:
+            cls._monitor.cancel()
+            cls._monitor = None
+        for replica in cls._replicas:
+            if replica.pool is not None:
+                await replica.pool.close()
+        cls._replicas = []
         if cls._pool:
             await cls._pool.close()
-            cls._pool = None
\ No newline at end of file
+            cls._pool = None
+
+REGISTRY.collector(NeonDB._collect_metrics)
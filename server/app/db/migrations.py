@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / 'migrations'
+
+_FILENAME = re.compile(r'^(\d{4})_[\w-]+\.sql$')
+
+# First line of a migration that must run outside a transaction, such as
+# CREATE INDEX CONCURRENTLY. Its statements run one at a time.
+NO_TRANSACTION = '-- migrate: no-transaction'
+
+# Serializes migration runs from concurrent deploys
+_LOCK_KEY = 0x6d696772
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION)
+
+    def statements(self) -> List[str]:
+        """Statements of the file, split on semicolons that end a line"""
+        parts = re.split(r';\s*$', self.sql, flags=re.MULTILINE)
+        statements = []
+        for part in parts:
+            code = '\n'.join(
+                line for line in part.splitlines() if not line.strip().startswith('--')
+            ).strip()
+            if code:
+                statements.append(code)
+        return statements
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """Migration files in version order"""
+    migrations = []
+    for path in sorted(directory.glob('*.sql')):
+        match = _FILENAME.match(path.name)
+        if not match:
+            logger.warning(f"Ignoring {path.name}, migrations are named NNNN_description.sql")
+            continue
+        migrations.append(Migration(match.group(1), path.stem, path.read_text()))
+
+    versions = [m.version for m in migrations]
+    duplicates = sorted({v for v in versions if versions.count(v) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate migration versions: {', '.join(duplicates)}")
+    return migrations
+
+async def _ensure_table(conn) -> None:
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    ''')
+
+async def applied_migrations(conn) -> Dict[str, Dict]:
+    """Recorded migrations by version"""
+    exists = await conn.fetchval("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if not exists:
+        return {}
+    rows = await conn.fetch('SELECT version, name, checksum, applied_at FROM schema_migrations')
+    return {row['version']: dict(row) for row in rows}
+
+async def status(conn, directory: Path = MIGRATIONS_DIR) -> List[Dict]:
+    """Every migration file and whether it was applied, or changed since it was"""
+    applied = await applied_migrations(conn)
+    rows = []
+    for migration in discover(directory):
+        record = applied.get(migration.version)
+        if record is None:
+            state = 'pending'
+        elif record['checksum'] != migration.checksum:
+            state = 'changed'
+        else:
+            state = 'applied'
+        rows.append({
+            'version': migration.version,
+            'name': migration.name,
+            'state': state,
+            'applied_at': record['applied_at'] if record else None,
+        })
+    return rows
+
+async def migrate(
+    conn,
+    target: Optional[str] = None,
+    dry_run: bool = False,
+    fake: bool = False,
+    directory: Path = MIGRATIONS_DIR,
+) -> List[Migration]:
+    """
+    Apply pending migrations in order up to and including target, each in its own
+    transaction together with its schema_migrations record. With fake, only record
+    them, for databases where they were applied by hand.
+
+    Returns the migrations applied, or that would be with dry_run.
+    """
+    migrations = discover(directory)
+    if target is not None and target not in {m.version for m in migrations}:
+        raise ValueError(f"No migration {target}")
+
+    await conn.execute('SELECT pg_advisory_lock($1)', _LOCK_KEY)
+    try:
+        applied = await applied_migrations(conn)
+        pending = [
+            m for m in migrations
+            if m.version not in applied and (target is None or m.version <= target)
+        ]
+        for migration in migrations:
+            record = applied.get(migration.version)
+            if record and record['checksum'] != migration.checksum:
+                logger.warning(f"Migration {migration.name} changed after it was applied")
+        if dry_run or not pending:
+            return pending
+
+        await _ensure_table(conn)
+        for migration in pending:
+            logger.info(f"{'Recording' if fake else 'Applying'} migration {migration.name}")
+            record = (
+                'INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)',
+                migration.version, migration.name, migration.checksum
+            )
+            if fake:
+                await conn.execute(*record)
+            elif migration.transactional:
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await conn.execute(*record)
+            else:
+                for statement in migration.statements():
+                    await conn.execute(statement)
+                await conn.execute(*record)
+        return pending
+    finally:
+        await conn.execute('SELECT pg_advisory_unlock($1)', _LOCK_KEY)
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import asyncpg
+import orjson
+
+from app.utils.metrics import REGISTRY
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+# Tells every worker to drop all of its in-memory state, for changes too large to send
+RESET = 'reset'
+
+_NOTIFY = 'SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload'
+
+MESSAGES_SENT = REGISTRY.counter(
+    'invalidation_messages_sent_total', 'Changes published to the other workers', ('kind',)
+)
+MESSAGES_RECEIVED = REGISTRY.counter(
+    'invalidation_messages_received_total', 'Changes applied from the other workers', ('kind',)
+)
+SEND_FAILURES = REGISTRY.counter(
+    'invalidation_send_failures_total', 'Batches of changes that could not be published'
+)
+RESETS = REGISTRY.counter(
+    'invalidation_resets_total', 'Times this worker dropped its in-memory state to reload it'
+)
+
+Handler = Callable[[List[Any]], None]
+
+class InvalidationBus:
+    """
+    Keeps the in-memory caches and indexes of every worker in step over Postgres
+    LISTEN/NOTIFY.
+
+    A writer updates its own state directly and publishes what it changed as a kind
+    and a list of items, which every other worker hands to the handler subscribed to
+    that kind. Changes published with publish_in() go out with the writer's
+    transaction, so they are only delivered if it commits, and in commit order. The
+    rest are batched and sent from the bus's own connection after the fact.
+
+    Whenever changes may have been lost, because the listening connection dropped or a
+    batch could not be sent, every reset handler runs and the state reloads from the
+    database on its next use.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        # Tells this process's messages apart from the other workers'
+        self.origin = uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, Tuple[Handler, bool]] = {}
+        self._resets: List[Callable[[], None]] = []
+        self._conn: Optional[asyncpg.Connection] = None
+        self._lock = asyncio.Lock()
+        self._pending: List[str] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._lost: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._dropped = False
+        self._syncs: Dict[str, asyncio.Future] = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def _sync_channel(self) -> str:
+        return f'{self.channel}_{self.origin}'
+
+    def subscribe(self, kind: str, handler: Handler, echo: bool = False) -> Handler:
+        """
+        Apply the items of every message of a kind. With echo, this process's own
+        messages are applied again too, so changes end up applied in commit order.
+        """
+        self._handlers[kind] = (handler, echo)
+        return handler
+
+    def on_reset(self, handler: Callable[[], None]) -> Callable[[], None]:
+        self._resets.append(handler)
+        return handler
+
+    def reset(self) -> None:
+        """Drop every subscriber's in-memory state in this process"""
+        RESETS.inc()
+        for handler in self._resets:
+            try:
+                handler()
+            except Exception:
+                logger.exception("Invalidation reset handler failed")
+
+    def _encode(self, kind: str, items: List[Any]) -> List[str]:
+        """Messages of at most MAX_PAYLOAD_BYTES carrying the items, split as needed"""
+        payload = orjson.dumps(
+            {'o': self.origin, 'k': kind, 'i': items}, option=orjson.OPT_SERIALIZE_NUMPY
+        )
+        if len(payload) <= MAX_PAYLOAD_BYTES:
+            return [payload.decode()]
+        if len(items) <= 1:
+            logger.warning(f"A {kind} change is too large to send, resetting every worker instead")
+            return self._encode(RESET, [])
+        middle = len(items) // 2
+        return self._encode(kind, items[:middle]) + self._encode(kind, items[middle:])
+
+    def publish(self, kind: str, items: Iterable[Any] = ()) -> None:
+        """Send a committed change to the other workers with the next batch"""
+        if not self.active:
+            return
+        self._pending.extend(self._encode(kind, list(items)))
+        MESSAGES_SENT.inc(kind=kind)
+        self._wake.set()
+
+    async def publish_in(self, conn, kind: str, items: Iterable[Any] = ()) -> None:
+        """Send a change with conn's transaction, delivered only once it commits"""
+        if not self.active:
+            return
+        await conn.execute(_NOTIFY, self.channel, self._encode(kind, list(items)))
+        MESSAGES_SENT.inc(kind=kind)
+
+    def _receive(self, conn, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = orjson.loads(payload)
+            kind = message['k']
+        except Exception:
+            logger.warning(f"Ignoring malformed invalidation message: {payload[:100]}")
+            return
+
+        own = message.get('o') == self.origin
+        if kind == RESET:
+            if not own:
+                self.reset()
+            return
+        handler, echo = self._handlers.get(kind, (None, False))
+        if handler is None or (own and not echo):
+            return
+
+        MESSAGES_RECEIVED.inc(kind=kind)
+        try:
+            handler(message['i'])
+        except Exception:
+            logger.exception(f"Failed to apply a {kind} change, reloading instead")
+            self.reset()
+
+    def _synced(self, conn, pid: int, channel: str, token: str) -> None:
+        future = self._syncs.pop(token, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def barrier(self) -> asyncio.Future:
+        """
+        A future resolved once every change committed before now has been applied here.
+        Notifications reach a listener in commit order, so once one sent now has come
+        back, so have all the earlier ones. It fails if the connection drops first.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if not self.active:
+            future.set_result(None)
+            return future
+        conn = self._conn
+        if conn is None:
+            future.set_exception(ConnectionError('not connected'))
+            return future
+        token = uuid.uuid4().hex
+        self._syncs[token] = future
+        try:
+            async with self._lock:
+                await conn.execute('SELECT pg_notify($1, $2)', self._sync_channel, token)
+        except BaseException:
+            self._syncs.pop(token, None)
+            raise
+        return future
+
+    async def _connect(self, dsn: str) -> None:
+        conn = await asyncpg.connect(dsn, timeout=Config.DB_CONNECT_TIMEOUT)
+        conn.add_termination_listener(lambda _: self._lost.set())
+        await conn.add_listener(self.channel, self._receive)
+        await conn.add_listener(self._sync_channel, self._synced)
+        self._conn = conn
+
+    async def _listen(self, dsn: str) -> None:
+        """Hold the listening connection open, reconnecting with backoff"""
+        while True:
+            await self._lost.wait()
+            self._conn = None
+            for future in self._syncs.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('connection lost'))
+            self._syncs.clear()
+            # Changes published from now on are missed until listening again
+            self.reset()
+            delay = 1.0
+            while self._conn is None:
+                try:
+                    await self._connect(dsn)
+                except Exception as e:
+                    logger.warning(f"Invalidation listener could not reconnect, retrying in {delay:g}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, Config.INVALIDATION_MAX_BACKOFF)
+            logger.info("Invalidation listener reconnected")
+            self._lost.clear()
+            # State reloaded while disconnected may have missed changes too
+            self.reset()
+            if self._pending:
+                self._wake.set()
+
+    async def _send(self) -> None:
+        """
+        Send what was published since the last batch in one round trip, and check the
+        connection when nothing was, since a dead peer can go unnoticed until written to
+        """
+        delay = 1.0
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), Config.INVALIDATION_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await self._ping()
+                continue
+            self._wake.clear()
+            await self.flush()
+            if not self._dropped:
+                delay = 1.0
+                continue
+            # Retry the owed reset, without spinning on a connection that keeps failing
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, Config.INVALIDATION_MAX_BACKOFF)
+            self._wake.set()
+
+    async def _ping(self) -> None:
+        conn = self._conn
+        if conn is None:
+            return
+        try:
+            async with self._lock:
+                await conn.execute('SELECT 1', timeout=Config.DB_CONNECT_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Invalidation listener connection is unresponsive: {e}")
+            conn.terminate()
+            self._lost.set()
+
+    async def flush(self) -> None:
+        """
+        Send the pending messages. If they can't be sent, the other workers are owed a
+        RESET for what they missed, which stays first in line until a send succeeds.
+        """
+        if not self._pending:
+            return
+        payloads, self._pending = self._pending, []
+        try:
+            if self._conn is None:
+                raise ConnectionError('not connected')
+            async with self._lock:
+                await self._conn.execute(_NOTIFY, self.channel, payloads)
+        except BaseException as e:
+            SEND_FAILURES.inc()
+            logger.warning(f"Could not publish {len(payloads)} invalidation messages: {e!r}")
+            self._dropped = True
+            self._pending[:0] = self._encode(RESET, [])
+            if self._conn is not None and self._conn.is_closed():
+                self._lost.set()
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self._dropped = False
+
+    async def start(self, dsn: str) -> None:
+        """Start listening, before the in-memory state loads so no change is missed"""
+        if self.active:
+            return
+        self._wake = asyncio.Event()
+        self._lost = asyncio.Event()
+        await self._connect(dsn)
+        self._tasks = [
+            asyncio.create_task(self._listen(dsn)),
+            asyncio.create_task(self._send()),
+        ]
+        logger.info(f"Listening for invalidations on {self.channel} as {self.origin}")
+
+    async def stop(self) -> None:
+        if not self.active:
+            return
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+BUS = InvalidationBus(Config.INVALIDATION_CHANNEL)
@@ -0,0 +1,208 @@
+import ast
+import builtins
+import importlib
+import inspect
+import itertools
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Modules on the request path whose statements must be served by indexes
+CHECKED_MODULES = (
+    'app.services.rating_service',
+    'app.services.user_service',
+    'app.services.place_service',
+    'app.services.profile_service',
+    'app.services.feed_service',
+    'app.services.personal_ranking_service',
+    'app.routes.api',
+)
+
+# Comment that marks a statement meant to read a whole table, such as a rebuild
+FULL_SCAN_MARKER = '-- full scan'
+
+_QUERY_METHODS = {'fetch', 'fetchrow', 'fetchval', 'execute', 'executemany', 'cursor', 'prepare'}
+
+@dataclass
+class Statement:
+    module: str
+    function: str
+    line: int
+    sql: str
+
+    @property
+    def location(self) -> str:
+        return f'{self.module}:{self.line} ({self.function})'
+
+@dataclass
+class PlanCheck:
+    statement: Statement
+    seq_scans: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.seq_scans
+
+def _evaluate(node: ast.AST, namespace: Dict[str, Any]) -> Any:
+    return eval(compile(ast.Expression(node), '<sql>', 'eval'), namespace)
+
+class _QueryFinder(ast.NodeVisitor):
+    """
+    Finds connection calls and the SQL they are given, with the enclosing function.
+    SQL built from a function's local variables is resolved for each value the
+    function assigns them, and a lookup in a module-level dict for each of its values.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.namespace = vars(module)
+        self.scope: List[ast.AST] = []
+        self.statements: List[Statement] = []
+        self.skipped: List[Tuple[str, str]] = []
+
+    def _visit_scope(self, node):
+        self.scope.append(node)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_ClassDef = _visit_scope
+
+    def _function(self) -> Optional[ast.AST]:
+        for node in reversed(self.scope):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                return node
+        return None
+
+    def _bindings(self, expr: ast.AST) -> Dict[str, List[Dict[str, Any]]]:
+        """Alternative values of local names the expression uses, by name"""
+        options: Dict[str, List[Dict[str, Any]]] = {}
+        function = self._function()
+        if function is not None:
+            for node in ast.walk(function):
+                if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+                    continue
+                target, value = node.targets[0], node.value
+                pairs = []
+                if isinstance(target, ast.Name):
+                    pairs = [(target, value)]
+                elif isinstance(target, ast.Tuple) and isinstance(value, ast.Tuple):
+                    pairs = list(zip(target.elts, value.elts))
+                try:
+                    binding = {
+                        t.id: _evaluate(v, self.namespace)
+                        for t, v in pairs if isinstance(t, ast.Name)
+                    }
+                except Exception:
+                    continue
+                if binding and all(isinstance(v, str) for v in binding.values()):
+                    for name in binding:
+                        options.setdefault(name, []).append(binding)
+
+        # dict[name] over a module-level dict: one option per key
+        for node in ast.walk(expr):
+            if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Name):
+                try:
+                    mapping = _evaluate(node.value, self.namespace)
+                except Exception:
+                    continue
+                if isinstance(mapping, dict) and node.slice.id not in self.namespace:
+                    options.setdefault(node.slice.id, [{node.slice.id: key} for key in mapping])
+        return options
+
+    def _resolve(self, expr: ast.AST) -> List[str]:
+        try:
+            return [_evaluate(expr, self.namespace)]
+        except NameError:
+            pass
+
+        names = sorted({
+            node.id for node in ast.walk(expr)
+            if isinstance(node, ast.Name) and node.id not in self.namespace
+            and not hasattr(builtins, node.id)
+        })
+        options = self._bindings(expr)
+        missing = [name for name in names if name not in options]
+        if missing:
+            raise NameError(f"name '{missing[0]}' is not resolvable")
+
+        variants = []
+        for combination in itertools.product(*(options[name] for name in names)):
+            namespace = dict(self.namespace)
+            for binding in combination:
+                namespace.update(binding)
+            variants.append(_evaluate(expr, namespace))
+        return list(dict.fromkeys(variants))
+
+    def visit_Call(self, node: ast.Call):
+        if isinstance(node.func, ast.Attribute) and node.func.attr in _QUERY_METHODS and node.args:
+            function = '.'.join(n.name for n in self.scope) or '<module>'
+            try:
+                variants = self._resolve(node.args[0])
+            except Exception as e:
+                location = f"{self.module.__name__}:{node.lineno} ({function})"
+                self.skipped.append((location, f'{type(e).__name__}: {e}'))
+            else:
+                for sql in variants:
+                    if isinstance(sql, str) and sql.strip():
+                        self.statements.append(
+                            Statement(self.module.__name__, function, node.lineno, sql)
+                        )
+        self.generic_visit(node)
+
+def collect_statements(
+    module_names: Iterable[str] = CHECKED_MODULES,
+) -> Tuple[List[Statement], List[Tuple[str, str]]]:
+    """
+    SQL passed to connection methods in the given modules, read from their source.
+    Statements that depend on values only known at run time can't be resolved and are
+    returned as (location, reason) pairs instead.
+    """
+    statements, skipped = [], []
+    for name in module_names:
+        module = importlib.import_module(name)
+        finder = _QueryFinder(module)
+        finder.visit(ast.parse(inspect.getsource(module)))
+        statements.extend(finder.statements)
+        skipped.extend(finder.skipped)
+    return statements, skipped
+
+def seq_scans(plan: Dict[str, Any]) -> List[str]:
+    """Relations read by sequential scans anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name', '?'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+async def check_statement(conn, statement: Statement) -> PlanCheck:
+    """
+    Plan a statement without running it and report the sequential scans in the plan.
+    Sequential scans are priced out, so one that remains means no index can serve it,
+    whatever the size of the tables. Parameters are left out of the plan by using
+    the generic plan.
+    """
+    result = PlanCheck(statement)
+    try:
+        async with conn.transaction(readonly=True):
+            await conn.execute('SET LOCAL enable_seqscan = off')
+            await conn.execute('SET LOCAL plan_cache_mode = force_generic_plan')
+            prepared = await conn.prepare(statement.sql)
+            arguments = ', '.join(['NULL'] * len(prepared.get_parameters()))
+            await conn.execute(f'PREPARE _plan_check AS {statement.sql}')
+            try:
+                explain = 'EXPLAIN (FORMAT JSON) EXECUTE _plan_check'
+                plan = await conn.fetchval(f'{explain}({arguments})' if arguments else explain)
+            finally:
+                await conn.execute('DEALLOCATE _plan_check')
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+        return result
+
+    if FULL_SCAN_MARKER not in statement.sql:
+        result.seq_scans = seq_scans(json.loads(plan)[0]['Plan'])
+    return result
+
+async def check_plans(conn, statements: Iterable[Statement]) -> List[PlanCheck]:
+    return [await check_statement(conn, statement) for statement in statements]
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Hot read statements, with arguments that match no rows, prepared on every new
+# connection before it is handed out
+_warm_statements: List[Tuple[str, Sequence[Any]]] = []
+
+def register_statement(query: str, *args: Any) -> str:
+    """
+    Have query prepared on every pooled connection when it is opened. args are run with
+    it once, so they should select nothing. Returns the query so it can be registered
+    where it is defined.
+    """
+    _warm_statements.append((query, args))
+    return query
+
+async def prepare_statements(conn) -> None:
+    """
+    Pool init callback. Running each hot statement once puts it in the connection's
+    statement cache and loads the type codecs it needs, so the first request served
+    by a connection doesn't pay for either.
+    """
+    for query, args in _warm_statements:
+        try:
+            await conn.fetch(query, *args)
+        except Exception as e:
+            # A statement the schema can't serve yet shouldn't keep the pool from opening
+            logger.warning(f"Could not prepare statement: {e}")
+
+POOL_WAIT_SECONDS = REGISTRY.histogram(
+    'db_pool_acquire_wait_seconds', 'Time waited to acquire a pooled connection', ('pool',)
+)
+POOL_TIMEOUTS = REGISTRY.counter(
+    'db_pool_acquire_timeouts_total', 'Acquires that gave up waiting for a connection', ('pool',)
+)
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class InstrumentedPool(asyncpg.Pool):
+    """
+    asyncpg pool that applies a default acquire timeout and records how long each
+    acquire waited for a free connection, over all acquires and a window of the most
+    recent ones.
+    """
+
+    def __init__(
+        self,
+        *args,
+        name: str = 'primary',
+        acquire_timeout: Optional[float] = None,
+        wait_window: int = 1024,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.name = name
+        self.acquire_timeout = acquire_timeout
+        self.acquires = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent_waits: deque = deque(maxlen=wait_window)
+
+    async def _acquire(self, timeout):
+        # Every acquire, through pool.acquire() or the connection context managers,
+        # goes through here
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            conn = await super()._acquire(self.acquire_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            POOL_TIMEOUTS.inc(pool=self.name)
+            raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - started
+        self.acquires += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self._recent_waits.append(waited)
+        POOL_WAIT_SECONDS.observe(waited, pool=self.name)
+        return conn
+
+    def stats(self) -> Dict[str, Any]:
+        size, idle, max_size = self.get_size(), self.get_idle_size(), self.get_max_size()
+        recent = sorted(self._recent_waits)
+        return {
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'min_size': self.get_min_size(),
+            'max_size': max_size,
+            'saturation': round((size - idle) / max_size, 3) if max_size else 0.0,
+            'waiting': self.waiting,
+            'acquires': self.acquires,
+            'timeouts': self.timeouts,
+            'avg_wait_ms': round(self.total_wait / self.acquires * 1000, 3) if self.acquires else 0.0,
+            'max_wait_ms': round(self.max_wait * 1000, 3),
+            'p50_wait_ms': round(_percentile(recent, 0.50) * 1000, 3),
+            'p95_wait_ms': round(_percentile(recent, 0.95) * 1000, 3),
+            'p99_wait_ms': round(_percentile(recent, 0.99) * 1000, 3),
+            'prepared_statements': len(_warm_statements),
+        }
@@ -0,0 +1,91 @@
+import logging
+import re
+from contextvars import ContextVar
+from typing import Any, Optional, Sequence
+
+from app.utils.metrics import REGISTRY
+from config import Config
+
+slow_query_logger = logging.getLogger('app.db.slow_queries')
+
+# Queries made outside any request: background workers and index loads
+BACKGROUND = 'background'
+
+QUERY_SECONDS = REGISTRY.histogram(
+    'db_query_duration_seconds', 'Time to run a statement', ('route', 'operation')
+)
+QUERY_ERRORS = REGISTRY.counter(
+    'db_query_errors_total', 'Statements that raised', ('route', 'operation')
+)
+SLOW_QUERIES = REGISTRY.counter(
+    'db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS', ('route', 'operation')
+)
+
+class RequestQueries:
+    """Statements run on behalf of one request, and the time spent in them"""
+    __slots__ = ('route', 'count', 'seconds')
+
+    def __init__(self, route: str):
+        self.route = route
+        self.count = 0
+        self.seconds = 0.0
+
+_request: ContextVar[Optional[RequestQueries]] = ContextVar('request_queries', default=None)
+
+def track_queries(route: str) -> RequestQueries:
+    """Count the statements run from the current context, and tasks it starts, as route's"""
+    queries = RequestQueries(route)
+    _request.set(queries)
+    return queries
+
+_OPERATION = re.compile(r'^\s*(?:--[^\n]*\n\s*)*([A-Za-z]+)')
+
+def operation(query: str) -> str:
+    """Leading SQL keyword of a statement: select, insert, update, with, ..."""
+    match = _OPERATION.match(query)
+    return match.group(1).lower() if match else 'other'
+
+def _shape(value: Any) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}[{len(value)}]'
+    if isinstance(value, (list, tuple)):
+        kinds = sorted({_shape(item).split('[')[0] for item in value})
+        return f"{'|'.join(kinds) or 'any'}[{len(value)}]"
+    return type(value).__name__
+
+def param_shape(args: Sequence[Any]) -> str:
+    """
+    Types and sizes of a statement's parameters but not their values, which may be
+    personal data: (int, str[12], int[340], null)
+    """
+    return '(' + ', '.join(_shape(arg) for arg in args) + ')'
+
+def _statement(query: str) -> str:
+    statement = ' '.join(query.split())
+    limit = Config.SLOW_QUERY_MAX_LENGTH
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+def log_query(record) -> None:
+    """
+    asyncpg query logger, added to every pooled connection. asyncpg calls it soon after
+    each statement, in the context of the code that ran it.
+    """
+    queries = _request.get()
+    route = queries.route if queries is not None else BACKGROUND
+    op = operation(record.query)
+
+    QUERY_SECONDS.observe(record.elapsed, route=route, operation=op)
+    if record.exception is not None:
+        QUERY_ERRORS.inc(route=route, operation=op)
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += record.elapsed
+
+    if Config.SLOW_QUERY_MS and record.elapsed * 1000 >= Config.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(route=route, operation=op)
+        slow_query_logger.warning(
+            f"Slow query ({record.elapsed * 1000:.1f} ms, {route}): "
+            f"{_statement(record.query)} params {param_shape(record.args or ())}"
+        )
@@ -0,0 +1,116 @@
+import bisect
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# WAL position the current request must read at or after, set from the client's
+# read-your-writes token
+_read_after: ContextVar[int] = ContextVar('read_after', default=0)
+
+def parse_lsn(lsn: Optional[str]) -> int:
+    """Postgres 'XXXXXXXX/YYYYYYYY' WAL position as an integer"""
+    if not lsn:
+        return 0
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+def format_lsn(position: int) -> str:
+    return f'{position >> 32:X}/{position & 0xFFFFFFFF:X}'
+
+def read_after(position: int) -> None:
+    """Make reads in the current context wait for a replica to replay up to position"""
+    _read_after.set(position)
+
+def required_position() -> int:
+    return _read_after.get()
+
+class PositionHistory:
+    """
+    Recent (time, position) samples of the primary's WAL position, to tell how long ago
+    the primary was where a replica is now. Replay timestamps can't: they only move
+    with commits, so a replica a few bytes behind an idle primary looks minutes stale.
+    """
+
+    def __init__(self, max_samples: int = 1024):
+        self.max_samples = max_samples
+        self._times: List[float] = []
+        self._positions: List[int] = []
+
+    def add(self, position: int, at: Optional[float] = None) -> None:
+        self._times.append(time.monotonic() if at is None else at)
+        self._positions.append(position)
+        if len(self._times) > self.max_samples:
+            del self._times[0], self._positions[0]
+
+    def lag(self, replayed: int, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the primary last stood at or before replayed, None without samples"""
+        if not self._times:
+            return None
+        now = time.monotonic() if now is None else now
+        if replayed >= self._positions[-1]:
+            return 0.0
+        # Positions only grow, the newest sample the replica has caught up with
+        i = bisect.bisect_right(self._positions, replayed)
+        # Behind every sample: at least as old as the oldest one
+        return now - self._times[max(i - 1, 0)]
+
+class Replica:
+    """A read replica's pool and what the last health check learned about it"""
+
+    def __init__(self, name: str, dsn: str):
+        self.name = name
+        self.dsn = dsn
+        self.pool = None
+        self.healthy = False
+        self.replayed = 0
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.reads = 0
+
+    def usable(self, max_lag: float) -> bool:
+        return (
+            self.pool is not None
+            and self.healthy
+            and self.lag_seconds is not None
+            and self.lag_seconds <= max_lag
+        )
+
+    async def check(self, history: PositionHistory) -> None:
+        """Refresh health, replayed position and lag against the primary's history"""
+        try:
+            async with self.pool.acquire() as conn:
+                replayed = await conn.fetchval('SELECT pg_last_wal_replay_lsn()::text')
+        except Exception as e:
+            if self.healthy:
+                logger.warning(f"Replica {self.name} is unhealthy: {e}")
+            self.healthy = False
+            self.error = str(e)
+        else:
+            self.replayed = max(self.replayed, parse_lsn(replayed))
+            self.lag_seconds = history.lag(self.replayed)
+            self.healthy = True
+            self.error = None
+        self.checked_at = time.monotonic()
+
+    async def has_replayed(self, conn, position: int) -> bool:
+        """Whether the replica has replayed up to position, asking it if we don't know yet"""
+        if self.replayed >= position:
+            return True
+        replayed = await conn.fetchval('SELECT pg_last_wal_replay_lsn()::text')
+        self.replayed = max(self.replayed, parse_lsn(replayed))
+        return self.replayed >= position
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'lag_seconds': self.lag_seconds,
+            'replayed_lsn': format_lsn(self.replayed),
+            'reads': self.reads,
+            'error': self.error,
+            'pool': self.pool.stats() if self.pool is not None else None,
+        }
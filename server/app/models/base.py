@@ -0,0 +1,42 @@
+from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar
+
+T = TypeVar('T', bound='RecordModel')
+
+class RecordModel:
+    """
+    Base of the slotted row models. Each model is a projection: its fields are the
+    columns an endpoint selects, so queries list them with columns() instead of
+    SELECT * and rows are built straight from the asyncpg record.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def fields(cls) -> Iterable[str]:
+        return cls.__dataclass_fields__
+
+    @classmethod
+    def columns(cls, alias: Optional[str] = None) -> str:
+        """Comma separated select list of the model's fields"""
+        prefix = f'{alias}.' if alias else ''
+        return ', '.join(prefix + name for name in cls.fields())
+
+    @classmethod
+    def json_object(cls, alias: Optional[str] = None) -> str:
+        """json_build_object() of the model's fields, for rows encoded by Postgres"""
+        prefix = f'{alias}.' if alias else ''
+        return 'json_build_object(%s)' % ', '.join(
+            f"'{name}', {prefix}{name}" for name in cls.fields()
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.fields()}
+
+    @classmethod
+    def from_record(cls: Type[T], row) -> Optional[T]:
+        if row is None:
+            return None
+        return cls(**row)
+
+    @classmethod
+    def from_records(cls: Type[T], rows) -> List[T]:
+        return [cls(**row) for row in rows]
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from app.models.base import RecordModel
+
+@dataclass(slots=True)
+class Place(RecordModel):
+    id: int
+    place_id: str
+    name: str
+    location: Optional[str] = None
+    image: Optional[str] = None
+    website: Optional[str] = None
+    formatted_address: Optional[str] = None
+    types: Optional[str] = None
+    avg_rating: Optional[Decimal] = None
+    ranking: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+@dataclass(slots=True)
+class PlaceRating(RecordModel):
+    """A place's ELO rating with the comparisons behind it and its rating deviation"""
+    place_id: int
+    elo_rating: float = 1000.0
+    match_count: int = 0
+    rating_deviation: float = 350.0
+
+@dataclass(slots=True)
+class RankedPlace(RecordModel):
+    """A leaderboard entry"""
+    id: int
+    place_id: str
+    name: str
+    image: Optional[str] = None
+    types: Optional[str] = None
+    formatted_address: Optional[str] = None
+    avg_rating: Optional[float] = None
+    elo_rating: Optional[float] = None
+    ranking: Optional[int] = None
+
+@dataclass(slots=True)
+class PersonalRankingEntry(RecordModel):
+    """A place in a user's own ranking, with its 1-based rank in the list"""
+    id: int
+    place_id: str
+    name: str
+    image: Optional[str] = None
+    types: Optional[str] = None
+    formatted_address: Optional[str] = None
+    elo_rating: Optional[float] = None
+    position: float = 0.0
+    rank: int = 0
+
+@dataclass(slots=True)
+class NearbyPlace(RecordModel):
+    """A place around a point, with its distance when searched by radius"""
+    id: int
+    place_id: str
+    name: str
+    image: Optional[str] = None
+    types: Optional[str] = None
+    formatted_address: Optional[str] = None
+    website: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    avg_rating: Optional[float] = None
+    ranking: Optional[str] = None
+    elo_rating: Optional[float] = None
+    distance_km: Optional[float] = None
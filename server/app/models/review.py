@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from app.models.base import RecordModel
+
+@dataclass(slots=True)
+class Review(RecordModel):
+    id: int
+    user_id: int
+    place_id: int
+    place_name: Optional[str] = None
+    username: Optional[str] = None
+    text_review: Optional[str] = None
+    rating: Optional[Decimal] = None
+    elo_rating: Optional[Decimal] = None
+    image: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+@dataclass(slots=True)
+class TimelineReview(Review):
+    """A review in a feed, with the time it was written or last edited"""
+    activity_at: Optional[datetime] = None
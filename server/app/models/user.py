@@ -2,8 +2,10 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
-@dataclass
-class User:
+from app.models.base import RecordModel
+
+@dataclass(slots=True)
+class User(RecordModel):
     id: int
     username: str
     email: str
@@ -12,17 +14,25 @@ class User:
     image_url: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    follower_count: int = 0
+    following_count: int = 0
 
-    @classmethod
-    def from_db(cls, row):
-        if not row:
-            return None
-            
-        # Convert row to dict and set defaults for missing fields
-        data = dict(row)
-        data.setdefault('bio', None)
-        data.setdefault('image_url', None)
-        data.setdefault('created_at', None)
-        data.setdefault('updated_at', None)
-        
-        return cls(**data)
\ No newline at end of file
+@dataclass(slots=True)
+class UserSummary(RecordModel):
+    """A user in a list: search results, suggestions and follower pages"""
+    id: int
+    username: str
+    email: str
+    clerk_id: str
+    image_url: Optional[str] = None
+    follower_count: int = 0
+    following_count: int = 0
+    is_following: bool = False
+
+@dataclass(slots=True)
+class Connection(RecordModel):
+    """A follower or followee embedded in a profile"""
+    id: int
+    username: str
+    email: str
+    image_url: Optional[str] = None
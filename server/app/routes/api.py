@@ -1,19 +1,59 @@
 import asyncio
-import json
-from typing import Any, Dict
-from quart import Blueprint, request, jsonify
+import logging
+import math
+from typing import Any, Dict, List, Optional
+from quart import Blueprint, Response, current_app, request, jsonify
+from config import Config
 from app.services.user_service import UserService
 from app.db import NeonDB
 from app.services.rating_service import RatingService
+from app.services.ranking_service import RankingService
+from app.services.ingest_service import VoteIngestQueue, QueueFullError
+from app.services.feed_service import FeedService
+from app.services.profile_service import ProfileService
+from app.services.place_service import PlaceService, REVIEW_ORDERS
+from app.services.place_filter_service import PlaceFilterService
+from app.services.geo_service import GeoService
+from app.services.search_service import SearchService
+from app.services.graph_service import GraphService
+from app.services.personal_ranking_service import PersonalRankingService
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.metrics import REGISTRY
+from app.utils.serialization import dumps
+from app.models.place import NearbyPlace, Place, RankedPlace
+from app.models.user import User
+from app.services.cache_service import (
+    CacheService, RANKINGS_TAG, place_tag, place_key_tag, user_tag
+)
+
+logger = logging.getLogger(__name__)
 
 api_bp = Blueprint('api', __name__)
 rating_service = RatingService()
+vote_queue = VoteIngestQueue(
+    rating_service,
+    workers=Config.INGEST_WORKERS,
+    max_batch=Config.INGEST_MAX_BATCH,
+    max_depth=Config.INGEST_MAX_DEPTH
+)
+
+def _page_size(default: int, maximum: int) -> int:
+    return min(max(request.args.get('limit', default, type=int), 1), maximum)
+
+def _box_error(south: float, west: float, north: float, east: float) -> Optional[str]:
+    """Why a bounding box can't be searched, None if it can"""
+    if not all(map(math.isfinite, (south, west, north, east))):
+        return 'Bounds must be numbers'
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        return 'Bounds must satisfy -90 <= south <= north <= 90 and lie within -180..180'
+    if max(north - south, (east - west) % 360) > Config.NEARBY_MAX_BOX_DEGREES:
+        return f'Bounding box must span at most {Config.NEARBY_MAX_BOX_DEGREES:g} degrees'
+    return None
 
 @api_bp.route('/user', methods=['POST'])
 async def create_user():
     try:
         data = await request.get_json()
-        print("data: ", data)
         
         required_fields = ['name', 'email', 'clerkId']
         if not all(field in data for field in required_fields):
@@ -25,38 +65,36 @@ async def create_user():
             clerk_id=data['clerkId'],
             image_url=data.get('image_url', None)
         )
+        SearchService.update_user(user_id, data['name'])
+        GraphService.add_user(user_id)
         
         return {'data': {'id': user_id}}, 201
 
-    except Exception as e:
-        print(f"Error creating user: {str(e)}")
+    except Exception:
+        logger.exception("Error creating user")
         return {'error': 'Internal Server Error'}, 500
 
 @api_bp.route('/random_user', methods=['GET'])
 async def get_random_users():
-    pool = await NeonDB.get_pool()
-    async with pool.acquire() as conn:
-        users = await conn.fetch("""
-            SELECT *
-            FROM users
-            LIMIT 3                   
-            ORDER BY RANDOM() 
-        """)
-        
+    try:
+        graph = await GraphService.get_graph()
+        users = await UserService.get_users_by_ids(graph.random_users(3))
+
         return jsonify([{
-            'id': user['id'],
-            'username': user['username'],
-            'email': user['email'],
-            'clerkId': user['clerk_id'],
-            'imageUrl': user['image_url']
-            # Add any other fields from your users table
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'clerkId': user.clerk_id,
+            'imageUrl': user.image_url
         } for user in users])
+    except Exception:
+        logger.exception("Error getting random users")
+        return {'error': 'Internal Server Error'}, 500
 
 @api_bp.route('/process-matches', methods=['POST'])
 async def process_matches():
     try:
         data = await request.get_json()
-        print(data)
         matches = data.get('matches', [])
         
         if not matches:
@@ -70,33 +108,101 @@ async def process_matches():
             data["text_review"] = ""
             # return {'error': 'text_review is required when submitting a review'}, 400
 
-        # Process matches and create review
-        updated_places = await rating_service.process_matches(data)
-        
-        return jsonify({
-            'success': True,
-            'updated_places': updated_places
-        })
+        return await _submit(data)
 
+    except QueueFullError as e:
+        return {'error': str(e)}, 503
     except Exception as e:
-        print(f"Error in process_matches: {str(e)}")  # For debugging
+        logger.exception("Error in process_matches")
         return {'error': str(e)}, 500
 
+async def _submit(data: Dict[str, Any], **extra: Any):
+    """Apply a vote submission, or queue it in INGEST_MODE=async, and build the response"""
+    # Queue the submission for the background workers
+    if current_app.config['INGEST_MODE'] == 'async':
+        submission_id = vote_queue.enqueue(data)
+        return {'success': True, 'queued': True, 'submission_id': submission_id, **extra}, 202
+
+    # Process matches and create review
+    updated_places = await rating_service.process_matches(data)
+    
+    return jsonify({
+        'success': True,
+        'updated_places': updated_places,
+        **extra
+    })
+
+@api_bp.route('/ingest/stats', methods=['GET'])
+async def get_ingest_stats():
+    """Queue depth and apply lag of asynchronous vote ingestion"""
+    return jsonify({'mode': current_app.config['INGEST_MODE'], **vote_queue.stats()})
+
+@api_bp.route('/cache/stats', methods=['GET'])
+async def get_cache_stats():
+    """Size and hit rate of the response cache"""
+    return jsonify(CacheService.stats())
+
+@api_bp.route('/db/stats', methods=['GET'])
+async def get_db_stats():
+    """Connection pool saturation and how long requests wait to acquire a connection"""
+    return jsonify(NeonDB.stats())
+
+@api_bp.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Request, query, pool and Elo metrics of this process in the Prometheus text format"""
+    if not current_app.config['METRICS_ENABLED']:
+        return {'error': 'Metrics are disabled'}, 404
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @api_bp.route('/rankings', methods=['GET'])
 async def get_rankings():
-    pool = await NeonDB.get_pool()
-    async with pool.acquire() as conn:
-        places = await conn.fetch("""
-            SELECT name, rating, ranking 
-            FROM places 
-            ORDER BY rating DESC
-        """)
-        
-        return jsonify([{
-            'name': place['name'],
-            'rating': float(place['rating']),
-            'ranking': place['ranking']
-        } for place in places])
+    """Leaderboard of places by average rating, optionally by category and region"""
+    limit = _page_size(Config.RANKINGS_PAGE_SIZE, Config.RANKINGS_MAX_PAGE_SIZE)
+    place_type = request.args.get('type')
+    region = request.args.get('region')
+    cursor = request.args.get('cursor')
+
+    try:
+        after = None
+        if cursor:
+            score, place_id = decode_cursor(cursor)
+            after = (float(score), int(place_id))
+    except (TypeError, ValueError):
+        return {'error': 'Invalid cursor'}, 400
+
+    async def load():
+        entries = await RankingService.get_leaderboard(limit + 1, after, place_type, region)
+        page, more = entries[:limit], len(entries) > limit
+
+        async with NeonDB.read_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT p.id, p.place_id, p.name, p.image, p.types, p.formatted_address,
+                    r.elo_rating
+                FROM places p
+                LEFT JOIN place_ratings r ON r.place_id = p.id
+                WHERE p.id = ANY($1::int[])
+            """, [pid for pid, _ in page])
+        places = {row['id']: row for row in rows}
+
+        data = []
+        for pid, score in page:
+            place = places.get(pid)
+            if place is None:
+                continue
+            data.append(RankedPlace(
+                **place,
+                avg_rating=score,
+                ranking=await RankingService.get_rank(pid)
+            ))
+
+        next_cursor = encode_cursor(*page[-1][::-1]) if more else None
+        return {'data': data, 'next_cursor': next_cursor}, [RANKINGS_TAG]
+
+    try:
+        return await CacheService.cached_json(f'rankings:{request.query_string.decode()}', load)
+    except Exception:
+        logger.exception("Error getting rankings")
+        return {'error': 'Internal Server Error'}, 500
 
 @api_bp.route('/users/<int:user_id>', methods=['GET'])
 async def get_user(user_id):
@@ -108,7 +214,7 @@ async def get_user(user_id):
 @api_bp.route('/users', methods=['GET'])
 async def get_users():
     users = await UserService.get_all_users()
-    return jsonify([user.__dict__ for user in users])
+    return jsonify(users)
 
 """@api_bp.route('/users', methods=['POST'])
 async def create_user():
@@ -119,54 +225,145 @@ async def create_user():
     )
     return {'id': user_id}, 201"""
 
+async def _graph_page(user_id: int, direction: str):
+    limit = _page_size(Config.PROFILE_PAGE_SIZE, Config.PROFILE_MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    try:
+        after = int(decode_cursor(cursor)[0]) if cursor else None
+    except (IndexError, TypeError, ValueError):
+        return {'error': 'Invalid cursor'}, 400
+
+    graph = await GraphService.get_graph()
+    neighbours = graph.followers if direction == 'followers' else graph.following
+    user_ids = neighbours(user_id, limit + 1, after)
+    next_cursor = encode_cursor(user_ids[limit - 1]) if len(user_ids) > limit else None
+
+    users = await UserService.get_users_by_ids(user_ids[:limit])
+    return jsonify({'data': users, 'next_cursor': next_cursor})
+
 @api_bp.route('/users/<int:user_id>/followees', methods=['GET'])
 async def get_followees(user_id):
-    """Get list of users that the specified user follows"""
+    """Get a page of the users that the specified user follows"""
     try:
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            followees = await conn.fetch("""
-                SELECT u.* 
-                FROM users u
-                JOIN followers f ON u.id = f.followee
-                WHERE f.follower = $1
-                ORDER BY u.username
-            """, user_id)
-            
-            return jsonify([{
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'clerk_id': user['clerk_id']
-            } for user in followees])
-    except Exception as e:
-        print(f"Error getting followees: {str(e)}")
+        return await _graph_page(user_id, 'following')
+    except Exception:
+        logger.exception("Error getting followees")
         return {'error': 'Failed to get followees'}, 500
 
 @api_bp.route('/users/<int:user_id>/followers', methods=['GET'])
 async def get_followers(user_id):
-    """Get list of users who follow the specified user"""
+    """Get a page of the users who follow the specified user"""
     try:
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            followers = await conn.fetch("""
-                SELECT u.* 
-                FROM users u
-                JOIN followers f ON u.id = f.follower
-                WHERE f.followee = $1
-                ORDER BY u.username
-            """, user_id)
-            
-            return jsonify([{
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'clerk_id': user['clerk_id']
-            } for user in followers])
-    except Exception as e:
-        print(f"Error getting followers: {str(e)}")
+        return await _graph_page(user_id, 'followers')
+    except Exception:
+        logger.exception("Error getting followers")
         return {'error': 'Failed to get followers'}, 500
 
+@api_bp.route('/users/<int:user_id>/suggestions', methods=['GET'])
+async def get_suggestions(user_id):
+    """People the user may know: users followed by the users they follow"""
+    try:
+        limit = _page_size(Config.SUGGESTIONS_PAGE_SIZE, Config.PROFILE_MAX_PAGE_SIZE)
+        user_ids = await GraphService.suggestions(user_id, limit)
+        return jsonify(await UserService.get_users_by_ids(user_ids, viewer_id=user_id))
+    except Exception:
+        logger.exception("Error getting suggestions")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/users/<int:user_id>/ranking', methods=['GET'])
+async def get_personal_ranking(user_id):
+    """A page of the user's own ranking of the places they reviewed, best first"""
+    limit = _page_size(Config.PROFILE_PAGE_SIZE, Config.PROFILE_MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    try:
+        after = None
+        if cursor:
+            position, place_id, rank = decode_cursor(cursor)
+            after = (float(position), int(place_id), int(rank))
+    except (TypeError, ValueError):
+        return {'error': 'Invalid cursor'}, 400
+
+    try:
+        entries, next_key = await PersonalRankingService.get_ranking(user_id, limit, after)
+        return jsonify({
+            'data': entries,
+            'next_cursor': encode_cursor(*next_key) if next_key else None
+        })
+    except Exception:
+        logger.exception("Error getting personal ranking")
+        return {'error': 'Internal Server Error'}, 500
+
+async def _ranking_step(user_id: int, data: Dict[str, Any], result: Dict[str, Any]):
+    """
+    Hand the next comparison to the client, or submit a finished insertion's comparisons
+    as one vote submission, along with the review when text_review or image were sent
+    """
+    if not result['done']:
+        return jsonify(result)
+
+    submission = {'matches': result.pop('matches'), 'user_id': user_id}
+    place_id = data['place_id']
+    if 'text_review' in data or 'image' in data:
+        review = await PersonalRankingService.get_review(user_id, place_id)
+        submission.update({
+            'place_id': place_id,
+            'review_id': review['id'] if review else None,
+            'text_review': data.get('text_review', '' if review is None else None),
+            'image': data.get('image', review['image'] if review else None),
+        })
+    elif not submission['matches']:
+        return jsonify({**result, 'success': True})
+    return await _submit(submission, **result)
+
+@api_bp.route('/users/<int:user_id>/ranking/insert', methods=['POST'])
+async def start_ranking_insertion(user_id):
+    """
+    Start placing a place in the user's ranking by binary search. Returns the first
+    candidate to compare it with and a session token, or the result for an empty list.
+    """
+    try:
+        data = await request.get_json() or {}
+        place_id = data.get('place_id')
+        if not isinstance(place_id, int):
+            return {'error': 'place_id is required'}, 400
+
+        try:
+            result = await PersonalRankingService.start(user_id, place_id)
+        except ValueError as e:
+            # Another session placed it in the meantime
+            return {'error': str(e)}, 409
+        if result is None:
+            return {'error': 'User or place not found'}, 404
+        return await _ranking_step(user_id, data, result)
+
+    except QueueFullError as e:
+        return {'error': str(e)}, 503
+    except Exception:
+        logger.exception("Error starting ranking insertion")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/users/<int:user_id>/ranking/answer', methods=['POST'])
+async def answer_ranking_comparison(user_id):
+    """
+    Answer the current comparison of an insertion session with 'better', 'worse' or
+    'tie'. Returns the next candidate, or the place's rank once it is placed.
+    """
+    try:
+        data = await request.get_json() or {}
+        try:
+            result = await PersonalRankingService.answer(
+                user_id, data.get('token') or '', data.get('outcome')
+            )
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return await _ranking_step(user_id, {**data, 'place_id': result['place_id']}, result)
+
+    except QueueFullError as e:
+        return {'error': str(e)}, 503
+    except Exception:
+        logger.exception("Error answering ranking comparison")
+        return {'error': 'Internal Server Error'}, 500
+
 @api_bp.route('/users/<int:follower_id>/follow/<int:followee_id>', methods=['POST'])
 async def follow_user(follower_id, followee_id):
     """Follow a user"""
@@ -196,96 +393,95 @@ async def follow_user(follower_id, followee_id):
             if existing:
                 return {'error': 'Already following'}, 400
 
-            # Create follow relationship
-            await conn.execute("""
-                INSERT INTO followers (follower, followee)
-                VALUES ($1, $2)
-            """, follower_id, followee_id)
-            
-            return {'success': True, 'message': 'Successfully followed user'}, 201
-    except Exception as e:
-        print(f"Error following user: {str(e)}")
+            # Create follow relationship and seed the follower's timeline
+            async with conn.transaction():
+                await conn.execute("""
+                    WITH follow AS (
+                        INSERT INTO followers (follower, followee)
+                        VALUES ($1, $2)
+                        RETURNING follower, followee
+                    )
+                    UPDATE users
+                    SET follower_count = follower_count + (users.id = follow.followee)::int,
+                        following_count = following_count + (users.id = follow.follower)::int
+                    FROM follow
+                    WHERE users.id IN (follow.follower, follow.followee)
+                """, follower_id, followee_id)
+                await FeedService.backfill(follower_id, followee_id, conn)
+
+        GraphService.follow(follower_id, followee_id)
+        CacheService.invalidate(user_tag(follower_id), user_tag(followee_id))
+        return {'success': True, 'message': 'Successfully followed user'}, 201
+    except Exception:
+        logger.exception("Error following user")
         return {'error': 'Failed to follow user'}, 500
 
 @api_bp.route('/users/<int:follower_id>/unfollow/<int:followee_id>', methods=['POST'])
 async def unfollow_user(follower_id, followee_id):
     """Unfollow a user"""
     try:
-        print(follower_id, followee_id)
         pool = await NeonDB.get_pool()
         async with pool.acquire() as conn:
-            result = await conn.execute("""
-                DELETE FROM followers 
-                WHERE follower = $1 AND followee = $2
-            """, follower_id, followee_id)
+            async with conn.transaction():
+                result = await conn.execute("""
+                    DELETE FROM followers 
+                    WHERE follower = $1 AND followee = $2
+                """, follower_id, followee_id)
+                if result != 'DELETE 0':
+                    await conn.execute("""
+                        UPDATE users
+                        SET follower_count = GREATEST(follower_count - (id = $2)::int, 0),
+                            following_count = GREATEST(following_count - (id = $1)::int, 0)
+                        WHERE id IN ($1, $2)
+                    """, follower_id, followee_id)
+                await FeedService.remove_author(follower_id, followee_id, conn)
             
-            if result == 'DELETE 0':
-                return {'error': 'Wasn\'t following this user'}, 404
-                
-            return {'success': True, 'message': 'Successfully unfollowed user'}
-    except Exception as e:
-        print(f"Error unfollowing user: {str(e)}")
+        if result == 'DELETE 0':
+            return {'error': 'Wasn\'t following this user'}, 404
+
+        GraphService.unfollow(follower_id, followee_id)
+        CacheService.invalidate(user_tag(follower_id), user_tag(followee_id))
+        return {'success': True, 'message': 'Successfully unfollowed user'}
+    except Exception:
+        logger.exception("Error unfollowing user")
         return {'error': 'Failed to unfollow user'}, 500
 
 @api_bp.route('/users/search', methods=['GET'])
 async def search_users():
-    """Search users by username"""
+    """Search users by username, best matches first"""
     try:
         search_term = request.args.get('username', '')
         if not search_term:
             return {'error': 'No search term provided'}, 400
 
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            # Using ILIKE for case-insensitive pattern matching
-            users = await conn.fetch("""
-                SELECT 
-                    users.*,
-                    COALESCE(
-                        JSON_AGG(
-                            DISTINCT JSONB_BUILD_OBJECT('id', followers.id, 'username', followers.username)
-                        ) FILTER (WHERE followers.id IS NOT NULL), 
-                        '[]'
-                    ) AS followers,
-                    COALESCE(
-                        JSON_AGG(
-                            DISTINCT JSONB_BUILD_OBJECT('id', following.id, 'username', following.username)
-                        ) FILTER (WHERE following.id IS NOT NULL), 
-                        '[]'
-                    ) AS following
-                FROM 
-                    users
-                LEFT JOIN users AS followers ON followers.id = (
-                    SELECT follower 
-                    FROM followers 
-                    WHERE followers.followee = users.id
-                )
-                LEFT JOIN users AS following ON following.id = (
-                    SELECT followee 
-                    FROM followers
-                    WHERE followers.follower = users.id
-                )
-                WHERE 
-                    users.username ILIKE $1
-                GROUP BY 
-                    users.id
-                ORDER BY 
-                    users.username
-                LIMIT 20;
-            """, f'%{search_term}%')
-            
-            return jsonify([{
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'clerk_id': user['clerk_id'],
-                'followers': user['followers'],
-                'following': user['following']
-            } for user in users])
-    except Exception as e:
-        print(f"Error searching users: {str(e)}")
+        users = await SearchService.search(
+            search_term,
+            _page_size(Config.SEARCH_PAGE_SIZE, Config.SEARCH_PAGE_SIZE),
+            viewer_id=request.args.get('viewer_id', type=int)
+        )
+        return jsonify(users)
+    except Exception:
+        logger.exception("Error searching users")
         return {'error': 'Failed to search users'}, 500
-    
+
+@api_bp.route('/users/autocomplete', methods=['GET'])
+async def autocomplete_users():
+    """Users whose username, or a word in it, starts with q"""
+    try:
+        prefix = request.args.get('q', '')
+        if not prefix.strip():
+            return jsonify([])
+
+        users = await SearchService.autocomplete(
+            prefix,
+            _page_size(Config.SEARCH_PAGE_SIZE, Config.SEARCH_PAGE_SIZE),
+            viewer_id=request.args.get('viewer_id', type=int)
+        )
+        return jsonify(users)
+    except Exception:
+        logger.exception("Error autocompleting users")
+        return {'error': 'Failed to search users'}, 500
+
 # Profile Update Route
 @api_bp.route('/profile/update', methods=['PUT'])
 async def update_profile():
@@ -301,157 +497,316 @@ async def update_profile():
 
         pool = await NeonDB.get_pool()
         async with pool.acquire() as conn:
-            user = await conn.fetchrow("""
+            user = await conn.fetchrow(f"""
                 UPDATE users 
                 SET 
                     username = COALESCE($1, username),
                     bio = COALESCE($2, bio),
                     image_url = COALESCE($3, image_url)
                 WHERE clerk_id = $4
-                RETURNING *
+                RETURNING {User.columns()}
             """, username, bio, image_url, clerk_id)
+        user = User.from_record(user)
 
-            return jsonify({'data': dict(user)})
-    except Exception as e:
-        print(f"Error updating user: {str(e)}")
+        if user:
+            SearchService.update_user(user.id, user.username)
+            CacheService.invalidate(user_tag(user.id))
+        return jsonify({'data': user})
+    except Exception:
+        logger.exception("Error updating user")
         return {'error': 'Internal Server Error'}, 500
 
 # Profile Get Route
 @api_bp.route('/profile/<clerk_id>', methods=['GET'])
 async def get_profile(clerk_id):
+    """User with their section counts and the first page of reviews, followers and following"""
     try:
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            result = await conn.fetch("""
-                WITH user_connections AS (
-                    SELECT 
-                        users.*,
-                        COALESCE(json_agg(DISTINCT reviews) FILTER (WHERE reviews.id IS NOT NULL), '[]') AS reviews,
-                        COALESCE(
-                            json_agg(
-                                DISTINCT jsonb_build_object(
-                                    'id', follower_users.id,
-                                    'username', follower_users.username,
-                                    'email', follower_users.email,
-                                    'image_url', follower_users.image_url,
-                                    'reviews', (
-                                        SELECT COALESCE(json_agg(r), '[]')
-                                        FROM reviews r
-                                        WHERE r.user_id = follower_users.id
-                                    )
-                                )
-                            ) FILTER (WHERE follower_users.id IS NOT NULL), 
-                            '[]'
-                        ) AS followers,
-                        COALESCE(
-                            json_agg(
-                                DISTINCT jsonb_build_object(
-                                    'id', following_users.id,
-                                    'username', following_users.username,
-                                    'email', following_users.email,
-                                    'image_url', following_users.image_url,
-                                    'reviews', (
-                                        SELECT COALESCE(json_agg(r), '[]')
-                                        FROM reviews r
-                                        WHERE r.user_id = following_users.id
-                                    )
-                                )
-                            ) FILTER (WHERE following_users.id IS NOT NULL), 
-                            '[]'
-                        ) AS following
-                    FROM users
-                    LEFT JOIN reviews ON users.id = reviews.user_id
-                    LEFT JOIN followers AS followers_rel ON users.id = followers_rel.followee
-                    LEFT JOIN users AS follower_users ON followers_rel.follower = follower_users.id
-                    LEFT JOIN followers AS following_rel ON users.id = following_rel.follower
-                    LEFT JOIN users AS following_users ON following_rel.followee = following_users.id
-                    WHERE users.clerk_id = $1
-                    GROUP BY users.id
-                )
-                SELECT * FROM user_connections
-            """, clerk_id)
-
-            # Deserialize the JSON string fields into Python lists
-            data = []
-            for row in result:
-                row_dict = dict(row)
-                row_dict['reviews'] = json.loads(row_dict['reviews'])
-                row_dict['followers'] = json.loads(row_dict['followers'])
-                row_dict['following'] = json.loads(row_dict['following'])
-                data.append(row_dict)
-            
-            return jsonify({'data': data})
-    except Exception as e:
-        print(f"Error getting profile: {str(e)}")
+        limit = _page_size(Config.PROFILE_PAGE_SIZE, Config.PROFILE_MAX_PAGE_SIZE)
+
+        async def load():
+            profile = await ProfileService.get_profile(clerk_id, limit)
+            if profile is None:
+                return {'data': []}, None
+            # Followers and following are shown with their current username and image
+            shown = [profile['id']] + [
+                user.id for user in profile['followers'] + profile['following']
+            ]
+            return {'data': [profile]}, set(map(user_tag, shown))
+
+        return await CacheService.cached_json(f'profile:{clerk_id}:{limit}', load)
+    except Exception:
+        logger.exception("Error getting profile")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/profile/<clerk_id>/<section>', methods=['GET'])
+async def get_profile_section(clerk_id, section):
+    """Further pages of a profile section: reviews, followers or following"""
+    try:
+        if section not in ('reviews', 'followers', 'following'):
+            return {'error': 'Unknown profile section'}, 404
+
+        limit = _page_size(Config.PROFILE_PAGE_SIZE, Config.PROFILE_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+
+        async with NeonDB.read_connection() as conn:
+            user = await ProfileService.get_user_by_clerk_id(clerk_id, conn)
+            if user is None:
+                return {'error': 'User not found'}, 404
+
+            try:
+                if section == 'reviews':
+                    page = await ProfileService.get_reviews(
+                        user.id, limit, cursor, request.args.get('order', 'recent'), conn
+                    )
+                else:
+                    page = await ProfileService.get_connections(
+                        user.id, section, limit, cursor, conn
+                    )
+            except ValueError as e:
+                return {'error': str(e)}, 400
+
+        return jsonify(page)
+    except Exception:
+        logger.exception(f"Error getting profile {section}")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/feed/<clerk_id>', methods=['GET'])
+async def get_feed(clerk_id):
+    """Reviews by the users someone follows, newest first, paginated by cursor"""
+    try:
+        limit = _page_size(Config.FEED_PAGE_SIZE, Config.FEED_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+
+        async with NeonDB.read_connection() as conn:
+            user_id = await conn.fetchval(
+                'SELECT id FROM users WHERE clerk_id = $1', clerk_id
+            )
+            if user_id is None:
+                return {'error': 'User not found'}, 404
+
+            try:
+                page = await FeedService.get_feed(user_id, limit, cursor, conn)
+            except ValueError:
+                return {'error': 'Invalid cursor'}, 400
+
+        return jsonify(page)
+    except Exception:
+        logger.exception("Error getting feed")
         return {'error': 'Internal Server Error'}, 500
 
+# Required in every place created
+_PLACE_FIELDS = ('place_id', 'location', 'image')
+
+async def _rank_new_places(places: List[Place], conn) -> Dict[int, int]:
+    """
+    Slot new places into the ranking and its leaderboards, in their transaction, which
+    took RankingService.lock() before inserting them
+    """
+    await RankingService.register_many(
+        [(place.id, place.types, place.formatted_address) for place in places], conn=conn
+    )
+    moved = await RankingService.apply_changes(
+        {place.id: float(place.avg_rating or 0) for place in places}, conn=conn
+    )
+    for place in places:
+        place.ranking = str(moved.get(place.id, place.ranking))
+    return moved
+
+def _added_places(places: List[Place], created: List[Place], moved: Dict[int, int]) -> None:
+    """Bring the in-memory indexes and caches up to date once the places committed"""
+    # New places, and existing ones inserted outside the API since the filter loaded
+    created_ids = {place.id for place in created}
+    PlaceFilterService.add(
+        place.place_id for place in places
+        if place.id in created_ids or not PlaceFilterService.contains(place.place_id)
+    )
+    if not created:
+        return
+    GeoService.add_places([
+        (place.id, place.latitude, place.longitude, 1000)
+        for place in created if place.latitude is not None
+    ])
+    CacheService.invalidate(
+        RANKINGS_TAG,
+        *(place_key_tag(place.place_id) for place in created),
+        *map(place_tag, moved)
+    )
+
 # Place Create Route
 @api_bp.route('/places/create', methods=['POST'])
 async def create_place():
+    """
+    Create a place, or return the one with the same Google place id: 201 if it was
+    created, 200 if it existed
+    """
     try:
         data = await request.get_json()
-        required_fields = ['place_id', 'location', 'image']
-        
-        if not all(data.get(field) for field in required_fields):
+        if not all(data.get(field) for field in _PLACE_FIELDS):
             return {'error': 'Missing required fields'}, 400
 
         pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            place = await conn.fetchrow("""
-                INSERT INTO places (
-                    place_id,
-                    avg_rating,
-                    location,
-                    image,
-                    name,
-                    website,
-                    formatted_address,
-                    types
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                RETURNING *
-            """, 
-            data.get('place_id'),
-            data.get('rating', 0),
-            data.get('location'),
-            data.get('image'),
-            data.get('name', ''),
-            data.get('website', ''),
-            data.get('formatted_address', ''),
-            data.get('types', '')
+        async with pool.acquire() as conn, conn.transaction():
+            await RankingService.lock(conn)
+            place, created = await PlaceService.upsert_place(PlaceService.place_record(data), conn)
+            moved = await _rank_new_places([place], conn) if created else {}
+
+        _added_places([place], [place] if created else [], moved)
+        return jsonify({'data': place}), 201 if created else 200
+    except Exception:
+        logger.exception("Error creating place")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/places/bulk', methods=['POST'])
+async def create_places():
+    """
+    Create many places at once, {"places": [...]} with the fields of /places/create.
+    Places whose Google place id exists are returned as they are. Responds with a
+    place per distinct id in request order and the ids of the created ones.
+    """
+    try:
+        data = await request.get_json()
+        items = data.get('places') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return {'error': 'places must be a non-empty list'}, 400
+        if len(items) > Config.PLACES_BULK_MAX_SIZE:
+            return {'error': f'At most {Config.PLACES_BULK_MAX_SIZE} places per request'}, 400
+        for i, item in enumerate(items):
+            if not isinstance(item, dict) or not all(item.get(field) for field in _PLACE_FIELDS):
+                return {'error': f'Missing required fields in place {i}'}, 400
+
+        pool = await NeonDB.get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await RankingService.lock(conn)
+            places, created_ids = await PlaceService.upsert_places(
+                [PlaceService.place_record(item) for item in items], conn
             )
+            created = [place for place in places if place.id in created_ids]
+            moved = await _rank_new_places(created, conn) if created else {}
 
-            return jsonify({'data': dict(place)}), 201
-    except Exception as e:
-        print(f"Error creating place: {str(e)}")
+        _added_places(places, created, moved)
+        return jsonify({'data': places, 'created': sorted(created_ids)}), 201 if created else 200
+    except Exception:
+        logger.exception("Error creating places")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/places/nearby', methods=['GET'])
+async def get_nearby_places():
+    """
+    Best places by ELO rating around a point (lat, lng, radius_km) or inside a bounding
+    box (south, west, north, east)
+    """
+    try:
+        limit = _page_size(Config.RANKINGS_PAGE_SIZE, Config.RANKINGS_MAX_PAGE_SIZE)
+        box = [request.args.get(side, type=float) for side in ('south', 'west', 'north', 'east')]
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+
+        index = await GeoService.get_index()
+        if all(side is not None for side in box):
+            error = _box_error(*box)
+            if error:
+                return {'error': error}, 400
+            results = [(pid, score, None) for pid, score in index.in_box(*box, limit)]
+        elif lat is not None and lng is not None:
+            radius_km = min(
+                request.args.get('radius_km', Config.NEARBY_RADIUS_KM, type=float),
+                Config.NEARBY_MAX_RADIUS_KM
+            )
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                return {'error': 'lat and lng must be coordinates'}, 400
+            if not radius_km > 0:
+                return {'error': 'radius_km must be positive'}, 400
+            results = index.nearby(lat, lng, radius_km, limit)
+        else:
+            return {'error': 'Provide lat and lng, or south, west, north and east'}, 400
+
+        async with NeonDB.read_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT id, place_id, name, image, types, formatted_address, website,
+                    latitude, longitude, avg_rating, ranking
+                FROM places
+                WHERE id = ANY($1::int[])
+            """, [pid for pid, _, _ in results])
+        places = {row['id']: row for row in rows}
+
+        data = []
+        for pid, elo_rating, distance_km in results:
+            place = places.get(pid)
+            if place is None:
+                continue
+            data.append(NearbyPlace(**place, elo_rating=elo_rating, distance_km=distance_km))
+
+        return jsonify({'data': data})
+    except Exception:
+        logger.exception("Error getting nearby places")
         return {'error': 'Internal Server Error'}, 500
 
 @api_bp.route('/places/<place_id>', methods=['GET'])
 async def get_place(place_id):
+    """A place with the first page of its reviews, most recent or highest rated first"""
+    limit = _page_size(Config.PLACE_REVIEWS_PAGE_SIZE, Config.PLACE_REVIEWS_MAX_PAGE_SIZE)
+    order = request.args.get('order', 'recent')
+    if order not in REVIEW_ORDERS:
+        return {'error': 'Invalid order'}, 400
+
+    async def load():
+        body, place_ids = await PlaceService.get_place(place_id, limit, order)
+        tags = [place_key_tag(place_id)] + [place_tag(id) for id in place_ids]
+        return body, tags
+
     try:
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            result = await conn.fetch("""
-                SELECT 
-                    places.*,
-                    COALESCE(
-                        json_agg(reviews) FILTER (WHERE reviews.id IS NOT NULL), 
-                        '[]'
-                    ) AS reviews
-                FROM places
-                LEFT JOIN reviews ON places.id = reviews.place_id
-                WHERE places.place_id = $1
-                GROUP BY places.id
-            """, place_id)
-            
-            # Convert each row to a dictionary and ensure 'reviews' is parsed into an array
-            data = []
-            for row in result:
-                row_dict = dict(row)
-                # Parse 'reviews' field from string to list
-                row_dict['reviews'] = json.loads(row_dict['reviews'])
-                data.append(row_dict)
-            
-            return jsonify({'data': data})
-    except Exception as e:
-        print(f"Error getting place: {str(e)}")
-        return {'error': 'Internal Server Error'}, 500
\ No newline at end of file
+        # A place nobody added yet is answered without a query, or a cache entry
+        if not await PlaceFilterService.might_exist(place_id):
+            return jsonify({'data': [], 'reviews_cursor': None})
+        return await CacheService.cached_json(f'place:{place_id}:{limit}:{order}', load)
+    except Exception:
+        logger.exception("Error getting place")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/places/<place_id>/reviews', methods=['GET'])
+async def get_place_reviews(place_id):
+    """Further pages of a place's reviews"""
+    limit = _page_size(Config.PLACE_REVIEWS_PAGE_SIZE, Config.PLACE_REVIEWS_MAX_PAGE_SIZE)
+    order = request.args.get('order', 'recent')
+    cursor = request.args.get('cursor')
+
+    async def load():
+        async with NeonDB.read_connection() as conn:
+            place_ids = await PlaceService.get_place_ids(place_id, conn)
+            if not place_ids:
+                return b'{"data":[],"next_cursor":null}', [place_key_tag(place_id)]
+            reviews, next_cursor = await PlaceService.get_reviews(
+                place_ids[0], limit, cursor, order, conn
+            )
+        body = b'{"data":%s,"next_cursor":%s}' % (reviews.encode(), dumps(next_cursor))
+        return body, [place_key_tag(place_id), place_tag(place_ids[0])]
+
+    try:
+        return await CacheService.cached_json(
+            f'place_reviews:{place_id}:{limit}:{order}:{cursor}', load
+        )
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception:
+        logger.exception("Error getting place reviews")
+        return {'error': 'Internal Server Error'}, 500
+
+@api_bp.route('/places/<place_id>/reviews/export', methods=['GET'])
+async def export_place_reviews(place_id):
+    """Every review of a place streamed as newline delimited JSON"""
+    order = request.args.get('order', 'recent')
+    if order not in REVIEW_ORDERS:
+        return {'error': 'Invalid order'}, 400
+
+    try:
+        place_ids = await PlaceService.get_place_ids(place_id)
+        if not place_ids:
+            return {'error': 'Place not found'}, 404
+
+        return Response(
+            PlaceService.stream_reviews(place_ids[0], order),
+            mimetype='application/x-ndjson'
+        )
+    except Exception:
+        logger.exception("Error exporting place reviews")
+        return {'error': 'Internal Server Error'}, 500
@@ -0,0 +1,102 @@
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+from quart import Response, current_app, request
+
+from app.db import BUS, NeonDB, read_after, required_position
+from app.utils.cache import TaggedCache
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RANKINGS_TAG = 'rankings'
+
+def place_tag(place_id: int) -> str:
+    return f'place:{place_id}'
+
+def place_key_tag(google_place_id: str) -> str:
+    """Tag of a lookup by Google place id, including lookups that found nothing"""
+    return f'place_key:{google_place_id}'
+
+def user_tag(user_id: int) -> str:
+    return f'user:{user_id}'
+
+class CacheService:
+    """
+    Read-through cache of serialized JSON responses for hot GET endpoints.
+
+    Each response is cached with tags naming the rows it was built from and writers
+    invalidate those tags once their transaction has committed, in every worker. Cached
+    responses carry an ETag so clients holding an unchanged copy get a 304 without a body.
+    """
+    _cache = TaggedCache(
+        max_entries=Config.CACHE_MAX_ENTRIES,
+        max_bytes=Config.CACHE_MAX_BYTES,
+        ttl=Config.CACHE_TTL
+    )
+
+    @classmethod
+    def invalidate(cls, *tags: str) -> None:
+        cls._invalidated(tags)
+        BUS.publish('cache.invalidate', tags)
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._cleared()
+        BUS.publish('cache.clear')
+
+    @classmethod
+    def _invalidated(cls, tags) -> None:
+        cls._cache.invalidate(*tags)
+        NeonDB.mark_written()
+
+    @classmethod
+    def _cleared(cls, items=()) -> None:
+        cls._cache.clear()
+        NeonDB.mark_written()
+
+    @classmethod
+    def stats(cls):
+        return {'enabled': Config.CACHE_ENABLED, **cls._cache.stats()}
+
+    @classmethod
+    async def cached_json(
+        cls,
+        key: str,
+        loader: Callable[[], Awaitable[Tuple[Any, Optional[Iterable[str]]]]],
+    ) -> Response:
+        """
+        Respond with the JSON payload cached under key, or built by loader() as
+        (payload, tags). A payload loaded with tags of None is served but not cached.
+        A payload of bytes is taken to be encoded JSON already and is served as is.
+        """
+        async def load():
+            # Whatever is cached is served to everyone, so it must not be read from a
+            # replica that is behind the writes that invalidated it
+            read_after(max(required_position(), await NeonDB.write_fence()))
+            payload, tags = await loader()
+            if isinstance(payload, bytes):
+                body = payload
+            else:
+                body = current_app.json.dumps(payload).encode()
+            etag = hashlib.sha1(body).hexdigest()
+            return (body, etag), tags, len(body)
+
+        if Config.CACHE_ENABLED:
+            body, etag = await cls._cache.get_or_load(key, load)
+        else:
+            (body, etag), _, _ = await load()
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Clients may keep the response but must revalidate it before reuse
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+BUS.subscribe('cache.invalidate', CacheService._invalidated)
+BUS.subscribe('cache.clear', CacheService._cleared)
+BUS.on_reset(CacheService._cleared)
@@ -0,0 +1,127 @@
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from app.db import NeonDB, register_statement
+from app.models.review import Review, TimelineReview
+from app.utils.pagination import decode_cursor, encode_cursor
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every real row, so the first page needs no special case in the query
+_FIRST_PAGE = (datetime.max, 2 ** 31 - 1)
+
+# Timeline entries of small authors, merged with a read of large authors' reviews
+_FEED_PAGE = register_statement(
+    f'''
+    WITH large AS (
+        SELECT COALESCE(array_agg(f.followee), '{{}}') AS ids
+        FROM followers f
+        JOIN users u ON u.id = f.followee
+        WHERE f.follower = $1 AND u.follower_count > $2
+    ),
+    entries AS (
+        (
+            SELECT t.review_id, t.activity_at
+            FROM timeline_entries t, large
+            WHERE t.user_id = $1
+              AND t.author_id <> ALL(large.ids)
+              AND (t.activity_at, t.review_id) < ($3, $4)
+            ORDER BY t.activity_at DESC, t.review_id DESC
+            LIMIT $5 + 1
+        )
+        UNION ALL
+        SELECT recent.id, recent.activity_at
+        FROM large, UNNEST(large.ids) AS author(id)
+        CROSS JOIN LATERAL (
+            SELECT r.id, COALESCE(r.updated_at, r.created_at) AS activity_at
+            FROM reviews r
+            WHERE r.user_id = author.id
+              AND (COALESCE(r.updated_at, r.created_at), r.id) < ($3, $4)
+            ORDER BY COALESCE(r.updated_at, r.created_at) DESC, r.id DESC
+            LIMIT $5 + 1
+        ) AS recent
+    )
+    SELECT {Review.columns('r')}, e.activity_at
+    FROM entries e
+    JOIN reviews r ON r.id = e.review_id
+    ORDER BY e.activity_at DESC, e.review_id DESC
+    LIMIT $5 + 1
+    ''',
+    -1, Config.FEED_FANOUT_LIMIT, *_FIRST_PAGE, 0
+)
+
+class FeedService:
+    """
+    Home feed of the reviews written by the users someone follows, newest first.
+
+    Reviews are fanned out to each follower's timeline_entries when they are written
+    (see RatingService.create_or_update_review), so reading a page is one index range
+    scan. Authors with more than FEED_FANOUT_LIMIT followers are skipped on write and
+    their reviews are merged in at read time instead. Pages are keyed by
+    (activity_at, review_id) so they stay stable while new reviews arrive.
+    """
+
+    @staticmethod
+    def parse_cursor(cursor: Optional[str]) -> Tuple[datetime, int]:
+        if not cursor:
+            return _FIRST_PAGE
+        values = decode_cursor(cursor)
+        try:
+            activity_at, review_id = values
+            return datetime.fromisoformat(activity_at), int(review_id)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    async def get_feed(
+        user_id: int,
+        limit: int = Config.FEED_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        conn=None,
+    ) -> Dict[str, Any]:
+        """Return one page of a user's feed and the cursor of the next page, if any"""
+        before_at, before_id = FeedService.parse_cursor(cursor)
+
+        async with NeonDB.read_connection(conn) as conn:
+            rows = await conn.fetch(
+                _FEED_PAGE,
+                user_id, Config.FEED_FANOUT_LIMIT, before_at, before_id, limit
+            )
+
+        reviews = TimelineReview.from_records(rows)
+        next_cursor = None
+        if len(reviews) > limit:
+            reviews = reviews[:limit]
+            last = reviews[-1]
+            next_cursor = encode_cursor(last.activity_at.isoformat(), last.id)
+        return {'data': reviews, 'next_cursor': next_cursor}
+
+    @staticmethod
+    async def backfill(follower_id: int, followee_id: int, conn=None) -> None:
+        """Copy a newly followed user's recent reviews into the follower's timeline"""
+        async with NeonDB.connection(conn) as conn:
+            await conn.execute(
+                '''
+                INSERT INTO timeline_entries (user_id, review_id, author_id, activity_at)
+                SELECT $1, r.id, r.user_id, COALESCE(r.updated_at, r.created_at)
+                FROM reviews r
+                WHERE r.user_id = $2
+                  AND COALESCE(r.updated_at, r.created_at) IS NOT NULL
+                  AND (SELECT follower_count FROM users WHERE id = $2) <= $3
+                ORDER BY COALESCE(r.updated_at, r.created_at) DESC, r.id DESC
+                LIMIT $4
+                ON CONFLICT (user_id, review_id) DO NOTHING
+                ''',
+                follower_id, followee_id, Config.FEED_FANOUT_LIMIT, Config.FEED_BACKFILL
+            )
+
+    @staticmethod
+    async def remove_author(follower_id: int, followee_id: int, conn=None) -> None:
+        """Drop an unfollowed user's reviews from the follower's timeline"""
+        async with NeonDB.connection(conn) as conn:
+            await conn.execute(
+                'DELETE FROM timeline_entries WHERE user_id = $1 AND author_id = $2',
+                follower_id, followee_id
+            )
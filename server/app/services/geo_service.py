@@ -0,0 +1,128 @@
+from app.db import BUS, NeonDB
+from app.utils.geo import GridIndex
+from config import Config
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+def _add(index: GridIndex, places) -> None:
+    for place_id, lat, lng, elo_rating in places:
+        index.update(place_id, lat, lng, elo_rating)
+
+def _rate(index: GridIndex, ratings) -> None:
+    for place_id, rating in ratings:
+        index.set_score(place_id, rating)
+
+class GeoService:
+    """
+    In-memory grid index of place coordinates scored by ELO rating, backing
+    /places/nearby. Seeded from places.latitude/longitude and place_ratings, then kept
+    in step by the rating pipeline and place creation in every worker. Rebuilt in the
+    background every GEO_RELOAD_SECONDS, while requests keep using the previous index.
+    """
+    _index: Optional[GridIndex] = None
+    _loaded_at = 0.0
+    # The one load running, which every caller needing the index shares
+    _load: Optional[asyncio.Task] = None
+    # Changes made while each running load reads the tables, which it may not see
+    _pending: List[List[Tuple[Callable, list]]] = []
+    # Bumped by invalidate(), so loads started before it don't swap their index in
+    _generation = 0
+
+    @classmethod
+    async def load(cls, conn=None) -> GridIndex:
+        generation = cls._generation
+        pending: List[Tuple[Callable, list]] = []
+        cls._pending.append(pending)
+        try:
+            async with NeonDB.connection(conn) as conn:
+                rows = await conn.fetch('''
+                    SELECT p.id, p.latitude, p.longitude, COALESCE(r.elo_rating, 1000) AS elo_rating
+                    FROM places p
+                    LEFT JOIN place_ratings r ON r.place_id = p.id
+                    WHERE p.latitude IS NOT NULL AND p.longitude IS NOT NULL
+                ''')
+            places = [(row['id'], row['latitude'], row['longitude'], float(row['elo_rating'])) for row in rows]
+            # Bucketing every place takes a while, keep serving requests meanwhile
+            built = await asyncio.get_running_loop().run_in_executor(
+                None, partial(GridIndex, places, cell_size=Config.GEO_CELL_SIZE)
+            )
+            for apply, items in pending:
+                apply(built, items)
+        finally:
+            cls._pending.remove(pending)
+
+        if generation == cls._generation:
+            cls._index = built
+            cls._loaded_at = time.monotonic()
+            logger.info(f"Loaded geo index with {len(built)} places")
+        return built
+
+    @classmethod
+    def _reload(cls) -> asyncio.Task:
+        """The running load, started if there is none"""
+        if cls._load is None or cls._load.done():
+            cls._load = asyncio.create_task(cls.load())
+            cls._load.add_done_callback(cls._loaded)
+        return cls._load
+
+    @staticmethod
+    def _loaded(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Could not load the geo index: {task.exception()}")
+
+    @classmethod
+    async def get_index(cls) -> GridIndex:
+        while cls._index is None:
+            # Nothing to answer from yet
+            await asyncio.shield(cls._reload())
+        if time.monotonic() - cls._loaded_at > Config.GEO_RELOAD_SECONDS:
+            cls._reload()
+        return cls._index
+
+    @classmethod
+    def invalidate(cls) -> None:
+        # A load already running may have missed what this drops the index for
+        cls._generation += 1
+        cls._index = None
+        cls._load = None
+
+    @classmethod
+    def add_place(cls, place_id: int, lat: float, lng: float, elo_rating: float = 1000) -> None:
+        cls.add_places([(place_id, lat, lng, elo_rating)])
+
+    @classmethod
+    def add_places(cls, places: List[Tuple[int, float, float, float]]) -> None:
+        """Add (place id, lat, lng, ELO rating) of new places"""
+        cls._added(places)
+        BUS.publish('geo.add', places)
+
+    @classmethod
+    def update_ratings(cls, ratings: Dict[int, float]) -> None:
+        """Apply committed ELO ratings to the places already in the index"""
+        items = [(place_id, float(rating)) for place_id, rating in ratings.items()]
+        cls._rated(items)
+        BUS.publish('geo.ratings', items)
+
+    @classmethod
+    def _changed(cls, apply: Callable[[GridIndex, list], None], items: list) -> None:
+        for pending in cls._pending:
+            pending.append((apply, items))
+        if cls._index is not None:
+            apply(cls._index, items)
+
+    @classmethod
+    def _added(cls, places) -> None:
+        cls._changed(_add, places)
+
+    @classmethod
+    def _rated(cls, ratings) -> None:
+        cls._changed(_rate, ratings)
+
+BUS.subscribe('geo.add', GeoService._added)
+BUS.subscribe('geo.ratings', GeoService._rated)
+BUS.on_reset(GeoService.invalidate)
@@ -0,0 +1,78 @@
+from app.db import BUS, NeonDB
+from app.utils.follow_graph import FollowGraph
+from config import Config
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class GraphService:
+    """
+    In-memory follow graph, loaded from the followers table at startup and kept in step
+    by follow_user, unfollow_user and create_user in every worker.
+    """
+    _graph: Optional[FollowGraph] = None
+
+    @classmethod
+    async def load(cls, conn=None) -> FollowGraph:
+        async with NeonDB.connection(conn) as conn:
+            users = await conn.fetch('SELECT id FROM users')
+            edges = await conn.fetch('SELECT follower, followee FROM followers')
+
+        cls._graph = FollowGraph(
+            (row['id'] for row in users),
+            ((row['follower'], row['followee']) for row in edges),
+            compact_threshold=Config.GRAPH_COMPACT_THRESHOLD
+        )
+        logger.info(f"Loaded follow graph with {len(cls._graph)} users and {cls._graph.edge_count} follows")
+        return cls._graph
+
+    @classmethod
+    async def get_graph(cls, conn=None) -> FollowGraph:
+        if cls._graph is None:
+            await cls.load(conn)
+        return cls._graph
+
+    @classmethod
+    def invalidate(cls) -> None:
+        cls._graph = None
+
+    @classmethod
+    def add_user(cls, user_id: int) -> None:
+        cls._apply([('add', user_id)])
+        BUS.publish('graph', [('add', user_id)])
+
+    @classmethod
+    def follow(cls, follower: int, followee: int) -> None:
+        cls._apply([('follow', follower, followee)])
+        BUS.publish('graph', [('follow', follower, followee)])
+
+    @classmethod
+    def unfollow(cls, follower: int, followee: int) -> None:
+        cls._apply([('unfollow', follower, followee)])
+        BUS.publish('graph', [('unfollow', follower, followee)])
+
+    @classmethod
+    def _apply(cls, changes) -> None:
+        if cls._graph is None:
+            return
+        for op, *users in changes:
+            if op == 'add':
+                cls._graph.add_user(*users)
+            elif op == 'follow':
+                cls._graph.follow(*users)
+            else:
+                cls._graph.unfollow(*users)
+
+    @classmethod
+    async def suggestions(cls, user_id: int, limit: int) -> List[int]:
+        """Friends of friends first, topped up with random users someone doesn't follow"""
+        graph = await cls.get_graph()
+        suggested = graph.suggestions(user_id, limit)
+        if len(suggested) < limit:
+            exclude = set(suggested) | {user_id} | set(graph.following(user_id, len(graph)))
+            suggested += graph.random_users(limit - len(suggested), exclude=exclude)
+        return suggested
+
+BUS.subscribe('graph', GraphService._apply)
+BUS.on_reset(GraphService.invalidate)
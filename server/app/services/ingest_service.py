@@ -0,0 +1,162 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from app.services.rating_service import RatingService
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when a submission arrives while the ingestion queue is at capacity"""
+
+class VoteIngestQueue:
+    """
+    Asynchronous ingestion of /process-matches submissions.
+
+    Submissions are queued and applied by a background dispatcher. Each round it drains
+    up to max_batch queued submissions, splits them into groups that share no place and
+    applies the groups concurrently on up to `workers` connections. Within a group,
+    submissions are applied in arrival order in one transaction, so every place is
+    written once per round however many votes it received, and votes on the same place
+    are never applied out of order.
+    """
+
+    def __init__(
+        self,
+        rating_service: RatingService,
+        workers: int = 4,
+        max_batch: int = 200,
+        max_depth: int = 10000,
+    ):
+        self.rating_service = rating_service
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_depth = max_depth
+        self._queue: deque = deque()
+        self._ready = asyncio.Event()
+        self._ids = itertools.count(1)
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.applied = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    async def start(self) -> None:
+        if self._dispatcher is None:
+            self._stopping = False
+            self._dispatcher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop accepting work and wait for queued submissions to be applied"""
+        self._stopping = True
+        self._ready.set()
+        if self._dispatcher is not None:
+            await self._dispatcher
+            self._dispatcher = None
+
+    def enqueue(self, data: Dict[str, Any]) -> int:
+        """Queue a submission and return its id"""
+        if self._stopping:
+            raise QueueFullError('Ingestion queue is shutting down')
+        if len(self._queue) >= self.max_depth:
+            raise QueueFullError('Ingestion queue is full')
+
+        submission_id = next(self._ids)
+        self._queue.append((submission_id, time.monotonic(), data))
+        self._ready.set()
+        return submission_id
+
+    def stats(self) -> Dict[str, Any]:
+        oldest = self._queue[0][1] if self._queue else None
+        return {
+            'depth': len(self._queue),
+            'max_depth': self.max_depth,
+            'applied': self.applied,
+            'failed': self.failed,
+            'batches': self.batches,
+            'oldest_wait_ms': (time.monotonic() - oldest) * 1000 if oldest else 0.0,
+            'last_apply_lag_ms': self.last_lag * 1000,
+            'max_apply_lag_ms': self.max_lag * 1000,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queue:
+                if self._stopping:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            groups = self._group(batch)
+            semaphore = asyncio.Semaphore(self.workers)
+
+            async def apply(group):
+                async with semaphore:
+                    await self._apply_group(group)
+
+            await asyncio.gather(*(apply(group) for group in groups))
+            self.batches += 1
+
+    @staticmethod
+    def _places(data: Dict[str, Any]) -> set:
+        places = set()
+        for match in data.get('matches', []):
+            places.update(filter(None, [match.get('winner'), match.get('loser')] + match.get('tie', [])))
+        if data.get('place_id'):
+            places.add(data['place_id'])
+        return places
+
+    def _group(self, batch: List[tuple]) -> List[List[tuple]]:
+        """Split a batch into groups of submissions connected by shared places, keeping order"""
+        parent = {}
+
+        def find(key):
+            parent.setdefault(key, key)
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        roots = []
+        for item in batch:
+            places = [('place', pid) for pid in self._places(item[2])] or [('submission', item[0])]
+            root = find(places[0])
+            for key in places[1:]:
+                other = find(key)
+                if other != root:
+                    parent[other] = root
+            roots.append(places[0])
+
+        groups: Dict[Any, List[tuple]] = {}
+        for item, key in zip(batch, roots):
+            groups.setdefault(find(key), []).append(item)
+        return list(groups.values())
+
+    async def _apply_group(self, group: List[tuple]) -> None:
+        try:
+            await self.rating_service.apply_submissions([data for _, _, data in group])
+            self._record_applied(group)
+        except Exception as e:
+            if len(group) == 1:
+                self.failed += 1
+                logger.error(f"Failed to apply submission {group[0][0]}: {str(e)}")
+                return
+            # Don't let one bad submission drop the rest of its group
+            logger.warning(f"Failed to apply a group of {len(group)} submissions, applying one by one")
+            for item in group:
+                await self._apply_group([item])
+
+    def _record_applied(self, group: List[tuple]) -> None:
+        now = time.monotonic()
+        for _, enqueued_at, _ in group:
+            self.last_lag = now - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+        self.applied += len(group)
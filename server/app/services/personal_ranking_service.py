@@ -0,0 +1,312 @@
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db import NeonDB
+from app.models.place import PersonalRankingEntry
+from app.utils.metrics import REGISTRY
+from app.utils.tokens import sign_token, verify_token
+from config import Config
+
+# Answer to "is the new place better than the candidate?" -> score of the new place
+OUTCOMES = {'better': 1.0, 'tie': 0.5, 'worse': 0.0}
+
+# Neighbouring positions closer than this are renumbered before inserting between them
+_MIN_GAP = 1e-6
+
+# Namespace of the advisory locks serializing writes to one user's list
+_LOCK_NAMESPACE = 0x70726b
+
+INSERTION_COMPARISONS = REGISTRY.histogram(
+    'personal_ranking_comparisons',
+    'Comparisons it took to insert a place into a personal ranking',
+    buckets=(0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 16),
+)
+
+class PersonalRankingService:
+    """
+    Every user's ordered list of the places they reviewed, and binary insertion into it.
+
+    Inserting a place is a session of comparisons whose state the client holds in a
+    signed token. Each answer halves the part of the list the place can still go in,
+    so placing it among n places takes about log2(n) comparisons. That part is kept as
+    the pair of places bounding it rather than as list indices, so places inserted by
+    other sessions in the meantime are simply searched too. Once nothing is left
+    between the bounds, the place is written halfway between their positions and the
+    session's comparisons are returned as one submission for the rating pipeline.
+
+    A session commits at most once: its token carries the version of the place's entry
+    at the start, and a token whose entry has changed since is refused.
+    """
+
+    @staticmethod
+    def _sign(state: Dict[str, Any]) -> str:
+        return sign_token(state, Config.SECRET_KEY, Config.RANKING_SESSION_SECONDS)
+
+    @staticmethod
+    def _version(updated_at) -> Optional[str]:
+        """Version of a place's entry in a list, None if it isn't in it"""
+        return updated_at.isoformat() if updated_at is not None else None
+
+    @staticmethod
+    def _verify(token: str, user_id: int) -> Dict[str, Any]:
+        state = verify_token(token, Config.SECRET_KEY)
+        if state.get('u') != user_id or state.get('c') is None:
+            raise ValueError('Invalid token')
+        return state
+
+    @staticmethod
+    async def get_ranking(
+        user_id: int,
+        limit: int,
+        after: Optional[Tuple[float, int, int]] = None,
+        conn=None,
+    ) -> Tuple[List[PersonalRankingEntry], Optional[Tuple[float, int, int]]]:
+        """
+        A page of a user's list, best first, after the (position, id, rank) of the last
+        entry of the previous page. Returns the entries and the key of the next page.
+        """
+        position, place_id, rank = after if after else (None, 0, 0)
+        async with NeonDB.read_connection(conn) as conn:
+            rows = await conn.fetch(
+                '''
+                SELECT p.id, p.place_id, p.name, p.image, p.types, p.formatted_address,
+                    pr.elo_rating, r.position
+                FROM personal_rankings r
+                JOIN places p ON p.id = r.place_id
+                LEFT JOIN place_ratings pr ON pr.place_id = r.place_id
+                WHERE r.user_id = $1
+                    AND ($2::float8 IS NULL OR (r.position, r.place_id) > ($2, $3))
+                ORDER BY r.position, r.place_id
+                LIMIT $4 + 1
+                ''',
+                user_id, position, place_id, limit
+            )
+
+        entries = [
+            PersonalRankingEntry(**row, rank=rank + i + 1) for i, row in enumerate(rows[:limit])
+        ]
+        next_key = None
+        if len(rows) > limit:
+            last = entries[-1]
+            next_key = (last.position, last.id, last.rank)
+        return entries, next_key
+
+    @classmethod
+    async def start(cls, user_id: int, place_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Start inserting a place into a user's list, or moving it if it is already there.
+        Returns the first comparison to make, or the committed result for an empty list,
+        and None if there is no such user or place.
+        """
+        async with NeonDB.connection() as conn:
+            row = await conn.fetchrow(
+                '''
+                SELECT EXISTS (SELECT 1 FROM users WHERE id = $1)
+                    AND EXISTS (SELECT 1 FROM places WHERE id = $2) AS exists,
+                    (SELECT updated_at FROM personal_rankings
+                     WHERE user_id = $1 AND place_id = $2) AS updated_at
+                ''',
+                user_id, place_id
+            )
+        if not row['exists']:
+            return None
+
+        state = {
+            'u': user_id, 'p': place_id, 'lo': None, 'hi': None, 'm': [],
+            'v': cls._version(row['updated_at']),
+        }
+        return await cls._step(state)
+
+    @classmethod
+    async def answer(cls, user_id: int, token: str, outcome: str) -> Dict[str, Any]:
+        """
+        Apply the answer to a session's current comparison: 'better' if the new place is
+        better than the candidate, 'worse' if not, and 'tie' to place it right below the
+        candidate. Returns the next comparison or the committed result.
+        """
+        if outcome not in OUTCOMES:
+            raise ValueError(f"outcome must be one of {', '.join(OUTCOMES)}")
+        state = cls._verify(token, user_id)
+        candidate = state.pop('c')
+        state['m'].append([candidate, OUTCOMES[outcome]])
+
+        if outcome == 'better':
+            state['hi'] = candidate
+        elif outcome == 'worse':
+            state['lo'] = candidate
+        else:
+            # Nothing left to search: the place goes between the candidate and the next one
+            state['lo'] = candidate
+            async with NeonDB.connection() as conn:
+                state['hi'] = await conn.fetchval(
+                    '''
+                    SELECT place_id
+                    FROM personal_rankings
+                    WHERE user_id = $1 AND place_id <> $2
+                        AND position > (
+                            SELECT position FROM personal_rankings
+                            WHERE user_id = $1 AND place_id = $3
+                        )
+                    ORDER BY position
+                    LIMIT 1
+                    ''',
+                    user_id, state['p'], candidate
+                )
+        return await cls._step(state)
+
+    @classmethod
+    async def _step(cls, state: Dict[str, Any]) -> Dict[str, Any]:
+        user_id, place_id = state['u'], state['p']
+        async with NeonDB.connection() as conn:
+            async with conn.transaction():
+                # Commits to one list apply one at a time, and a range found empty stays so
+                await conn.execute(
+                    'SELECT pg_advisory_xact_lock($1, $2)', _LOCK_NAMESPACE, user_id
+                )
+                row = await conn.fetchrow(
+                    '''
+                    WITH bounds AS (
+                        SELECT
+                            (SELECT position FROM personal_rankings
+                             WHERE user_id = $1 AND place_id = $3) AS lo,
+                            (SELECT position FROM personal_rankings
+                             WHERE user_id = $1 AND place_id = $4) AS hi
+                    ),
+                    candidates AS (
+                        SELECT r.place_id, r.position
+                        FROM personal_rankings r, bounds b
+                        WHERE r.user_id = $1 AND r.place_id <> $2
+                            AND (b.lo IS NULL OR r.position > b.lo)
+                            AND (b.hi IS NULL OR r.position < b.hi)
+                    )
+                    SELECT b.lo, b.hi, (SELECT COUNT(*) FROM candidates) AS remaining,
+                        (SELECT updated_at FROM personal_rankings
+                         WHERE user_id = $1 AND place_id = $2) AS updated_at,
+                        p.id, p.place_id, p.name, p.image, p.types, p.formatted_address
+                    FROM bounds b
+                    LEFT JOIN LATERAL (
+                        SELECT place_id FROM candidates
+                        ORDER BY position
+                        OFFSET (SELECT COUNT(*) FROM candidates) / 2
+                        LIMIT 1
+                    ) c ON true
+                    LEFT JOIN places p ON p.id = c.place_id
+                    ''',
+                    user_id, place_id, state['lo'], state['hi']
+                )
+                if cls._version(row['updated_at']) != state.get('v'):
+                    raise ValueError('Session already committed')
+
+                if row['id'] is not None:
+                    state['c'] = row['id']
+                    return {
+                        'done': False,
+                        'place_id': place_id,
+                        'token': cls._sign(state),
+                        'candidate': {
+                            'id': row['id'],
+                            'place_id': row['place_id'],
+                            'name': row['name'],
+                            'image': row['image'],
+                            'types': row['types'],
+                            'formatted_address': row['formatted_address'],
+                        },
+                        'remaining': math.ceil(math.log2(row['remaining'] + 1)),
+                        'comparisons': len(state['m']),
+                    }
+
+                rank = await cls._commit(conn, state, row['lo'], row['hi'])
+
+        INSERTION_COMPARISONS.observe(len(state['m']))
+        return {
+            'done': True,
+            'place_id': place_id,
+            'rank': rank,
+            'comparisons': len(state['m']),
+            'matches': cls.matches(place_id, state['m']),
+        }
+
+    @staticmethod
+    async def _commit(conn, state: Dict[str, Any], lo: Optional[float], hi: Optional[float]) -> int:
+        """Write the place between the bounds and return its rank in the list"""
+        user_id, place_id = state['u'], state['p']
+        if lo is not None and hi is not None and hi - lo < _MIN_GAP:
+            # Repeated insertions in one spot used up the precision between two
+            # positions, spread the whole list out again
+            await conn.execute(
+                '''
+                UPDATE personal_rankings r
+                SET position = n.rank
+                FROM (
+                    SELECT place_id, ROW_NUMBER() OVER (ORDER BY position, place_id) AS rank
+                    FROM personal_rankings
+                    WHERE user_id = $1
+                ) n
+                WHERE r.user_id = $1 AND r.place_id = n.place_id
+                ''',
+                user_id
+            )
+            rows = await conn.fetch(
+                '''
+                SELECT place_id, position
+                FROM personal_rankings
+                WHERE user_id = $1 AND place_id = ANY($2::int[])
+                ''',
+                user_id, [state['lo'], state['hi']]
+            )
+            positions = {row['place_id']: row['position'] for row in rows}
+            lo, hi = positions[state['lo']], positions[state['hi']]
+
+        if lo is None and hi is None:
+            position = 1.0
+        elif lo is None:
+            position = hi - 1
+        elif hi is None:
+            position = lo + 1
+        else:
+            position = (lo + hi) / 2
+
+        return await conn.fetchval(
+            '''
+            WITH placed AS (
+                INSERT INTO personal_rankings (user_id, place_id, position)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (user_id, place_id) DO UPDATE
+                SET position = EXCLUDED.position,
+                    updated_at = NOW()
+            )
+            SELECT COUNT(*) + 1
+            FROM personal_rankings
+            WHERE user_id = $1 AND place_id <> $2 AND position < $3
+            ''',
+            user_id, place_id, position
+        )
+
+    @staticmethod
+    def matches(place_id: int, comparisons: List[List[Any]]) -> List[Dict[str, Any]]:
+        """A session's comparisons as /process-matches matches"""
+        matches = []
+        for candidate, score in comparisons:
+            if score == 1.0:
+                matches.append({'winner': place_id, 'loser': candidate})
+            elif score == 0.0:
+                matches.append({'winner': candidate, 'loser': place_id})
+            else:
+                matches.append({'tie': [place_id, candidate]})
+        return matches
+
+    @staticmethod
+    async def get_review(user_id: int, place_id: int, conn=None) -> Optional[Dict[str, Any]]:
+        """The id and image of a user's latest review of a place, to update it in place"""
+        async with NeonDB.connection(conn) as conn:
+            row = await conn.fetchrow(
+                '''
+                SELECT id, image
+                FROM reviews
+                WHERE user_id = $1 AND place_id = $2
+                ORDER BY id DESC
+                LIMIT 1
+                ''',
+                user_id, place_id
+            )
+        return dict(row) if row else None
@@ -0,0 +1,133 @@
+from app.db import BUS, NeonDB
+from app.utils.bloom import BloomFilter
+from app.utils.metrics import REGISTRY
+from config import Config
+from typing import Iterable, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Smallest filter built, so an empty table doesn't rebuild on every insert
+_MIN_CAPACITY = 1024
+
+PLACE_FILTER_CHECKS = REGISTRY.counter(
+    'place_filter_checks_total', 'Google place id lookups checked against the known place filter',
+    ('result',)
+)
+
+class PlaceFilterService:
+    """
+    Bloom filter of the Google place ids in places, so lookups of places nobody has
+    added yet are answered without a query. Loaded at startup, kept in step by place
+    creation in every worker, and rebuilt in the background every
+    PLACE_FILTER_RELOAD_SECONDS to pick up places inserted outside the API, while
+    lookups keep using the previous filter.
+
+    Built for twice the places it is loaded with, and rebuilt once they double again.
+    """
+    _filter: Optional[BloomFilter] = None
+    _loaded_at = 0.0
+    # The one load running, which every caller needing the filter shares
+    _load: Optional[asyncio.Task] = None
+    # Ids added while each running load reads the table, which it may not see
+    _pending: List[List[str]] = []
+    # Bumped by invalidate(), so loads started before it don't swap their filter in
+    _generation = 0
+
+    @classmethod
+    async def load(cls, conn=None) -> BloomFilter:
+        generation = cls._generation
+        pending: List[str] = []
+        cls._pending.append(pending)
+        try:
+            async with NeonDB.connection(conn) as conn:
+                rows = await conn.fetch('SELECT place_id FROM places WHERE place_id IS NOT NULL')
+            ids = [row['place_id'] for row in rows] + pending
+            seen = len(pending)
+            # Hashing every id takes a while, keep serving requests meanwhile
+            built = await asyncio.get_running_loop().run_in_executor(
+                None, BloomFilter, max(2 * len(ids), _MIN_CAPACITY), Config.PLACE_FILTER_ERROR_RATE, ids
+            )
+            built.update(pending[seen:])
+        finally:
+            cls._pending.remove(pending)
+
+        if generation == cls._generation:
+            cls._filter = built
+            cls._loaded_at = time.monotonic()
+            logger.info(f"Loaded place filter with {len(built)} places in {built.size} bits")
+        return built
+
+    @classmethod
+    def _reload(cls) -> asyncio.Task:
+        """The running load, started if there is none"""
+        if cls._load is None or cls._load.done():
+            cls._load = asyncio.create_task(cls.load())
+            cls._load.add_done_callback(cls._loaded)
+        return cls._load
+
+    @staticmethod
+    def _loaded(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Could not load the place filter: {task.exception()}")
+
+    @classmethod
+    async def get_filter(cls) -> BloomFilter:
+        while cls._filter is None:
+            # Nothing to answer from yet
+            await asyncio.shield(cls._reload())
+        if time.monotonic() - cls._loaded_at > Config.PLACE_FILTER_RELOAD_SECONDS:
+            cls._reload()
+        return cls._filter
+
+    @classmethod
+    def invalidate(cls) -> None:
+        # A load already running may have missed what this drops the filter for
+        cls._generation += 1
+        cls._filter = None
+        cls._load = None
+
+    @classmethod
+    async def might_exist(cls, google_place_id: str) -> bool:
+        """False only if no place has the id, True if one may"""
+        if not Config.PLACE_FILTER_ENABLED:
+            return True
+        found = google_place_id in await cls.get_filter()
+        PLACE_FILTER_CHECKS.inc(result='maybe' if found else 'absent')
+        return found
+
+    @classmethod
+    def contains(cls, google_place_id: str) -> bool:
+        """Whether the loaded filter reports the id, without loading it"""
+        return cls._filter is not None and google_place_id in cls._filter
+
+    @classmethod
+    def add(cls, google_place_ids: Iterable[str]) -> None:
+        """Record inserted places, in every worker"""
+        ids = [pid for pid in google_place_ids if pid]
+        if ids:
+            cls._added(ids)
+            BUS.publish('places.known', ids)
+
+    @classmethod
+    def _added(cls, ids) -> None:
+        for pending in cls._pending:
+            pending.extend(ids)
+        if cls._filter is None:
+            return
+        cls._filter.update(ids)
+        if len(cls._filter) > cls._filter.capacity:
+            # Past capacity the false positive rate climbs, rebuild a larger one
+            cls._loaded_at = 0.0
+
+    @classmethod
+    def stats(cls):
+        return {
+            'enabled': Config.PLACE_FILTER_ENABLED,
+            **(cls._filter.stats() if cls._filter is not None else {'keys': 0}),
+        }
+
+BUS.subscribe('places.known', PlaceFilterService._added)
+BUS.on_reset(PlaceFilterService.invalidate)
@@ -0,0 +1,281 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.db import NeonDB, register_statement
+from app.models.place import Place
+from app.models.review import Review
+from app.utils.geo import parse_location
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.serialization import dumps
+from config import Config
+
+# Sorts after every real row, so the first page needs no special case in the query
+_MAX_TIMESTAMP = datetime.max
+_MAX_ID = 2 ** 31 - 1
+
+REVIEW_ORDERS = ('recent', 'rating')
+
+_REVIEW_QUERIES = {
+    'recent': f'''
+        SELECT {Review.json_object('r')}::text AS item, r.id,
+            COALESCE(r.updated_at, r.created_at) AS activity_at
+        FROM reviews r
+        WHERE r.place_id = $1
+          AND (COALESCE(r.updated_at, r.created_at), r.id) < ($2, $3)
+        ORDER BY COALESCE(r.updated_at, r.created_at) DESC, r.id DESC
+    ''',
+    'rating': f'''
+        SELECT {Review.json_object('r')}::text AS item, r.id, r.rating
+        FROM reviews r
+        WHERE r.place_id = $1
+          AND ($2::numeric IS NULL OR (r.rating, r.id) < ($2, $3) OR r.rating IS NULL)
+        ORDER BY r.rating DESC NULLS LAST, r.id DESC
+    ''',
+}
+
+# Pages past the rated reviews, which come first, after the id of an unrated one
+_UNRATED_REVIEWS_PAGE = register_statement(f'''
+    SELECT {Review.json_object('r')}::text AS item, r.id, r.rating
+    FROM reviews r
+    WHERE r.place_id = $1 AND r.rating IS NULL AND r.id < $2
+    ORDER BY r.rating DESC NULLS LAST, r.id DESC
+    LIMIT $3 + 1
+''', -1, 0, 0)
+
+# Pages of reviews: the export streams the same queries without a limit
+_REVIEW_PAGE_QUERIES = {
+    'recent': register_statement(
+        _REVIEW_QUERIES['recent'] + 'LIMIT $4 + 1', -1, _MAX_TIMESTAMP, _MAX_ID, 0
+    ),
+    'rating': register_statement(_REVIEW_QUERIES['rating'] + 'LIMIT $4 + 1', -1, None, _MAX_ID, 0),
+}
+
+_PLACE_IDS = register_statement('SELECT id FROM places WHERE place_id = $1', '')
+
+# Columns a new place is inserted with, in the order of place_record()
+_INSERT_COLUMNS = (
+    'place_id', 'avg_rating', 'location', 'image', 'name', 'website',
+    'formatted_address', 'types', 'latitude', 'longitude',
+)
+
+# Serializes place inserts, so each Google place id is inserted once. places.place_id
+# can't have a unique constraint, places created before upserts may share one
+_INSERT_LOCK = 0x706c6163
+
+_CURSOR_KEYS = {
+    'recent': lambda row: (row['activity_at'].isoformat(), row['id']),
+    'rating': lambda row: (str(row['rating']) if row['rating'] is not None else None, row['id']),
+}
+
+def _json_array(items: List[str]) -> str:
+    return '[' + ','.join(items) + ']'
+
+class PlaceService:
+    """
+    Place detail and its reviews, read as keyset pages.
+
+    Rows are encoded to JSON by Postgres and spliced into the response as text, so a
+    review is serialized once on its way to the client instead of being parsed into
+    Python and encoded again.
+    """
+
+    @staticmethod
+    def _parse_cursor(order: str, cursor: Optional[str]) -> Tuple[Any, int]:
+        """The sort key and id a page starts after, a None rating for unrated reviews"""
+        if order not in REVIEW_ORDERS:
+            raise ValueError('Invalid order')
+        try:
+            if order == 'recent':
+                before_at, before_id = decode_cursor(cursor) if cursor else (None, _MAX_ID)
+                before_at = datetime.fromisoformat(before_at) if before_at else _MAX_TIMESTAMP
+                return before_at, int(before_id)
+            before_rating, before_id = decode_cursor(cursor) if cursor else (None, _MAX_ID)
+            before_rating = Decimal(before_rating) if before_rating is not None else None
+            return before_rating, int(before_id)
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    async def get_reviews(
+        place_id: int,
+        limit: int = Config.PLACE_REVIEWS_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        order: str = 'recent',
+        conn=None,
+    ) -> Tuple[str, Optional[str]]:
+        """
+        One page of a place's reviews, most recent or highest rated first, as the JSON
+        text of the array and the cursor of the next page
+        """
+        before_key, before_id = PlaceService._parse_cursor(order, cursor)
+
+        async with NeonDB.read_connection(conn) as conn:
+            if order == 'rating' and cursor and before_key is None:
+                rows = await conn.fetch(_UNRATED_REVIEWS_PAGE, place_id, before_id, limit)
+            else:
+                rows = await conn.fetch(
+                    _REVIEW_PAGE_QUERIES[order], place_id, before_key, before_id, limit
+                )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(*_CURSOR_KEYS[order](rows[-1]))
+        return _json_array([row['item'] for row in rows]), next_cursor
+
+    @staticmethod
+    async def get_place_ids(google_place_id: str, conn=None) -> List[int]:
+        async with NeonDB.read_connection(conn) as conn:
+            rows = await conn.fetch(_PLACE_IDS, google_place_id)
+        return [row['id'] for row in rows]
+
+    @staticmethod
+    async def get_place(
+        google_place_id: str,
+        limit: int = Config.PLACE_REVIEWS_PAGE_SIZE,
+        order: str = 'recent',
+        conn=None,
+    ) -> Tuple[bytes, List[int]]:
+        """
+        The /places/<place_id> response body: matching places with the first page of
+        their reviews embedded, and the cursor of the next page of the first place's
+        reviews. Also returns the ids of the places, for cache tags.
+        """
+        async with NeonDB.read_connection(conn) as conn:
+            places = await conn.fetch(
+                f'''
+                SELECT {Place.json_object('p')}::text AS item, p.id
+                FROM places p
+                WHERE p.place_id = $1
+                ''',
+                google_place_id
+            )
+
+            data = []
+            reviews_cursor = None
+            for place in places:
+                reviews, next_cursor = await PlaceService.get_reviews(
+                    place['id'], limit, None, order, conn
+                )
+                reviews_cursor = reviews_cursor or next_cursor
+                # json_build_object always makes an object, add the reviews as its last key
+                data.append(place['item'][:-1] + ',"reviews":' + reviews + '}')
+
+        body = b'{"data":%s,"reviews_cursor":%s}' % (_json_array(data).encode(), dumps(reviews_cursor))
+        return body, [place['id'] for place in places]
+
+    @staticmethod
+    async def stream_reviews(
+        place_id: int,
+        order: str = 'recent',
+        fetch_size: int = Config.EXPORT_FETCH_SIZE,
+    ) -> AsyncIterator[str]:
+        """
+        Every review of a place as newline delimited JSON, read through a server-side
+        cursor fetch_size rows at a time so the full list is never held in memory
+        """
+        if order not in REVIEW_ORDERS:
+            raise ValueError('Invalid order')
+        before_key, before_id = PlaceService._parse_cursor(order, None)
+
+        async with NeonDB.read_connection() as conn:
+            # Server-side cursors only live inside a transaction
+            async with conn.transaction(readonly=True):
+                lines: List[str] = []
+                async for row in conn.cursor(
+                    _REVIEW_QUERIES[order], place_id, before_key, before_id, prefetch=fetch_size
+                ):
+                    lines.append(row['item'])
+                    if len(lines) >= fetch_size:
+                        yield '\n'.join(lines) + '\n'
+                        lines = []
+                if lines:
+                    yield '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def place_record(data: Dict[str, Any]) -> Tuple:
+        """A /places/create body as values of _INSERT_COLUMNS"""
+        coordinates = parse_location(data.get('location')) or (None, None)
+        return (
+            data.get('place_id'),
+            data.get('rating', 0),
+            data.get('location'),
+            data.get('image'),
+            data.get('name', ''),
+            data.get('website', ''),
+            data.get('formatted_address', ''),
+            data.get('types', ''),
+            *coordinates,
+        )
+
+    @staticmethod
+    async def upsert_place(record: Tuple, conn) -> Tuple[Place, bool]:
+        """
+        Insert a place unless one with its Google place id exists. Returns the place
+        and whether it was inserted. Runs in conn's transaction, which holds the insert
+        lock until it commits.
+        """
+        await conn.execute('SELECT pg_advisory_xact_lock($1)', _INSERT_LOCK)
+        row = await conn.fetchrow(
+            f'''
+            WITH existing AS (
+                SELECT {Place.columns()}
+                FROM places
+                WHERE place_id = $1
+                ORDER BY id
+                LIMIT 1
+            ),
+            inserted AS (
+                INSERT INTO places ({', '.join(_INSERT_COLUMNS)})
+                SELECT $1, $2::numeric, $3, $4, $5, $6, $7, $8, $9::float8, $10::float8
+                WHERE NOT EXISTS (SELECT 1 FROM existing)
+                RETURNING {Place.columns()}
+            )
+            SELECT *, true AS created FROM inserted
+            UNION ALL
+            SELECT *, false AS created FROM existing
+            ''',
+            *record
+        )
+        row = dict(row)
+        created = row.pop('created')
+        return Place(**row), created
+
+    @staticmethod
+    async def upsert_places(records: List[Tuple], conn) -> Tuple[List[Place], Set[int]]:
+        """
+        upsert_place() for many places: the ones not known yet are loaded with one COPY.
+        Returns a place per distinct Google place id, in request order, and the ids of
+        the inserted ones.
+        """
+        await conn.execute('SELECT pg_advisory_xact_lock($1)', _INSERT_LOCK)
+        requested = list(dict.fromkeys(record[0] for record in records))
+        rows = await conn.fetch(
+            'SELECT DISTINCT place_id FROM places WHERE place_id = ANY($1::text[])', requested
+        )
+        existing = {row['place_id'] for row in rows}
+
+        new: Dict[str, Tuple] = {}
+        for record in records:
+            if record[0] not in existing:
+                new.setdefault(record[0], record)
+        if new:
+            await conn.copy_records_to_table(
+                'places', records=list(new.values()), columns=list(_INSERT_COLUMNS)
+            )
+
+        rows = await conn.fetch(
+            f'''
+            SELECT DISTINCT ON (place_id) {Place.columns()}
+            FROM places
+            WHERE place_id = ANY($1::text[])
+            ORDER BY place_id, id
+            ''',
+            requested
+        )
+        places = {row['place_id']: Place.from_record(row) for row in rows}
+        return (
+            [places[place_id] for place_id in requested],
+            {places[place_id].id for place_id in new},
+        )
@@ -0,0 +1,208 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+
+from app.db import NeonDB, register_statement
+from app.models.review import Review
+from app.models.user import Connection, User
+from app.utils.pagination import decode_cursor, encode_cursor
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every real row, so the first page needs no special case in the query
+_MAX_TIMESTAMP = datetime.max
+_MAX_ID = 2 ** 31 - 1
+
+REVIEW_ORDERS = ('recent', 'rating')
+
+_USER_BY_CLERK_ID = register_statement(
+    f'SELECT {User.columns()} FROM users WHERE clerk_id = $1', ''
+)
+
+class ProfileService:
+    """
+    A user's profile assembled from independent sections: their reviews, followers and
+    following. Every section is a separately limited keyset query, so the cost of a
+    profile is bounded by the page size rather than by the size of the user's graph,
+    and the sections run concurrently on their own pooled connections.
+    """
+
+    @staticmethod
+    def _page(rows: List[Any], limit: int, key, build) -> Dict[str, Any]:
+        """Split limit + 1 fetched rows into a page of models and the cursor of the next one"""
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(*key(rows[-1]))
+        return {'data': build(rows), 'next_cursor': next_cursor}
+
+    @staticmethod
+    async def get_user_by_clerk_id(clerk_id: str, conn=None) -> Optional[User]:
+        async with NeonDB.read_connection(conn) as conn:
+            row = await conn.fetchrow(_USER_BY_CLERK_ID, clerk_id)
+        return User.from_record(row)
+
+    @staticmethod
+    async def get_counts(user_id: int, conn=None) -> Dict[str, int]:
+        async with NeonDB.read_connection(conn) as conn:
+            row = await conn.fetchrow(
+                '''
+                SELECT
+                    (SELECT COUNT(*) FROM reviews WHERE user_id = $1) AS review_count,
+                    follower_count,
+                    following_count
+                FROM users
+                WHERE id = $1
+                ''',
+                user_id
+            )
+        return dict(row)
+
+    @staticmethod
+    async def get_reviews(
+        user_id: int,
+        limit: int = Config.PROFILE_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        order: str = 'recent',
+        conn=None,
+    ) -> Dict[str, Any]:
+        """
+        One page of a user's reviews, either most recent first or in their personal
+        ranking order (lowest ELO rating first)
+        """
+        if order not in REVIEW_ORDERS:
+            raise ValueError('Invalid order')
+
+        try:
+            if order == 'recent':
+                before_at, before_id = decode_cursor(cursor) if cursor else (None, _MAX_ID)
+                before_at = datetime.fromisoformat(before_at) if before_at else _MAX_TIMESTAMP
+                before_id = int(before_id)
+            else:
+                after_rating, after_id = decode_cursor(cursor) if cursor else (None, 0)
+                after_rating = Decimal(after_rating) if after_rating is not None else None
+                after_id = int(after_id)
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValueError('Invalid cursor')
+
+        async with NeonDB.read_connection(conn) as conn:
+            if order == 'recent':
+                rows = await conn.fetch(
+                    f'''
+                    SELECT {Review.columns('r')}
+                    FROM reviews r
+                    WHERE r.user_id = $1
+                      AND (COALESCE(r.updated_at, r.created_at), r.id) < ($2, $3)
+                    ORDER BY COALESCE(r.updated_at, r.created_at) DESC, r.id DESC
+                    LIMIT $4 + 1
+                    ''',
+                    user_id, before_at, before_id, limit
+                )
+                return ProfileService._page(
+                    rows, limit,
+                    lambda row: ((row['updated_at'] or row['created_at']).isoformat(), row['id']),
+                    Review.from_records
+                )
+
+            if cursor and after_rating is None:
+                # Past the rated reviews, which come first
+                rows = await conn.fetch(
+                    f'''
+                    SELECT {Review.columns('r')}
+                    FROM reviews r
+                    WHERE r.user_id = $1 AND r.elo_rating IS NULL AND r.id > $2
+                    ORDER BY r.elo_rating NULLS LAST, r.id
+                    LIMIT $3 + 1
+                    ''',
+                    user_id, after_id, limit
+                )
+            else:
+                rows = await conn.fetch(
+                    f'''
+                    SELECT {Review.columns('r')}
+                    FROM reviews r
+                    WHERE r.user_id = $1
+                      AND ($2::numeric IS NULL OR (r.elo_rating, r.id) > ($2, $3)
+                           OR r.elo_rating IS NULL)
+                    ORDER BY r.elo_rating NULLS LAST, r.id
+                    LIMIT $4 + 1
+                    ''',
+                    user_id, after_rating, after_id, limit
+                )
+            return ProfileService._page(
+                rows, limit,
+                lambda row: (
+                    str(row['elo_rating']) if row['elo_rating'] is not None else None, row['id']
+                ),
+                Review.from_records
+            )
+
+    @staticmethod
+    async def get_connections(
+        user_id: int,
+        direction: str,
+        limit: int = Config.PROFILE_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        conn=None,
+    ) -> Dict[str, Any]:
+        """One page of a user's followers or following, most recent follow first"""
+        if direction == 'followers':
+            own, other = 'followee', 'follower'
+        elif direction == 'following':
+            own, other = 'follower', 'followee'
+        else:
+            raise ValueError('Invalid direction')
+
+        try:
+            before_id = int(decode_cursor(cursor)[0]) if cursor else _MAX_ID
+        except (IndexError, TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+
+        async with NeonDB.read_connection(conn) as conn:
+            rows = await conn.fetch(
+                f'''
+                SELECT {Connection.columns('u')}, f.id AS follow_id
+                FROM followers f
+                JOIN users u ON u.id = f.{other}
+                WHERE f.{own} = $1 AND f.id < $2
+                ORDER BY f.id DESC
+                LIMIT $3 + 1
+                ''',
+                user_id, before_id, limit
+            )
+        return ProfileService._page(
+            rows, limit, lambda row: (row['follow_id'],),
+            # The follow id only orders the page, it isn't part of the model
+            lambda rows: [Connection(*row[:-1]) for row in rows]
+        )
+
+    @staticmethod
+    async def get_profile(
+        clerk_id: str,
+        limit: int = Config.PROFILE_PAGE_SIZE,
+    ) -> Optional[Dict[str, Any]]:
+        """The user row with section counts, and the first page and cursor of each section"""
+        user = await ProfileService.get_user_by_clerk_id(clerk_id)
+        if user is None:
+            return None
+
+        # Each section acquires its own connection so they run concurrently
+        counts, reviews, followers, following = await asyncio.gather(
+            ProfileService.get_counts(user.id),
+            ProfileService.get_reviews(user.id, limit),
+            ProfileService.get_connections(user.id, 'followers', limit),
+            ProfileService.get_connections(user.id, 'following', limit),
+        )
+
+        user = user.to_dict()
+        user.update(counts)
+        user['reviews'] = reviews['data']
+        user['reviews_cursor'] = reviews['next_cursor']
+        user['followers'] = followers['data']
+        user['followers_cursor'] = followers['next_cursor']
+        user['following'] = following['data']
+        user['following_cursor'] = following['next_cursor']
+        return user
@@ -0,0 +1,282 @@
+from app.db import BUS, NeonDB
+from app.utils.ranking import RankIndex
+from config import Config
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import itertools
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Serializes rank writes, so each is computed from an index holding every earlier one
+_RANK_LOCK = 0x72616e6b
+
+def place_types(types: Optional[str]) -> Set[str]:
+    """Categories of a place from the ' · ' separated types string stored by create_place"""
+    return {t.strip().lower() for t in re.split(r'[·,]', types or '') if t.strip()}
+
+def place_regions(formatted_address: Optional[str]) -> Set[str]:
+    """
+    Regions of a place from its formatted address: every component after the street,
+    without postal codes, e.g. 'Street 1, New York, NY 10001, USA' is in
+    'new york', 'ny' and 'usa'
+    """
+    components = [c.strip() for c in (formatted_address or '').split(',')]
+    components = components[1:] if len(components) > 1 else components
+    regions = set()
+    for component in components:
+        region = ' '.join(word for word in component.split() if not any(ch.isdigit() for ch in word))
+        if region:
+            regions.add(region.lower())
+    return regions
+
+class RankingService:
+    """
+    In-memory ranking of places by average rating, kept in step with places.ranking.
+
+    The index is seeded from places.avg_rating and then updated incrementally, so a
+    rating change only rewrites the rows whose rank actually moved instead of the
+    whole table. Changes are published with the writer's transaction and applied again
+    by every worker, the writer included, in commit order, so all of them end up with
+    the same scores and persisted ranks. Writers hold lock() from before computing their
+    ranks until they commit, so the ranks they write agree with each other.
+    """
+    _index: Optional[RankIndex] = None
+    # Rank last written to places.ranking for every place
+    _persisted: Dict[int, Optional[int]] = {}
+    # Leaderboards of every category and region, kept in step with the global index
+    _partitions: Dict[str, RankIndex] = {}
+    _labels: Dict[int, Set[str]] = {}
+    # Resolves once the changes published before the last fallback reload have arrived
+    _catching_up: Optional[asyncio.Future] = None
+
+    @classmethod
+    async def load(cls, conn=None) -> RankIndex:
+        """Seed the index from the places table"""
+        async with NeonDB.connection(conn) as conn:
+            rows = await conn.fetch(
+                'SELECT id, avg_rating, ranking, types, formatted_address FROM places'
+            )
+
+        cls._index = RankIndex(
+            (row['id'], float(row['avg_rating'] or 0)) for row in rows
+        )
+        cls._persisted = {
+            row['id']: int(row['ranking']) if (row['ranking'] or '').isdigit() else None
+            for row in rows
+        }
+        cls._labels = {
+            row['id']: cls._place_labels(row['types'], row['formatted_address'])
+            for row in rows
+        }
+        members: Dict[str, List[Tuple[int, float]]] = {}
+        for row in rows:
+            for label in cls._labels[row['id']]:
+                members.setdefault(label, []).append((row['id'], cls._index.score(row['id'])))
+        cls._partitions = {label: RankIndex(items) for label, items in members.items()}
+
+        logger.info(
+            f"Loaded ranking index with {len(cls._index)} places "
+            f"in {len(cls._partitions)} categories and regions"
+        )
+        return cls._index
+
+    @classmethod
+    async def get_index(cls, conn=None) -> RankIndex:
+        if cls._index is None:
+            await cls.load(conn)
+        return cls._index
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Drop the index so the next use reloads it, e.g. after a rolled back write"""
+        cls._index = None
+        cls._persisted = {}
+        cls._partitions = {}
+        cls._labels = {}
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drop the index in every worker, after places.ranking was rewritten"""
+        cls.invalidate()
+        BUS.publish('ranking.reset')
+
+    @staticmethod
+    def _place_labels(types: Optional[str], formatted_address: Optional[str]) -> Set[str]:
+        return (
+            {f'type:{t}' for t in place_types(types)}
+            | {f'region:{r}' for r in place_regions(formatted_address)}
+        )
+
+    @classmethod
+    async def register(cls, place_id: int, types: Optional[str], formatted_address: Optional[str], conn=None) -> None:
+        """Record the categories and region of a new place before its score is applied"""
+        await cls.register_many([(place_id, types, formatted_address)], conn)
+
+    @classmethod
+    async def register_many(
+        cls, places: Iterable[Tuple[int, Optional[str], Optional[str]]], conn=None
+    ) -> None:
+        """register() for (place id, types, formatted address) of several new places"""
+        await cls.get_index(conn)
+        labelled = []
+        for place_id, types, formatted_address in places:
+            labels = cls._place_labels(types, formatted_address)
+            cls._labels[place_id] = labels
+            labelled.append((place_id, sorted(labels)))
+        if BUS.active and labelled:
+            async with NeonDB.connection(conn) as conn:
+                await BUS.publish_in(conn, 'ranking.labels', labelled)
+
+    @classmethod
+    async def get_rank(cls, place_id: int) -> Optional[int]:
+        index = await cls.get_index()
+        return index.rank(place_id)
+
+    @classmethod
+    async def get_range(cls, start: int, stop: int) -> List[int]:
+        """Place ids ranked start..stop, 1-based and inclusive"""
+        index = await cls.get_index()
+        return index.range(start, stop)
+
+    @classmethod
+    async def lock(cls, conn) -> None:
+        """
+        Take the rank lock until conn's transaction ends, and load the index. Writers
+        take it before their first write to places: the ranks others write lock places
+        rows, and the index must not see the writer's own changes before it applies them.
+
+        The last holder committed, so its changes are waited for, up to
+        INVALIDATION_SYNC_TIMEOUT. Past that the index reloads from the table instead,
+        ignoring the changes still on their way, which the table already holds.
+        """
+        await conn.execute('SELECT pg_advisory_xact_lock($1)', _RANK_LOCK)
+        caught_up = None
+        try:
+            caught_up = await asyncio.wait_for(BUS.barrier(), Config.INVALIDATION_SYNC_TIMEOUT)
+            await asyncio.wait_for(asyncio.shield(caught_up), Config.INVALIDATION_SYNC_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Earlier ranking changes are late, reloading the ranking: {e!r}")
+            cls.invalidate()
+            cls._catching_up = caught_up
+        await cls.get_index(conn)
+
+    @classmethod
+    def _stale(cls) -> bool:
+        """Whether published changes arriving now predate the loaded index"""
+        if cls._catching_up is not None and cls._catching_up.done():
+            cls._catching_up = None
+        return cls._catching_up is not None
+
+    @classmethod
+    async def apply_changes(cls, scores: Dict[int, float], conn=None) -> Dict[int, int]:
+        """
+        Move the given places to their new scores and persist only the ranks that changed.
+        conn's transaction must hold lock().
+
+        Returns the new rank of every place whose places.ranking was rewritten.
+        """
+        if not scores:
+            return {}
+
+        async with NeonDB.connection(conn) as conn:
+            index = await cls.get_index(conn)
+
+            # Every move shifts the places between its old and new position by one
+            lo, hi = None, None
+            for place_id, score in scores.items():
+                old_rank = index.rank(place_id)
+                cls._set_score(place_id, score)
+                new_rank = index.rank(place_id)
+                bounds = (new_rank, old_rank if old_rank is not None else len(index))
+                lo = min(bounds) if lo is None else min(lo, *bounds)
+                hi = max(bounds) if hi is None else max(hi, *bounds)
+
+            moved = {
+                place_id: rank
+                for rank, place_id in enumerate(index.range(lo, hi), lo)
+                if cls._persisted.get(place_id) != rank
+            }
+            if moved:
+                await conn.execute(
+                    '''
+                    UPDATE places
+                    SET ranking = moved.new_rank::text
+                    FROM UNNEST($1::int[], $2::int[]) AS moved(id, new_rank)
+                    WHERE places.id = moved.id
+                    ''',
+                    list(moved.keys()), list(moved.values())
+                )
+            await BUS.publish_in(conn, 'ranking.scores', [
+                (place_id, score, moved.get(place_id)) for place_id, score in scores.items()
+            ] + [
+                (place_id, None, rank) for place_id, rank in moved.items() if place_id not in scores
+            ])
+        cls._persisted.update(moved)
+        return moved
+
+    @classmethod
+    def _set_score(cls, place_id: int, score: float) -> None:
+        cls._index.update(place_id, score)
+        for label in cls._labels.get(place_id, ()):
+            cls._partitions.setdefault(label, RankIndex()).update(place_id, score)
+
+    @classmethod
+    def _labelled(cls, places) -> None:
+        if cls._index is not None and not cls._stale():
+            for place_id, labels in places:
+                cls._labels[place_id] = set(labels)
+
+    @classmethod
+    def _scored(cls, changes) -> None:
+        """Apply published (place id, score, persisted rank) changes, None where unchanged"""
+        if cls._index is None or cls._stale():
+            return
+        for place_id, score, rank in changes:
+            if score is not None:
+                cls._set_score(place_id, score)
+            if rank is not None:
+                cls._persisted[place_id] = rank
+
+    @classmethod
+    async def get_leaderboard(
+        cls,
+        limit: int,
+        after: Optional[Tuple[float, int]] = None,
+        place_type: Optional[str] = None,
+        region: Optional[str] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Top places as (place id, score), optionally within a category and a region,
+        starting after the (score, place id) position of the previous page.
+
+        A page is read straight off the precomputed index in O(log n + limit). With
+        both filters the smaller partition is walked and checked against the other.
+        """
+        index = await cls.get_index()
+
+        labels = []
+        if place_type:
+            labels.append(f'type:{place_type.strip().lower()}')
+        if region:
+            labels.append(f'region:{region.strip().lower()}')
+
+        partitions = [cls._partitions.get(label) for label in labels]
+        if any(partition is None for partition in partitions):
+            return []
+        partitions.sort(key=len)
+        source = partitions[0] if partitions else index
+        others = partitions[1:]
+
+        start = source.count_before(*after, inclusive=True) + 1 if after else 1
+        ids: Iterable[int] = source.iter_from(start)
+        if others:
+            ids = (pid for pid in ids if all(pid in other for other in others))
+        return [(pid, source.score(pid)) for pid in itertools.islice(ids, limit)]
+
+# Applied by the writer too: its own changes come back in commit order with the others'
+BUS.subscribe('ranking.labels', RankingService._labelled, echo=True)
+BUS.subscribe('ranking.scores', RankingService._scored, echo=True)
+BUS.subscribe('ranking.reset', lambda items: RankingService.invalidate())
+BUS.on_reset(RankingService.invalidate)
@@ -1,51 +1,188 @@
 from app.db import NeonDB
-from typing import List, Dict, Any, Optional
+from config import Config
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 import asyncio
-from app.utils.elo import DynamicEloSystem
+import asyncpg
+import logging
+from app.models.place import PlaceRating
+from app.utils.elo import DynamicEloSystem, BASELINE
+from app.services.ranking_service import RankingService
+from app.services.geo_service import GeoService
+from app.services.cache_service import CacheService, RANKINGS_TAG, place_tag, user_tag
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ELO_SUBMISSIONS = REGISTRY.counter('elo_submissions_total', 'Vote submissions committed')
+ELO_COMPARISONS = REGISTRY.counter(
+    'elo_comparisons_total', 'Pairwise comparisons applied to Elo ratings'
+)
+ELO_RATING_UPDATES = REGISTRY.counter(
+    'elo_rating_updates_total', 'Place ratings written by committed submissions'
+)
 
 class RatingService:
     def __init__(self):
-        self.elo_system = DynamicEloSystem()
+        self.elo_system = DynamicEloSystem(uncertainty=Config.ELO_UNCERTAINTY)
 
-    async def get_place_last_elo_rating(self, place_id: int) -> float:
-        """Get the last ELO rating for a place from reviews"""
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            result = await conn.fetchval(
-                '''
-                SELECT elo_rating 
-                FROM reviews 
-                WHERE place_id = $1 
-                ORDER BY id DESC 
-                LIMIT 1
-                ''',
-                place_id
-            )
-            return float(result) if result else 1000.0
+    def new_rating(self, place_id: int) -> PlaceRating:
+        """Rating state of a place that was never compared"""
+        return PlaceRating(
+            place_id,
+            float(self.elo_system.baseline_rating),
+            0,
+            float(self.elo_system.rd_initial),
+        )
 
-    async def update_place_avg_rating(self, place_id: int) -> None:
-        """Calculate and update average rating for a place"""
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            # Calculate average rating from all reviews
-            avg_rating = await conn.fetchval(
+    async def get_rating_states(
+        self,
+        place_ids: Iterable[int],
+        conn=None,
+        for_update: bool = False,
+    ) -> Dict[int, PlaceRating]:
+        """
+        Get the current ELO rating, comparison count and rating deviation of every
+        place in one query.
+
+        With for_update, the places' rating rows are created if missing and locked in
+        id order until the end of the caller's transaction, so concurrent submissions
+        touching the same place apply one after the other instead of losing updates.
+        """
+        place_ids = list(set(place_ids))
+        states = {pid: self.new_rating(pid) for pid in place_ids}
+        if not place_ids:
+            return states
+
+        if for_update:
+            # The no-op DO UPDATE takes the row lock and returns the existing rating
+            query = f'''
+                INSERT INTO place_ratings (place_id)
+                SELECT id FROM places WHERE id = ANY($1::int[]) ORDER BY id
+                ON CONFLICT (place_id) DO UPDATE SET place_id = EXCLUDED.place_id
+                RETURNING {PlaceRating.columns()}
+            '''
+        else:
+            query = f'''
+                SELECT {PlaceRating.columns()}
+                FROM place_ratings
+                WHERE place_id = ANY($1::int[])
+            '''
+
+        async with NeonDB.connection(conn) as conn:
+            rows = await conn.fetch(query, place_ids)
+            states.update({row['place_id']: PlaceRating.from_record(row) for row in rows})
+            return states
+
+    async def get_current_ratings(
+        self,
+        place_ids: Iterable[int],
+        conn=None,
+        for_update: bool = False,
+    ) -> Dict[int, float]:
+        """Get the current ELO rating for every place in one query"""
+        states = await self.get_rating_states(place_ids, conn=conn, for_update=for_update)
+        return {pid: float(state.elo_rating) for pid, state in states.items()}
+
+    async def get_place_last_elo_rating(self, place_id: int, conn=None) -> float:
+        """Get the current ELO rating for a place"""
+        ratings = await self.get_current_ratings([place_id], conn=conn)
+        return ratings[place_id]
+
+    async def save_rating_states(self, states: Iterable[PlaceRating], conn=None) -> None:
+        """Upsert the rating, comparison count and deviation of every given place in one statement"""
+        states = list(states)
+        if not states:
+            return
+
+        async with NeonDB.connection(conn) as conn:
+            # Ids that don't match a place are skipped rather than failing the FK
+            await conn.execute(
                 '''
-                SELECT COALESCE(AVG(rating), 0)
-                FROM reviews
-                WHERE place_id = $1 AND rating IS NOT NULL
+                INSERT INTO place_ratings (place_id, elo_rating, match_count, rating_deviation)
+                SELECT r.place_id, r.elo_rating, r.match_count, r.rating_deviation
+                FROM UNNEST($1::int[], $2::float8[], $3::int[], $4::float8[])
+                    AS r(place_id, elo_rating, match_count, rating_deviation)
+                JOIN places p ON p.id = r.place_id
+                ON CONFLICT (place_id) DO UPDATE
+                SET elo_rating = EXCLUDED.elo_rating,
+                    match_count = EXCLUDED.match_count,
+                    rating_deviation = EXCLUDED.rating_deviation,
+                    updated_at = NOW()
                 ''',
-                place_id
+                [s.place_id for s in states],
+                [float(s.elo_rating) for s in states],
+                [s.match_count for s in states],
+                [float(s.rating_deviation) for s in states]
             )
-            
-            # Update places table with new average
-            await conn.execute(
-                '''
-                UPDATE places 
-                SET avg_rating = $1 
-                WHERE id = $2
+
+    async def update_place_avg_rating(self, place_id: int, conn=None) -> None:
+        """Recalculate the rating aggregates of a place from its reviews"""
+        await self.repair_rating_aggregates([place_id], conn=conn)
+
+    async def repair_rating_aggregates(
+        self,
+        place_ids: Optional[Iterable[int]] = None,
+        dry_run: bool = False,
+        conn=None,
+    ) -> Dict[int, float]:
+        """
+        Recompute rating_sum, rating_count and avg_rating from reviews in bulk.
+
+        Only places whose running aggregates drifted from their reviews are rewritten,
+        or just reported when dry_run is set. Checks every place when place_ids is None.
+        Returns the corrected average rating of each drifted place.
+        """
+        if place_ids is None:
+            scope = 'TRUE -- full scan: every place is checked'
+            args = []
+        else:
+            scope = 'p.id = ANY($1::int[])'
+            args = [list(set(place_ids))]
+        if dry_run:
+            action = 'SELECT id, avg_rating FROM drifted'
+        else:
+            action = '''
+                UPDATE places
+                SET rating_sum = drifted.rating_sum,
+                    rating_count = drifted.rating_count,
+                    avg_rating = drifted.avg_rating
+                FROM drifted
+                WHERE places.id = drifted.id
+                RETURNING places.id, places.avg_rating
+            '''
+
+        async with NeonDB.connection(conn) as conn:
+            rows = await conn.fetch(
+                f'''
+                WITH actual AS (
+                    SELECT
+                        p.id,
+                        COALESCE(SUM(r.rating), 0)::float8 AS rating_sum,
+                        COUNT(r.rating)::int AS rating_count
+                    FROM places p
+                    LEFT JOIN reviews r ON r.place_id = p.id
+                    WHERE {scope}
+                    GROUP BY p.id
+                ),
+                drifted AS (
+                    SELECT
+                        actual.*,
+                        CASE WHEN actual.rating_count > 0
+                            THEN actual.rating_sum / actual.rating_count
+                            ELSE 0
+                        END AS avg_rating
+                    FROM actual
+                    JOIN places p ON p.id = actual.id
+                    WHERE p.rating_count <> actual.rating_count
+                        OR ABS(p.rating_sum - actual.rating_sum) > 1e-9
+                        OR (actual.rating_count > 0
+                            AND ABS(COALESCE(p.avg_rating, 0) - actual.rating_sum / actual.rating_count) > 1e-9)
+                )
+                {action}
                 ''',
-                float(avg_rating), place_id
+                *args
             )
+            return {row['id']: float(row['avg_rating']) for row in rows}
 
     async def create_or_update_review(
         self, 
@@ -56,8 +193,13 @@ class RatingService:
         text_review: str = None,
         username: str = None,
         review_id: int = None,
-    ) -> None:
-        """Create or update a review entry"""
+        conn=None,
+    ) -> Dict[int, float]:
+        """
+        Create or update a review entry, apply its rating to the place's running
+        aggregates by delta and fan it out to the author's followers' timelines.
+        Returns the place's new average rating keyed by its id.
+        """
         normalized_rating = self.elo_system.normalize_rating(
             elo_rating, 
             min_rating=0, 
@@ -65,109 +207,137 @@ class RatingService:
             scale=10
         )
         
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            # Get place name
-            place_name = await conn.fetchval(
-                'SELECT name FROM places WHERE id = $1',
-                place_id
-            )
-            
-            # If username not provided, get it from users table
-            if not username:
-                username = await conn.fetchval(
-                    'SELECT username FROM users WHERE id = $1',
-                    user_id
-                )
-            
+        async with NeonDB.connection(conn) as conn:
+            # Place name and, if not provided, username are looked up in the same statement
             if review_id:
-                # Update existing review with updated_at timestamp
-                await conn.execute("""
-                    UPDATE reviews 
-                    SET text_review = COALESCE($1, text_review),
-                        rating = $2,
-                        elo_rating = $3,
-                        username = $4,
-                        updated_at = CURRENT_TIMESTAMP,
-                        image = $6
-                    WHERE id = $5
-                """, text_review, normalized_rating, elo_rating, username, review_id, image)
+                # Update existing review with updated_at timestamp, replacing its old rating
+                row = await conn.fetchrow("""
+                    WITH old AS (
+                        SELECT id, rating
+                        FROM reviews
+                        WHERE id = $5
+                        FOR UPDATE
+                    ),
+                    review AS (
+                        UPDATE reviews 
+                        SET text_review = COALESCE($1, text_review),
+                            rating = $2,
+                            elo_rating = $3,
+                            username = COALESCE(
+                                NULLIF($4, ''),
+                                (SELECT username FROM users WHERE id = $7)
+                            ),
+                            updated_at = CURRENT_TIMESTAMP,
+                            image = $6
+                        FROM old
+                        WHERE reviews.id = old.id
+                        RETURNING reviews.id, reviews.user_id, reviews.place_id, reviews.rating,
+                            old.rating AS old_rating,
+                            COALESCE(reviews.updated_at, CURRENT_TIMESTAMP) AS activity_at
+                    ),
+                    fanout AS (
+                        -- Push the review onto every follower's timeline, unless the
+                        -- author has too many followers and is merged in on read
+                        INSERT INTO timeline_entries (user_id, review_id, author_id, activity_at)
+                        SELECT f.follower, review.id, review.user_id, review.activity_at
+                        FROM review
+                        JOIN followers f ON f.followee = review.user_id
+                        WHERE (SELECT follower_count FROM users WHERE id = review.user_id) <= $8
+                        ON CONFLICT (user_id, review_id) DO UPDATE
+                        SET activity_at = EXCLUDED.activity_at
+                    )
+                    UPDATE places
+                    SET rating_sum = rating_sum + review.rating - COALESCE(review.old_rating, 0),
+                        rating_count = rating_count + (review.old_rating IS NULL)::int,
+                        avg_rating = (rating_sum + review.rating - COALESCE(review.old_rating, 0))
+                            / NULLIF(rating_count + (review.old_rating IS NULL)::int, 0)
+                    FROM review
+                    WHERE places.id = review.place_id
+                    RETURNING places.id, places.avg_rating
+                """, text_review, normalized_rating, elo_rating, username, review_id, image,
+                    user_id, Config.FEED_FANOUT_LIMIT)
             else:
                 # Create new review
-                await conn.execute("""
-                    INSERT INTO reviews 
-                    (text_review, user_id, place_id, place_name, rating, elo_rating, username, image)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                """, text_review, user_id, place_id, place_name, normalized_rating, 
-                    elo_rating, username, image)
-
-    async def update_rankings(self) -> None:
-        """Update rankings based on average ratings"""
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                WITH ranked AS (
-                    SELECT 
-                        id,
-                        ROW_NUMBER() OVER (ORDER BY avg_rating DESC) as new_rank
-                    FROM places
-                )
-                UPDATE places
-                SET ranking = ranked.new_rank::text
-                FROM ranked
-                WHERE places.id = ranked.id
-            """)
+                row = await conn.fetchrow("""
+                    WITH review AS (
+                        INSERT INTO reviews 
+                        (text_review, user_id, place_id, place_name, rating, elo_rating, username, image)
+                        VALUES (
+                            $1, $2, $3,
+                            (SELECT name FROM places WHERE id = $3),
+                            $4, $5,
+                            COALESCE(NULLIF($6, ''), (SELECT username FROM users WHERE id = $2)),
+                            $7
+                        )
+                        RETURNING id, user_id, place_id, rating,
+                            COALESCE(updated_at, created_at, CURRENT_TIMESTAMP) AS activity_at
+                    ),
+                    fanout AS (
+                        -- Push the review onto every follower's timeline, unless the
+                        -- author has too many followers and is merged in on read
+                        INSERT INTO timeline_entries (user_id, review_id, author_id, activity_at)
+                        SELECT f.follower, review.id, review.user_id, review.activity_at
+                        FROM review
+                        JOIN followers f ON f.followee = review.user_id
+                        WHERE (SELECT follower_count FROM users WHERE id = review.user_id) <= $8
+                        ON CONFLICT (user_id, review_id) DO UPDATE
+                        SET activity_at = EXCLUDED.activity_at
+                    )
+                    UPDATE places
+                    SET rating_sum = rating_sum + review.rating,
+                        rating_count = rating_count + 1,
+                        avg_rating = (rating_sum + review.rating) / (rating_count + 1)
+                    FROM review
+                    WHERE places.id = review.place_id
+                    RETURNING places.id, places.avg_rating
+                """, text_review, user_id, place_id, normalized_rating, 
+                    elo_rating, username, image, Config.FEED_FANOUT_LIMIT)
 
-    async def process_matches(self, data: Dict[str, Any]) -> Dict[str, float]:
-        """Process matches and create review"""
-        matches = data.get('matches', [])
-        user_id = data.get('user_id')
-        place_id = data.get('place_id')
-        text_review = data.get('text_review')
-        username = data.get('username')
-        image = data.get('image')
-        
-        updated_ratings = {}
-        affected_places = set()
-        
-        # First pass: collect current ratings
-        for match in matches:
-            winner_id = match.get('winner')
-            loser_id = match.get('loser')
-            tie_ids = match.get('tie', [])
-            
-            for pid in filter(None, [winner_id, loser_id] + tie_ids):
-                if pid not in updated_ratings:
-                    updated_ratings[pid] = await self.get_place_last_elo_rating(pid)
-                affected_places.add(pid)
+            return {row['id']: float(row['avg_rating'])} if row else {}
+
+    async def update_rankings(self, conn=None) -> None:
+        """Rewrite every place's ranking from scratch, used to repair drift"""
+        async with NeonDB.connection(conn) as conn:
+            async with conn.transaction():
+                await RankingService.lock(conn)
+                await conn.execute("""
+                    -- full scan: every place is reranked
+                    WITH ranked AS (
+                        SELECT 
+                            id,
+                            ROW_NUMBER() OVER (ORDER BY COALESCE(avg_rating, 0) DESC, id) as new_rank
+                        FROM places
+                    )
+                    UPDATE places
+                    SET ranking = ranked.new_rank::text
+                    FROM ranked
+                    WHERE places.id = ranked.id
+                """)
+        # Reseed the incremental index from the rewritten table
+        RankingService.reset()
+        CacheService.clear()
 
-        # Second pass: process matches
+    def expand_matches(self, matches: List[Dict[str, Any]]) -> List[Tuple[int, Optional[int], float]]:
+        """
+        Expand a submission's matches into (a, b, outcome) comparisons in the order
+        they are applied. Tie groups become every pair of their places and a single
+        place vote has b set to None.
+        """
+        comparisons = []
         for match in matches:
             winner_id = match.get('winner')
             loser_id = match.get('loser')
             tie_ids = match.get('tie', [])
 
-            # In the process_matches method, modify the single place rating case:
             # Special case: Handle single place rating
             if len([x for x in [winner_id, loser_id] + tie_ids if x is not None]) == 1:
                 # If it's a tie array with one element, that's the single place
                 if tie_ids:
-                    single_id = tie_ids[0]
-                    vote_type = 'neutral'
+                    comparisons.append((tie_ids[0], None, 0.5))
+                elif winner_id:
+                    comparisons.append((winner_id, None, 1.0))
                 else:
-                    single_id = next(pid for pid in [winner_id, loser_id] if pid is not None)
-                    if winner_id:
-                        vote_type = 'up'
-                    elif loser_id:
-                        vote_type = 'down'
-                
-                current_rating = updated_ratings[single_id]
-                new_rating = self.elo_system.update_single_rating(
-                    current_rating,
-                    vote_type,
-                    len(matches)
-                )
-                updated_ratings[single_id] = new_rating
+                    comparisons.append((loser_id, None, 0.0))
                 continue
 
             # Normal case: Process comparative ratings
@@ -175,79 +345,218 @@ class RatingService:
                 # Handle ties
                 for i in range(len(tie_ids)):
                     for j in range(i + 1, len(tie_ids)):
-                        rating_a = updated_ratings[tie_ids[i]]
-                        rating_b = updated_ratings[tie_ids[j]]
-                        new_a, new_b = self.elo_system.compare(
-                            rating_a, rating_b, 0.5, len(matches)
-                        )
-                        updated_ratings[tie_ids[i]] = new_a
-                        updated_ratings[tie_ids[j]] = new_b
+                        comparisons.append((tie_ids[i], tie_ids[j], 0.5))
             
             elif winner_id and loser_id:
-                winner_rating = updated_ratings[winner_id]
-                loser_rating = updated_ratings[loser_id]
-                new_winner, new_loser = self.elo_system.compare(
-                    winner_rating, loser_rating, 1, len(matches)
-                )
-                updated_ratings[winner_id] = new_winner
-                updated_ratings[loser_id] = new_loser
-
-        # In process_matches method, update the review handling section:
-        if user_id and place_id:
-            await self.create_or_update_review(
-                user_id=user_id,
-                place_id=place_id,
-                text_review=text_review,  # Can be None
-                elo_rating=updated_ratings.get(place_id, 1000),
-                username=username,
-                review_id=data.get('review_id'),
-                image=image
+                comparisons.append((winner_id, loser_id, 1.0))
+
+        return comparisons
+
+    def apply_matches(
+        self,
+        matches: List[Dict[str, Any]],
+        states: Dict[int, PlaceRating],
+    ) -> Dict[int, PlaceRating]:
+        """Apply a submission's matches in order, updating rating states in place"""
+        return self.apply_comparisons(self.expand_matches(matches), states)
+
+    def apply_comparisons(
+        self,
+        comparisons: List[Tuple[int, Optional[int], float]],
+        states: Dict[int, PlaceRating],
+    ) -> Dict[int, PlaceRating]:
+        """
+        Apply expanded comparisons in order, updating rating states in place. Each
+        place moves by its own comparison count, or deviation, as of that comparison.
+        """
+        if not comparisons:
+            return states
+
+        place_ids = list(states.keys())
+        index = {pid: i for i, pid in enumerate(place_ids)}
+        ratings, matches, deviations = self.elo_system.apply_batch(
+            [states[pid].elo_rating for pid in place_ids],
+            [index[a] for a, _, _ in comparisons],
+            [index[b] if b is not None else BASELINE for _, b, _ in comparisons],
+            [outcome for _, _, outcome in comparisons],
+            [states[pid].match_count for pid in place_ids],
+            [states[pid].rating_deviation for pid in place_ids]
+        )
+        for pid, rating, count, deviation in zip(
+            place_ids, ratings.tolist(), matches.tolist(), deviations.tolist()
+        ):
+            state = states[pid]
+            state.elo_rating, state.match_count, state.rating_deviation = rating, count, deviation
+        return states
+
+    async def log_match_events(
+        self,
+        events: List[Tuple[int, Optional[int], float, int, Optional[int]]],
+        conn=None,
+    ) -> None:
+        """
+        Append applied comparisons, as (place_a, place_b, outcome, n_ranked, user_id),
+        to the match event log in one statement
+        """
+        if not events:
+            return
+
+        async with NeonDB.connection(conn) as conn:
+            await conn.execute(
+                '''
+                INSERT INTO match_events (place_a, place_b, outcome, n_ranked, user_id)
+                SELECT e.place_a, e.place_b, e.outcome, e.n_ranked, e.user_id
+                FROM UNNEST($1::int[], $2::int[], $3::real[], $4::int[], $5::int[])
+                    WITH ORDINALITY AS e(place_a, place_b, outcome, n_ranked, user_id, seq)
+                ORDER BY e.seq
+                ''',
+                *(list(column) for column in zip(*events))
             )
-            # Always update the average rating after creating/updating a review
-            await self.update_place_avg_rating(place_id)
 
-        # Also update the affected places section
-        for pid in affected_places:
-            if pid != place_id:  # Don't update place_id twice
-                await self.update_place_avg_rating(pid)
-        
-        # Update rankings
-        await self.update_rankings()
-        
-        # Return current place information
+    async def process_matches(self, data: Dict[str, Any]) -> Dict[str, float]:
+        """Process matches and create review in a single transaction"""
+        results = await self.apply_submissions([data])
+        return results[0]
+
+    async def apply_submissions(
+        self,
+        submissions: List[Dict[str, Any]],
+        max_attempts: int = 3,
+    ) -> List[Dict[int, Dict[str, Any]]]:
+        """
+        Apply submissions in order as one unit of work, retrying on deadlocks.
+
+        Returns the current information of each submission's affected places.
+        """
+        for attempt in range(1, max_attempts + 1):
+            try:
+                return await self._apply_submissions(submissions)
+            except asyncpg.exceptions.DeadlockDetectedError:
+                if attempt == max_attempts:
+                    raise
+                logger.warning(f"Deadlock applying submissions, retrying (attempt {attempt})")
+
+    async def _apply_submissions(self, submissions: List[Dict[str, Any]]) -> List[Dict[int, Dict[str, Any]]]:
+        plans = []
+        for data in submissions:
+            affected_places = set()
+
+            # First pass: collect affected places
+            for match in data.get('matches', []):
+                winner_id = match.get('winner')
+                loser_id = match.get('loser')
+                tie_ids = match.get('tie', [])
+                
+                affected_places.update(filter(None, [winner_id, loser_id] + tie_ids))
+
+            plans.append((data, affected_places))
+
+        all_places = set()
+        for data, affected_places in plans:
+            all_places |= affected_places
+            if data.get('user_id') and data.get('place_id'):
+                all_places.add(data['place_id'])
+
+        # The whole batch is one unit of work: one connection, one transaction and a
+        # constant number of round trips per batch no matter how many matches were sent.
+        # Ratings are read once, updated in memory in submission order and written once
+        # per place.
         pool = await NeonDB.get_pool()
         async with pool.acquire() as conn:
-            places = await conn.fetch("""
-                SELECT 
-                    p.id, 
-                    p.name, 
-                    p.avg_rating, 
-                    r.elo_rating, 
-                    p.ranking,
-                    r.created_at,
-                    r.updated_at
-                FROM places p
-                LEFT JOIN (
-                    SELECT 
-                        place_id, 
-                        elo_rating,
-                        created_at,
-                        updated_at
-                    FROM reviews
-                    WHERE (place_id, id) IN (
-                        SELECT place_id, MAX(id)
-                        FROM reviews
-                        GROUP BY place_id
-                    )
-                ) r ON p.id = r.place_id
-                WHERE p.id = ANY($1::int[])
-            """, list(affected_places))
-
-            return {place['id']: {
-                'name': place['name'],
-                'avg_rating': float(place['avg_rating']) if place['avg_rating'] else None,
-                'elo_rating': float(place['elo_rating']) if place['elo_rating'] else 1000,
-                'ranking': place['ranking'],
-                'created_at': place['created_at'].isoformat() if place['created_at'] else None,
-                'updated_at': place['updated_at'].isoformat() if place['updated_at'] else None
-            } for place in places}
\ No newline at end of file
+            try:
+                async with conn.transaction():
+                    states = await self.get_rating_states(all_places, conn=conn, for_update=True)
+                    if any(data.get('user_id') and data.get('place_id') for data, _ in plans):
+                        # Reviews change averages and so ranks
+                        await RankingService.lock(conn)
+                    changed_ratings = {}
+                    avg_ratings = {}
+                    events = []
+
+                    for data, affected_places in plans:
+                        matches = data.get('matches', [])
+                        user_id = data.get('user_id')
+                        place_id = data.get('place_id')
+
+                        # Second pass: process matches and log them for replays
+                        comparisons = self.expand_matches(matches)
+                        submission_states = {pid: states[pid] for pid in affected_places}
+                        self.apply_comparisons(comparisons, submission_states)
+                        changed_ratings.update(submission_states)
+                        events.extend(
+                            (a, b, outcome, len(matches), user_id) for a, b, outcome in comparisons
+                        )
+
+                        if user_id and place_id:
+                            # The review snapshots the place's current rating, which a place
+                            # this submission didn't compare keeps. Only the reviewed place's
+                            # average can change, its running aggregates are updated by delta
+                            # alongside the review
+                            avg_ratings.update(await self.create_or_update_review(
+                                user_id=user_id,
+                                place_id=place_id,
+                                text_review=data.get('text_review'),  # Can be None
+                                elo_rating=states[place_id].elo_rating,
+                                username=data.get('username'),
+                                review_id=data.get('review_id'),
+                                image=data.get('image'),
+                                conn=conn
+                            ))
+
+                    await self.log_match_events(events, conn=conn)
+                    await self.save_rating_states(changed_ratings.values(), conn=conn)
+
+                    # Update rankings of the places that moved
+                    moved = await RankingService.apply_changes(avg_ratings, conn=conn)
+
+                    # Return current place information
+                    places = await conn.fetch("""
+                        SELECT 
+                            p.id, 
+                            p.name, 
+                            p.avg_rating, 
+                            r.elo_rating, 
+                            r.match_count,
+                            r.rating_deviation,
+                            p.ranking,
+                            r.created_at,
+                            r.updated_at
+                        FROM places p
+                        LEFT JOIN place_ratings r ON p.id = r.place_id
+                        WHERE p.id = ANY($1::int[])
+                    """, list(all_places))
+            except Exception:
+                # A rolled back submission leaves the in-memory ranking ahead of the table
+                RankingService.invalidate()
+                raise
+
+        GeoService.update_ratings({pid: state.elo_rating for pid, state in changed_ratings.items()})
+        ELO_SUBMISSIONS.inc(len(submissions))
+        ELO_COMPARISONS.inc(len(events))
+        ELO_RATING_UPDATES.inc(len(changed_ratings))
+
+        # Drop cached responses built from what was just committed
+        reviewers = {data['user_id'] for data in submissions if data.get('user_id') and data.get('place_id')}
+        CacheService.invalidate(
+            *([RANKINGS_TAG] if avg_ratings else []),
+            *map(place_tag, set(avg_ratings) | set(moved)),
+            *map(user_tag, reviewers)
+        )
+
+        info = {place['id']: {
+            'name': place['name'],
+            'avg_rating': float(place['avg_rating']) if place['avg_rating'] else None,
+            'elo_rating': float(place['elo_rating']) if place['elo_rating'] else 1000,
+            'match_count': place['match_count'] or 0,
+            'rating_deviation': (
+                float(place['rating_deviation']) if place['rating_deviation'] is not None
+                else float(self.elo_system.rd_initial)
+            ),
+            'ranking': place['ranking'],
+            'created_at': place['created_at'].isoformat() if place['created_at'] else None,
+            'updated_at': place['updated_at'].isoformat() if place['updated_at'] else None
+        } for place in places}
+        return [
+            {pid: info[pid] for pid in affected_places if pid in info}
+            for _, affected_places in plans
+        ]
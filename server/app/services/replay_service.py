@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+from dotenv import load_dotenv
+
+from app.db import NeonDB
+from app.models.place import PlaceRating
+from app.utils.elo import DynamicEloSystem, BASELINE
+from config import Config
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+def _replay_partition(
+    place_ids: List[int],
+    max_event_id: int,
+    elo_params: Dict[str, float],
+    batch_size: int,
+) -> List[PlaceRating]:
+    """Process pool entry point, replays the events of one partition of places"""
+    return asyncio.run(_stream_partition(place_ids, max_event_id, elo_params, batch_size))
+
+async def _stream_partition(
+    place_ids: List[int],
+    max_event_id: int,
+    elo_params: Dict[str, float],
+    batch_size: int,
+) -> List[PlaceRating]:
+    elo_system = DynamicEloSystem(**elo_params)
+    index = {pid: i for i, pid in enumerate(place_ids)}
+    ratings = [float(elo_system.baseline_rating)] * len(place_ids)
+    matches = [0] * len(place_ids)
+    deviations = [float(elo_system.rd_initial)] * len(place_ids)
+
+    conn = await asyncpg.connect(os.getenv('DATABASE_URL'))
+    try:
+        # Partitions are closed under comparisons, so filtering on place_a is enough
+        async with conn.transaction(readonly=True):
+            cursor = await conn.cursor(
+                '''
+                SELECT place_a, place_b, outcome
+                FROM match_events
+                WHERE place_a = ANY($1::int[]) AND id <= $2
+                ORDER BY id
+                ''',
+                place_ids, max_event_id
+            )
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                ratings, matches, deviations = elo_system.apply_batch(
+                    ratings,
+                    [index[row['place_a']] for row in rows],
+                    [index[row['place_b']] if row['place_b'] is not None else BASELINE
+                     for row in rows],
+                    [row['outcome'] for row in rows],
+                    matches,
+                    deviations
+                )
+    finally:
+        await conn.close()
+
+    return [
+        PlaceRating(pid, float(rating), int(count), float(deviation))
+        for pid, rating, count, deviation in zip(place_ids, ratings, matches, deviations)
+    ]
+
+class ReplayService:
+    """
+    Rebuild every place's ELO rating from the match event log.
+
+    Places that were never compared with each other can't influence each other's
+    rating, so the log is split into the connected components of the comparison
+    graph and the components are replayed in parallel on a process pool. Every pass
+    over the log streams through a server-side cursor, keeping memory bounded by the
+    number of places rather than the number of events.
+
+    Comparison counts and rating deviations are rebuilt along with the ratings, the
+    n_ranked logged with every event is not used.
+    """
+
+    def __init__(
+        self,
+        elo_params: Optional[Dict[str, float]] = None,
+        workers: Optional[int] = None,
+        batch_size: int = 50000,
+    ):
+        self.elo_params = {'uncertainty': Config.ELO_UNCERTAINTY, **(elo_params or {})}
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    async def find_components(self) -> Tuple[List[Tuple[List[int], int]], int]:
+        """
+        Stream the log once and union every compared pair of places.
+
+        Returns the (place ids, event count) of every component and the last event id
+        included, so later passes read the same snapshot of the log.
+        """
+        parent: Dict[int, int] = {}
+
+        def find(pid):
+            parent.setdefault(pid, pid)
+            while parent[pid] != pid:
+                parent[pid] = parent[parent[pid]]
+                pid = parent[pid]
+            return pid
+
+        event_counts: Dict[int, int] = {}
+        max_event_id = 0
+        async with NeonDB.connection() as conn:
+            async with conn.transaction(readonly=True):
+                cursor = await conn.cursor('SELECT id, place_a, place_b FROM match_events')
+                while True:
+                    rows = await cursor.fetch(self.batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        max_event_id = max(max_event_id, row['id'])
+                        root = find(row['place_a'])
+                        if row['place_b'] is not None:
+                            other = find(row['place_b'])
+                            if other != root:
+                                parent[other] = root
+                        event_counts[row['place_a']] = event_counts.get(row['place_a'], 0) + 1
+
+        components: Dict[int, List[int]] = {}
+        for pid in parent:
+            components.setdefault(find(pid), []).append(pid)
+        return [
+            (place_ids, sum(event_counts.get(pid, 0) for pid in place_ids))
+            for place_ids in components.values()
+        ], max_event_id
+
+    def partition(self, components: List[Tuple[List[int], int]]) -> List[List[int]]:
+        """Spread components over the workers, balancing their event counts"""
+        bins = [(0, i, []) for i in range(min(self.workers, len(components)))]
+        for place_ids, events in sorted(components, key=lambda c: c[1], reverse=True):
+            load, i, members = heapq.heappop(bins)
+            members.extend(place_ids)
+            heapq.heappush(bins, (load + events, i, members))
+        return [members for _, _, members in bins if members]
+
+    async def replay(self, dry_run: bool = False) -> Dict[str, Any]:
+        components, max_event_id = await self.find_components()
+        partitions = self.partition(components)
+        logger.info(
+            f"Replaying events up to {max_event_id} over {len(components)} components "
+            f"in {len(partitions)} partitions"
+        )
+
+        args = [(part, max_event_id, self.elo_params, self.batch_size) for part in partitions]
+        if len(partitions) == 1:
+            results = [await _stream_partition(*args[0])]
+        else:
+            loop = asyncio.get_running_loop()
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=len(partitions), mp_context=context) as pool:
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _replay_partition, *arg) for arg in args
+                ))
+
+        states = [state for part in results for state in part]
+        summary = {
+            'events': sum(events for _, events in components),
+            'components': len(components),
+            'places': len(states),
+            'mean_abs_change': await self._mean_abs_change(states),
+        }
+        if not dry_run:
+            await self.write_ratings(states)
+        return summary
+
+    async def _mean_abs_change(self, states: List[PlaceRating]) -> float:
+        if not states:
+            return 0.0
+        async with NeonDB.connection() as conn:
+            rows = await conn.fetch('SELECT place_id, elo_rating FROM place_ratings')
+        current = {row['place_id']: float(row['elo_rating']) for row in rows}
+        baseline = DynamicEloSystem(**self.elo_params).baseline_rating
+        return sum(
+            abs(state.elo_rating - current.get(state.place_id, baseline)) for state in states
+        ) / len(states)
+
+    async def write_ratings(self, states: List[PlaceRating]) -> None:
+        """Bulk load the rebuilt ratings through COPY and upsert them in one transaction"""
+        async with NeonDB.connection() as conn:
+            async with conn.transaction():
+                await conn.execute('''
+                    CREATE TEMP TABLE replayed_ratings (
+                        place_id INTEGER,
+                        elo_rating DOUBLE PRECISION,
+                        match_count INTEGER,
+                        rating_deviation DOUBLE PRECISION
+                    ) ON COMMIT DROP
+                ''')
+                await conn.copy_records_to_table(
+                    'replayed_ratings',
+                    records=[
+                        (s.place_id, s.elo_rating, s.match_count, s.rating_deviation)
+                        for s in states
+                    ]
+                )
+                await conn.execute('''
+                    INSERT INTO place_ratings (place_id, elo_rating, match_count, rating_deviation)
+                    SELECT r.place_id, r.elo_rating, r.match_count, r.rating_deviation
+                    FROM replayed_ratings r
+                    JOIN places p ON p.id = r.place_id
+                    ON CONFLICT (place_id) DO UPDATE
+                    SET elo_rating = EXCLUDED.elo_rating,
+                        match_count = EXCLUDED.match_count,
+                        rating_deviation = EXCLUDED.rating_deviation,
+                        updated_at = NOW()
+                ''')
@@ -0,0 +1,147 @@
+from app.db import BUS, NeonDB
+from app.models.user import UserSummary
+from app.services.user_service import UserService
+from app.utils.search import PrefixIndex
+from config import Config
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Trigram indexes can't serve terms shorter than a trigram
+_MIN_TRIGRAM_LENGTH = 3
+
+def _escape_like(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class SearchService:
+    """
+    Username search. Autocomplete is answered from an in-memory prefix index kept in
+    step by create_user and update_profile; full search uses the trigram index on
+    lower(username). Both rank exact matches first, then prefix matches, and return
+    follower counts from the users counters. The prefix index is rebuilt in the
+    background every SEARCH_RELOAD_SECONDS, while autocomplete keeps using the previous one.
+    """
+    _index: Optional[PrefixIndex] = None
+    _loaded_at = 0.0
+    # The one load running, which every caller needing the index shares
+    _load: Optional[asyncio.Task] = None
+    # Users renamed while each running load reads the table, which it may not see
+    _pending: List[List[Tuple[int, Optional[str]]]] = []
+    # Bumped by invalidate(), so loads started before it don't swap their index in
+    _generation = 0
+
+    @classmethod
+    async def load(cls, conn=None) -> PrefixIndex:
+        generation = cls._generation
+        pending: List[Tuple[int, Optional[str]]] = []
+        cls._pending.append(pending)
+        try:
+            async with NeonDB.connection(conn) as conn:
+                rows = await conn.fetch('SELECT id, username FROM users')
+            users = [(row['id'], row['username']) for row in rows]
+            # Indexing every prefix takes a while, keep serving requests meanwhile
+            built = await asyncio.get_running_loop().run_in_executor(None, PrefixIndex, users)
+            for user_id, username in pending:
+                built.update(user_id, username)
+        finally:
+            cls._pending.remove(pending)
+
+        if generation == cls._generation:
+            cls._index = built
+            cls._loaded_at = time.monotonic()
+            logger.info(f"Loaded search index with {len(built)} users")
+        return built
+
+    @classmethod
+    def _reload(cls) -> asyncio.Task:
+        """The running load, started if there is none"""
+        if cls._load is None or cls._load.done():
+            cls._load = asyncio.create_task(cls.load())
+            cls._load.add_done_callback(cls._loaded)
+        return cls._load
+
+    @staticmethod
+    def _loaded(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Could not load the search index: {task.exception()}")
+
+    @classmethod
+    async def get_index(cls) -> PrefixIndex:
+        while cls._index is None:
+            # Nothing to answer from yet
+            await asyncio.shield(cls._reload())
+        if time.monotonic() - cls._loaded_at > Config.SEARCH_RELOAD_SECONDS:
+            cls._reload()
+        return cls._index
+
+    @classmethod
+    def invalidate(cls) -> None:
+        # A load already running may have missed what this drops the index for
+        cls._generation += 1
+        cls._index = None
+        cls._load = None
+
+    @classmethod
+    def update_user(cls, user_id: int, username: Optional[str]) -> None:
+        cls._updated([(user_id, username)])
+        BUS.publish('search.users', [(user_id, username)])
+
+    @classmethod
+    def _updated(cls, users) -> None:
+        for pending in cls._pending:
+            pending.extend(users)
+        if cls._index is not None:
+            for user_id, username in users:
+                cls._index.update(user_id, username)
+
+    @classmethod
+    async def autocomplete(
+        cls,
+        prefix: str,
+        limit: int = Config.SEARCH_PAGE_SIZE,
+        viewer_id: Optional[int] = None,
+        conn=None,
+    ) -> List[UserSummary]:
+        index = await cls.get_index()
+        user_ids = index.search(prefix, limit)
+        if not user_ids:
+            return []
+        async with NeonDB.read_connection(conn) as conn:
+            return await UserService.get_users_by_ids(user_ids, viewer_id, conn)
+
+    @classmethod
+    async def search(
+        cls,
+        term: str,
+        limit: int = Config.SEARCH_PAGE_SIZE,
+        viewer_id: Optional[int] = None,
+        conn=None,
+    ) -> List[UserSummary]:
+        """Users whose username contains the term, best matches first"""
+        term = term.strip().lower()
+        if len(term) < _MIN_TRIGRAM_LENGTH:
+            return await cls.autocomplete(term, limit, viewer_id, conn)
+
+        async with NeonDB.read_connection(conn) as conn:
+            user_ids = await conn.fetch(
+                '''
+                SELECT id
+                FROM users
+                WHERE lower(username) LIKE '%' || $1 || '%'
+                ORDER BY
+                    lower(username) = $2 DESC,
+                    lower(username) LIKE $1 || '%' DESC,
+                    similarity(lower(username), $2) DESC,
+                    username,
+                    id
+                LIMIT $3
+                ''',
+                _escape_like(term), term, limit
+            )
+            return await UserService.get_users_by_ids([row['id'] for row in user_ids], viewer_id, conn)
+
+BUS.subscribe('search.users', SearchService._updated)
+BUS.on_reset(SearchService.invalidate)
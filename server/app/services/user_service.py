@@ -1,20 +1,32 @@
-from app.db import NeonDB
-from app.models.user import User
+from app.db import NeonDB, register_statement
+from app.models.user import User, UserSummary
+from typing import List, Optional
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_USER_BY_ID = register_statement(f'SELECT {User.columns()} FROM users WHERE id = $1', -1)
+
+_USERS_BY_IDS = register_statement(
+    '''
+    SELECT u.id, u.username, u.email, u.clerk_id, u.image_url,
+        u.follower_count, u.following_count,
+        EXISTS (
+            SELECT 1 FROM followers f WHERE f.follower = $2 AND f.followee = u.id
+        ) AS is_following
+    FROM UNNEST($1::int[]) WITH ORDINALITY AS selected(id, position)
+    JOIN users u ON u.id = selected.id
+    ORDER BY selected.position
+    ''',
+    [], None
+)
+
 class UserService:
     @staticmethod
     async def get_user_by_id(user_id: int) -> User:
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow(
-                'SELECT * FROM users WHERE id = $1',
-                user_id
-            )
-            return User.from_db(row)
+        async with NeonDB.read_connection() as conn:
+            row = await conn.fetchrow(_USER_BY_ID, user_id)
+            return User.from_record(row)
 
     @staticmethod
     async def create_user(username: str, email: str, clerk_id: str, image_url: str) -> int:
@@ -31,9 +43,23 @@ class UserService:
             return user_id
 
     @staticmethod
-    async def get_all_users():
-        pool = await NeonDB.get_pool()
-        async with pool.acquire() as conn:
-            rows = await conn.fetch('SELECT * FROM users')
-            logger.info(f"Fetched rows: {rows}")
-            return [User.from_db(row) for row in rows]
\ No newline at end of file
+    async def get_all_users() -> List[User]:
+        async with NeonDB.read_connection() as conn:
+            rows = await conn.fetch(
+                f'SELECT {User.columns()} FROM users -- full scan: every user is returned'
+            )
+            return User.from_records(rows)
+
+    @staticmethod
+    async def get_users_by_ids(
+        user_ids: List[int],
+        viewer_id: Optional[int] = None,
+        conn=None,
+    ) -> List[UserSummary]:
+        """
+        Public fields and follower counters of the given users in the given order, and
+        whether viewer_id follows each of them
+        """
+        async with NeonDB.read_connection(conn) as conn:
+            rows = await conn.fetch(_USERS_BY_IDS, user_ids, viewer_id)
+        return UserSummary.from_records(rows)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import hashlib
+import math
+from typing import Any, Dict, Iterable, List
+
+class BloomFilter:
+    """
+    Set membership in a fixed array of bits: a key that was added is always reported
+    present, and one that wasn't is reported absent except at about error_rate.
+
+    Sized for capacity keys. Each key sets the bits at hash_count positions, derived
+    from one 128-bit BLAKE2b digest by double hashing. Past capacity the false positive
+    rate grows, so callers rebuild a larger filter. Keys can't be removed.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01, keys: Iterable[str] = ()):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+        self.update(keys)
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        # Odd, so the positions don't repeat before hash_count of them
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    def update(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def __len__(self) -> int:
+        """Keys added, counting repeats"""
+        return self._count
+
+    def false_positive_rate(self) -> float:
+        """Expected false positive rate at the current fill"""
+        return (1 - math.exp(-self.hash_count * self._count / self.size)) ** self.hash_count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'keys': self._count,
+            'capacity': self.capacity,
+            'bits': self.size,
+            'hashes': self.hash_count,
+            'bytes': len(self._bits),
+            'false_positive_rate': self.false_positive_rate(),
+        }
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+class _Entry:
+    __slots__ = ('value', 'size', 'tags', 'expires_at')
+
+    def __init__(self, value, size, tags, expires_at):
+        self.value = value
+        self.size = size
+        self.tags = tags
+        self.expires_at = expires_at
+
+class TaggedCache:
+    """
+    In-process LRU cache with a per-entry TTL, bounded by entry count and total size.
+
+    Entries carry tags naming the rows they were built from, so a write invalidates
+    exactly the entries that read those rows. A load that overlaps an invalidation of
+    one of its tags is not stored, so a reader racing a writer can't put the pre-write
+    value back into the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        # Sequence number of the last invalidation of every tag
+        self._invalidated_at: Dict[str, int] = {}
+        self._sequence = 0
+        self._cleared_at = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), size: int = 1,
+            ttl: Optional[float] = None) -> None:
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        tags = frozenset(tags)
+        self._entries[key] = _Entry(value, size, tags, time.monotonic() + (ttl or self.ttl))
+        self._bytes += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop every entry carrying any of the tags"""
+        self._sequence += 1
+        for tag in tags:
+            # Only loads in flight need to know when a tag was invalidated
+            if self._loading:
+                self._invalidated_at[tag] = self._sequence
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._sequence += 1
+        self._cleared_at = self._sequence
+        self._entries.clear()
+        self._tags.clear()
+        self._bytes = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Tuple[Any, Iterable[str], int]]],
+    ) -> Any:
+        """
+        Return the cached value for key, or await loader() for (value, tags, size) and
+        cache it under those tags, unless tags is None. Concurrent misses on the same
+        key share one load.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        started_at = self._sequence
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value, tags, size = await loader()
+            # Skip storing if a write invalidated what was read while loading
+            if tags is not None and self._cleared_at <= started_at and all(
+                self._invalidated_at.get(tag, 0) <= started_at for tag in tags
+            ):
+                self.set(key, value, tags, size)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting, don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
+            if not self._loading:
+                self._invalidated_at.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -1,31 +1,65 @@
 import math
+import numpy as np
+
+# Opponent index standing for the fixed baseline rating, used for single place votes
+BASELINE = -1
+
+# 10 ** x through the same libm pow as the scalar methods, NumPy's SIMD pow can differ
+# from it in the last bit
+_exact_pow10 = np.frompyfunc(lambda exponent: 10 ** exponent, 1, 1)
 
 class DynamicEloSystem:
-    def __init__(self, k_min=10, k_max=50, decay_rate=0.1, scale_factor=400):
+    """
+    ELO ratings whose K factor shrinks as a place gets compared more often, so new
+    places settle quickly and established ones stay stable.
+
+    Every place also carries a Glicko rating deviation, the uncertainty of its rating,
+    which starts at rd_initial and shrinks with every comparison down to rd_min. With
+    uncertainty, ratings move by the Glicko update instead, weighing every comparison
+    by both places' deviations rather than by the place's comparison count alone.
+    """
+
+    def __init__(
+        self,
+        k_min=10,
+        k_max=50,
+        decay_rate=0.1,
+        scale_factor=400,
+        uncertainty=False,
+        rd_initial=350,
+        rd_min=40,
+    ):
         self.k_min = k_min
         self.k_max = k_max
         self.decay_rate = decay_rate
         self.scale_factor = scale_factor
         self.baseline_rating = 1000  # Added baseline rating
-    
-    def calculate_k(self, n_ranked):
-        return self.k_min + (self.k_max - self.k_min) * math.exp(-self.decay_rate * n_ranked)
+        self.uncertainty = uncertainty
+        self.rd_initial = rd_initial
+        self.rd_min = rd_min
+        # Glicko's q and the constant of g(RD) = 1 / sqrt(1 + 3 q^2 RD^2 / pi^2)
+        self._q = math.log(10) / scale_factor
+        self._g_factor = 3 * self._q ** 2 / math.pi ** 2
+
+    def calculate_k(self, n_matches):
+        """K factor of a place that has been compared n_matches times"""
+        return self.k_min + (self.k_max - self.k_min) * math.exp(-self.decay_rate * n_matches)
     
     def expected_score(self, rating_a, rating_b):
         return 1 / (1 + 10 ** ((rating_b - rating_a) / self.scale_factor))
     
-    def update_rating(self, rating, expected, actual, n_ranked):
-        k = self.calculate_k(n_ranked)
+    def update_rating(self, rating, expected, actual, n_matches):
+        k = self.calculate_k(n_matches)
         return rating + k * (actual - expected)
 
-    def update_single_rating(self, current_rating: float, vote_type: str, n_ranked: int) -> float:
+    def update_single_rating(self, current_rating: float, vote_type: str, n_matches: int) -> float:
         """
         Update rating for a single place based on user vote
         
         Parameters:
         - current_rating: Current ELO rating of the place
         - vote_type: 'up', 'down', or 'neutral'
-        - n_ranked: Number of rankings processed
+        - n_matches: Number of comparisons the place has had
         
         Returns:
         - Updated rating
@@ -38,18 +72,249 @@ class DynamicEloSystem:
             outcome = 0.5
             
         expected = self.expected_score(current_rating, self.baseline_rating)
-        return self.update_rating(current_rating, expected, outcome, n_ranked)
+        return self.update_rating(current_rating, expected, outcome, n_matches)
     
-    def compare(self, rating_a, rating_b, outcome, n_ranked):
+    def compare(self, rating_a, rating_b, outcome, matches_a, matches_b=None):
+        """Rate one match, each side by its own comparison count (matches_a for both by default)"""
+        if matches_b is None:
+            matches_b = matches_a
         expected_a = self.expected_score(rating_a, rating_b)
         expected_b = 1 - expected_a
         
-        new_rating_a = self.update_rating(rating_a, expected_a, outcome, n_ranked)
-        new_rating_b = self.update_rating(rating_b, expected_b, 1 - outcome, n_ranked)
+        new_rating_a = self.update_rating(rating_a, expected_a, outcome, matches_a)
+        new_rating_b = self.update_rating(rating_b, expected_b, 1 - outcome, matches_b)
         
         return new_rating_a, new_rating_b
+
+    def _side_terms(self, rating, matches, opponent_rating, opponent_deviation, actual):
+        """
+        What one match contributes to one side: its rating change before the Glicko
+        scaling by the new deviation when uncertainty is on, and the information it
+        adds to the deviation, q^2 g^2 E (1 - E)
+        """
+        g = 1 / math.sqrt(1 + self._g_factor * opponent_deviation * opponent_deviation)
+        expected = 1 / (1 + 10 ** (g * (opponent_rating - rating) / self.scale_factor))
+        information = self._q * self._q * g * g * expected * (1 - expected)
+        if self.uncertainty:
+            return g * (actual - expected), information
+        k = self.calculate_k(matches)
+        return k * (actual - self.expected_score(rating, opponent_rating)), information
+
+    def _apply_terms(self, rating, deviation, term, information):
+        deviation = max(self.rd_min, 1 / math.sqrt(1 / (deviation * deviation) + information))
+        if self.uncertainty:
+            return rating + self._q * deviation * deviation * term, deviation
+        return rating + term, deviation
     
     def normalize_rating(self, rating, min_rating=0, max_rating=2000, scale=10):
         # Ensure the rating is within bounds
         rating = max(min_rating, min(rating, max_rating))
-        return scale * (rating - min_rating) / (max_rating - min_rating)
\ No newline at end of file
+        return scale * (rating - min_rating) / (max_rating - min_rating)
+
+    def expected_scores(self, ratings_a, ratings_b, exact=False):
+        """Vectorized expected_score over arrays of ratings, bit-identical to it if exact"""
+        ratings_a = np.asarray(ratings_a, dtype=np.float64)
+        ratings_b = np.asarray(ratings_b, dtype=np.float64)
+        exponents = (ratings_b - ratings_a) / self.scale_factor
+        if exact:
+            return 1 / (1 + _exact_pow10(exponents).astype(np.float64))
+        return 1 / (1 + 10 ** exponents)
+
+    def calculate_ks(self, n_matches):
+        """Vectorized calculate_k, evaluated once per distinct n_matches"""
+        n_matches = np.asarray(n_matches)
+        unique, inverse = np.unique(n_matches, return_inverse=True)
+        ks = np.array([self.calculate_k(n) for n in unique.tolist()], dtype=np.float64)
+        return ks[inverse].reshape(n_matches.shape)
+
+    def compare_batch(self, ratings_a, ratings_b, outcomes, matches_a, matches_b=None, exact=False):
+        """
+        Vectorized compare over independent pairs.
+
+        Parameters:
+        - ratings_a, ratings_b: Ratings of both sides of every match
+        - outcomes: Score of side a in every match (1, 0.5 or 0)
+        - matches_a, matches_b: Comparison counts of each side, per match or a single
+          value, matches_a for both sides by default
+        - exact: Produce the same bits as compare, at some cost in speed
+
+        Returns:
+        - Arrays of updated ratings for side a and side b
+        """
+        ratings_a = np.asarray(ratings_a, dtype=np.float64)
+        ratings_b = np.asarray(ratings_b, dtype=np.float64)
+        outcomes = np.asarray(outcomes, dtype=np.float64)
+        if matches_b is None:
+            matches_b = matches_a
+        k_a = self.calculate_ks(np.broadcast_to(matches_a, ratings_a.shape))
+        k_b = self.calculate_ks(np.broadcast_to(matches_b, ratings_a.shape))
+
+        expected_a = self.expected_scores(ratings_a, ratings_b, exact=exact)
+        expected_b = 1 - expected_a
+        new_a = ratings_a + k_a * (outcomes - expected_a)
+        new_b = ratings_b + k_b * ((1 - outcomes) - expected_b)
+        return new_a, new_b
+
+    def _side_terms_batch(self, ratings, matches, opponent_ratings, opponent_deviations, actual, exact=False):
+        """Vectorized _side_terms, bit-identical to it if exact"""
+        g = 1 / np.sqrt(1 + self._g_factor * opponent_deviations * opponent_deviations)
+        exponents = g * (opponent_ratings - ratings) / self.scale_factor
+        powers = _exact_pow10(exponents).astype(np.float64) if exact else 10 ** exponents
+        expected = 1 / (1 + powers)
+        information = self._q * self._q * g * g * expected * (1 - expected)
+        if self.uncertainty:
+            return g * (actual - expected), information
+        k = self.calculate_ks(matches)
+        return k * (actual - self.expected_scores(ratings, opponent_ratings, exact=exact)), information
+
+    def _apply_terms_batch(self, ratings, deviations, terms, information):
+        deviations = np.maximum(self.rd_min, 1 / np.sqrt(1 / (deviations * deviations) + information))
+        if self.uncertainty:
+            return ratings + self._q * deviations * deviations * terms, deviations
+        return ratings + terms, deviations
+
+    def apply_batch(
+        self,
+        ratings,
+        a,
+        b,
+        outcomes,
+        matches=None,
+        deviations=None,
+        sequential=True,
+        min_vector_size=64,
+    ):
+        """
+        Apply a sequence of matches to arrays of ratings, comparison counts and rating
+        deviations. Each side of a match is rated by its own count, or by both sides'
+        deviations with uncertainty, as it stands before the match.
+
+        Parameters:
+        - ratings: Current ratings, indexed by the entries of a and b
+        - a, b: Indices of both sides of every match, b may be BASELINE for a single
+          place vote against the baseline rating (only side a is updated)
+        - outcomes: Score of side a in every match (1, 0.5 or 0)
+        - matches: Comparisons each place has had so far, 0 for all by default
+        - deviations: Rating deviation of each place, rd_initial for all by default
+        - sequential: Apply matches in order, each seeing the results of the earlier
+          ones. Otherwise every match is scored against the starting state and its
+          effects are summed, which with uncertainty is a Glicko rating period.
+        - min_vector_size: Sequential batches whose independent groups average fewer
+          matches than this run through scalar math instead, with the same results
+
+        Returns:
+        - New arrays of ratings, comparison counts and deviations
+        """
+        ratings = np.array(ratings, dtype=np.float64)
+        matches = (
+            np.zeros(len(ratings), dtype=np.int64) if matches is None
+            else np.array(matches, dtype=np.int64)
+        )
+        deviations = (
+            np.full(len(ratings), self.rd_initial, dtype=np.float64) if deviations is None
+            else np.array(deviations, dtype=np.float64)
+        )
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        outcomes = np.asarray(outcomes, dtype=np.float64)
+        if a.size == 0:
+            return ratings, matches, deviations
+
+        single = b == BASELINE
+        opponent = np.where(single, 0, b)
+        pair = ~single
+
+        if not sequential:
+            opponent_ratings = np.where(single, self.baseline_rating, ratings[opponent])
+            opponent_deviations = np.where(single, 0.0, deviations[opponent])
+            terms_a, info_a = self._side_terms_batch(
+                ratings[a], matches[a], opponent_ratings, opponent_deviations, outcomes
+            )
+            terms_b, info_b = self._side_terms_batch(
+                ratings[b[pair]], matches[b[pair]],
+                ratings[a[pair]], deviations[a[pair]], 1 - outcomes[pair]
+            )
+            terms = np.zeros_like(ratings)
+            information = np.zeros_like(ratings)
+            np.add.at(terms, a, terms_a)
+            np.add.at(terms, b[pair], terms_b)
+            np.add.at(information, a, info_a)
+            np.add.at(information, b[pair], info_b)
+            played = np.bincount(np.concatenate([a, b[pair]]), minlength=len(ratings))
+            touched = played > 0
+            ratings[touched], deviations[touched] = self._apply_terms_batch(
+                ratings[touched], deviations[touched], terms[touched], information[touched]
+            )
+            return ratings, matches + played, deviations
+
+        # A match can run once every earlier match on either of its places has, so
+        # matches are grouped into levels of independent matches applied in order
+        levels = self._match_levels(a.tolist(), b.tolist(), len(ratings))
+        n_levels = max(levels) + 1
+        if a.size < min_vector_size * n_levels:
+            return self._apply_scalar(ratings, matches, deviations, a, b, outcomes)
+
+        levels = np.asarray(levels)
+        order = np.argsort(levels, kind='stable')
+        bounds = np.searchsorted(levels[order], np.arange(n_levels + 1))
+        for level in range(n_levels):
+            idx = order[bounds[level]:bounds[level + 1]]
+            level_a, level_b, level_pair = a[idx], opponent[idx][pair[idx]], pair[idx]
+            level_outcomes = outcomes[idx]
+            rating_a, deviation_a = ratings[level_a], deviations[level_a]
+            opponent_ratings = np.where(level_pair, ratings[opponent[idx]], self.baseline_rating)
+            opponent_deviations = np.where(level_pair, deviations[opponent[idx]], 0.0)
+
+            terms_a, info_a = self._side_terms_batch(
+                rating_a, matches[level_a],
+                opponent_ratings, opponent_deviations, level_outcomes, exact=True
+            )
+            terms_b, info_b = self._side_terms_batch(
+                ratings[level_b], matches[level_b],
+                rating_a[level_pair], deviation_a[level_pair], 1 - level_outcomes[level_pair],
+                exact=True
+            )
+            ratings[level_a], deviations[level_a] = self._apply_terms_batch(
+                rating_a, deviation_a, terms_a, info_a
+            )
+            ratings[level_b], deviations[level_b] = self._apply_terms_batch(
+                ratings[level_b], deviations[level_b], terms_b, info_b
+            )
+            matches[level_a] += 1
+            matches[level_b] += 1
+        return ratings, matches, deviations
+
+    @staticmethod
+    def _match_levels(a, b, n_ratings):
+        last_level = [-1] * n_ratings
+        levels = []
+        for i, j in zip(a, b):
+            level = 1 + (max(last_level[i], last_level[j]) if j != BASELINE else last_level[i])
+            last_level[i] = level
+            if j != BASELINE:
+                last_level[j] = level
+            levels.append(level)
+        return levels
+
+    def _apply_scalar(self, ratings, matches, deviations, a, b, outcomes):
+        r, m, d = ratings.tolist(), matches.tolist(), deviations.tolist()
+        for i, j, outcome in zip(a.tolist(), b.tolist(), outcomes.tolist()):
+            if j == BASELINE:
+                term, information = self._side_terms(
+                    r[i], m[i], self.baseline_rating, 0.0, outcome
+                )
+                r[i], d[i] = self._apply_terms(r[i], d[i], term, information)
+                m[i] += 1
+                continue
+
+            term_a, info_a = self._side_terms(r[i], m[i], r[j], d[j], outcome)
+            term_b, info_b = self._side_terms(r[j], m[j], r[i], d[i], 1 - outcome)
+            r[i], d[i] = self._apply_terms(r[i], d[i], term_a, info_a)
+            r[j], d[j] = self._apply_terms(r[j], d[j], term_b, info_b)
+            m[i] += 1
+            m[j] += 1
+        return (
+            np.array(r, dtype=np.float64),
+            np.array(m, dtype=np.int64),
+            np.array(d, dtype=np.float64),
+        )
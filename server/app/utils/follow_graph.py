@@ -0,0 +1,287 @@
+import bisect
+import random
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+def _distinct_keys(sources: np.ndarray, targets: np.ndarray, n_nodes: int) -> np.ndarray:
+    """Sorted, distinct source * n_nodes + target keys of a list of edges"""
+    keys = np.sort(sources.astype(np.int64) * n_nodes + targets)
+    if len(keys):
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return keys
+
+class _Adjacency:
+    """
+    One direction of the graph in compressed sparse row form: the neighbours of dense
+    node i are targets[offsets[i]:offsets[i + 1]], sorted. Edges added or removed since
+    the arrays were built are kept in small per-node overlays, the added ones sorted
+    by user id, and folded in by compact().
+    """
+
+    def __init__(self, keys: np.ndarray, n_nodes: int, ids: List[int]):
+        """Build from the sorted, distinct edge keys source * n_nodes + target"""
+        self.targets = (keys % max(n_nodes, 1)).astype(np.int32)
+        self.offsets = np.searchsorted(keys, np.arange(n_nodes + 1, dtype=np.int64) * n_nodes)
+        # User ids of the dense ids, in id order up to the nodes the arrays were built with
+        self.ids = ids
+        self.n_built = n_nodes
+        self.added: Dict[int, List[int]] = {}
+        self.removed: Dict[int, Set[int]] = {}
+
+    def base(self, node: int) -> np.ndarray:
+        if node + 1 >= len(self.offsets):
+            return self.targets[:0]
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def neighbours(self, node: int) -> List[int]:
+        """Dense ids of a node's neighbours, sorted"""
+        result = self.base(node).tolist()
+        removed = self.removed.get(node)
+        if removed:
+            result = [n for n in result if n not in removed]
+        added = self.added.get(node)
+        if added:
+            result = sorted(result + added)
+        return result
+
+    def page(self, node: int, limit: int, after: Optional[int]) -> List[int]:
+        """Dense ids of up to limit neighbours whose user ids follow after, in user id order"""
+        base = self.base(node)
+        added = self.added.get(node, [])
+        removed = self.removed.get(node, ())
+        i = j = 0
+        if after is not None:
+            # The built nodes are numbered in user id order, and so is base
+            i = int(np.searchsorted(base, bisect.bisect_right(self.ids, after, hi=self.n_built)))
+            j = bisect.bisect_right(added, after, key=self.ids.__getitem__)
+
+        result = []
+        while len(result) < limit and (i < len(base) or j < len(added)):
+            if j == len(added) or (i < len(base) and self.ids[base[i]] < self.ids[added[j]]):
+                n = int(base[i])
+                i += 1
+                if n in removed:
+                    continue
+            else:
+                n = added[j]
+                j += 1
+            result.append(n)
+        return result
+
+    def degree(self, node: int) -> int:
+        return len(self.base(node)) - len(self.removed.get(node, ())) + len(self.added.get(node, ()))
+
+    def _added_at(self, node: int, target: int) -> Optional[int]:
+        added = self.added.get(node)
+        if not added:
+            return None
+        i = bisect.bisect_left(added, self.ids[target], key=self.ids.__getitem__)
+        return i if i < len(added) and added[i] == target else None
+
+    def contains(self, node: int, target: int) -> bool:
+        if self._added_at(node, target) is not None:
+            return True
+        if target in self.removed.get(node, ()):
+            return False
+        base = self.base(node)
+        i = np.searchsorted(base, target)
+        return i < len(base) and base[i] == target
+
+    def add(self, node: int, target: int) -> None:
+        removed = self.removed.get(node)
+        if removed and target in removed:
+            removed.discard(target)
+        elif not self.contains(node, target):
+            bisect.insort(self.added.setdefault(node, []), target, key=self.ids.__getitem__)
+
+    def remove(self, node: int, target: int) -> None:
+        i = self._added_at(node, target)
+        if i is not None:
+            del self.added[node][i]
+        elif self.contains(node, target):
+            self.removed.setdefault(node, set()).add(target)
+
+    def pending(self) -> int:
+        return sum(map(len, self.added.values())) + sum(map(len, self.removed.values()))
+
+class FollowGraph:
+    """
+    Compact in-memory copy of the followers table.
+
+    User ids are mapped to dense integers and both directions of the graph are held as
+    CSR integer arrays, a few bytes per edge. Follows and unfollows go to an overlay
+    that is compacted back into the arrays once it grows past compact_threshold edges.
+    Neighbour pages are slices of sorted arrays, random users are drawn in O(1) and
+    suggestions only visit a user's 2-hop neighbourhood.
+    """
+
+    def __init__(
+        self,
+        user_ids: Iterable[int] = (),
+        edges: Iterable[Tuple[int, int]] = (),
+        compact_threshold: int = 10000,
+    ):
+        self.compact_threshold = compact_threshold
+        self.load(user_ids, edges)
+
+    def load(self, user_ids: Iterable[int], edges: Iterable[Tuple[int, int]]) -> None:
+        """Build from user ids and (follower, followee) pairs"""
+        edges = np.fromiter(
+            (user_id for edge in edges for user_id in edge), dtype=np.int64
+        ).reshape(-1, 2)
+        ids = np.union1d(np.fromiter(user_ids, dtype=np.int64), edges.ravel())
+        self._number(ids)
+        edges = np.searchsorted(ids, edges)
+        self._build(edges[edges[:, 0] != edges[:, 1]])
+
+    def _number(self, ids: np.ndarray) -> None:
+        """Give the sorted user ids dense ids in the same order"""
+        self._ids: List[int] = ids.tolist()
+        self._index: Dict[int, int] = {user_id: i for i, user_id in enumerate(self._ids)}
+
+    def _build(self, edges: np.ndarray) -> None:
+        n_nodes = len(self._ids)
+        self._following = _Adjacency(
+            _distinct_keys(edges[:, 0], edges[:, 1], n_nodes), n_nodes, self._ids
+        )
+        self._followers = _Adjacency(
+            _distinct_keys(edges[:, 1], edges[:, 0], n_nodes), n_nodes, self._ids
+        )
+
+    def compact(self) -> None:
+        """Fold pending follows and unfollows into the CSR arrays"""
+        following = self._following
+        n_nodes = len(self._ids)
+        sources = np.repeat(np.arange(len(following.offsets) - 1), np.diff(following.offsets))
+        targets = following.targets.astype(np.int64)
+
+        removed = [(a, b) for a, bs in following.removed.items() for b in bs]
+        if removed:
+            removed = np.array(removed, dtype=np.int64)
+            keep = ~np.isin(sources * n_nodes + targets, removed[:, 0] * n_nodes + removed[:, 1])
+            sources, targets = sources[keep], targets[keep]
+
+        added = np.array(
+            [(a, b) for a, bs in following.added.items() for b in bs], dtype=np.int64
+        ).reshape(-1, 2)
+        sources = np.concatenate((sources, added[:, 0]))
+        targets = np.concatenate((targets, added[:, 1]))
+
+        # Users added since the last build took the next dense ids, renumber them all in
+        # user id order again
+        ids = np.array(self._ids, dtype=np.int64)
+        order = np.argsort(ids)
+        renumbered = np.empty_like(order)
+        renumbered[order] = np.arange(len(order))
+        self._number(ids[order])
+        self._build(np.column_stack((renumbered[sources], renumbered[targets])))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._index
+
+    @property
+    def edge_count(self) -> int:
+        following = self._following
+        return (
+            len(following.targets)
+            + sum(map(len, following.added.values()))
+            - sum(map(len, following.removed.values()))
+        )
+
+    def add_user(self, user_id: int) -> None:
+        if user_id in self._index:
+            return
+        # New users take the next dense id, compact() puts them back in user id order
+        self._index[user_id] = len(self._ids)
+        self._ids.append(user_id)
+
+    def follow(self, follower: int, followee: int) -> None:
+        self.add_user(follower)
+        self.add_user(followee)
+        a, b = self._index[follower], self._index[followee]
+        self._following.add(a, b)
+        self._followers.add(b, a)
+        self._maybe_compact()
+
+    def unfollow(self, follower: int, followee: int) -> None:
+        a, b = self._index.get(follower), self._index.get(followee)
+        if a is None or b is None:
+            return
+        self._following.remove(a, b)
+        self._followers.remove(b, a)
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if self._following.pending() > self.compact_threshold:
+            self.compact()
+
+    def is_following(self, follower: int, followee: int) -> bool:
+        a, b = self._index.get(follower), self._index.get(followee)
+        return a is not None and b is not None and self._following.contains(a, b)
+
+    def follower_count(self, user_id: int) -> int:
+        node = self._index.get(user_id)
+        return self._followers.degree(node) if node is not None else 0
+
+    def following_count(self, user_id: int) -> int:
+        node = self._index.get(user_id)
+        return self._following.degree(node) if node is not None else 0
+
+    def _page(self, adjacency: _Adjacency, user_id: int, limit: int, after: Optional[int]) -> List[int]:
+        node = self._index.get(user_id)
+        if node is None:
+            return []
+        return [self._ids[n] for n in adjacency.page(node, limit, after)]
+
+    def followers(self, user_id: int, limit: int, after: Optional[int] = None) -> List[int]:
+        """Ids of a user's followers in id order, starting after the given id"""
+        return self._page(self._followers, user_id, limit, after)
+
+    def following(self, user_id: int, limit: int, after: Optional[int] = None) -> List[int]:
+        """Ids of the users a user follows in id order, starting after the given id"""
+        return self._page(self._following, user_id, limit, after)
+
+    def random_users(self, k: int, exclude: Iterable[int] = ()) -> List[int]:
+        """Up to k distinct random users, each drawn in O(1)"""
+        exclude = set(exclude)
+        k = min(k, len(self._ids) - len(exclude & self._index.keys()))
+        picked: Set[int] = set()
+        while len(picked) < k:
+            user_id = self._ids[random.randrange(len(self._ids))]
+            if user_id not in exclude:
+                picked.add(user_id)
+        return list(picked)
+
+    def suggestions(self, user_id: int, limit: int, max_fanout: int = 200) -> List[int]:
+        """
+        People you may know: users followed by the users someone follows, ranked by how
+        many of them follow each candidate, then by follower count. Only max_fanout
+        followees, and max_fanout of each of their followees, are visited.
+        """
+        node = self._index.get(user_id)
+        if node is None:
+            return []
+
+        following = self._following.neighbours(node)
+        excluded = set(following)
+        excluded.add(node)
+
+        hops = following if len(following) <= max_fanout else random.sample(following, max_fanout)
+        mutuals: Dict[int, int] = {}
+        for hop in hops:
+            second = self._following.neighbours(hop)
+            if len(second) > max_fanout:
+                second = random.sample(second, max_fanout)
+            for candidate in second:
+                if candidate not in excluded:
+                    mutuals[candidate] = mutuals.get(candidate, 0) + 1
+
+        ranked = sorted(
+            mutuals,
+            key=lambda n: (-mutuals[n], -self._followers.degree(n), self._ids[n])
+        )
+        return [self._ids[n] for n in ranked[:limit]]
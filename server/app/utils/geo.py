@@ -0,0 +1,135 @@
+import bisect
+import heapq
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+def parse_location(location: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse a "lat,lng" string as stored in places.location, None if it isn't one"""
+    try:
+        lat, lng = (float(part) for part in (location or '').split(','))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class GridIndex:
+    """
+    Spatial index of places on a fixed grid of lat/lng cells, for "best places near
+    here" queries.
+
+    Every cell keeps its places sorted by score, highest first. A query merges the
+    sorted lists of the cells overlapping its area and stops as soon as it has found
+    `limit` places inside the area, so the best places of a dense city are found
+    without visiting every place around them.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, float, float, float]] = (), cell_size: float = 0.05):
+        self.cell_size = cell_size
+        self._columns = int(math.ceil(360 / cell_size))
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, int]]] = {}
+        self._points: Dict[int, Tuple[float, float, float]] = {}
+        for place_id, lat, lng, score in items:
+            self.update(place_id, lat, lng, score)
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, place_id) -> bool:
+        return place_id in self._points
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (
+            int(math.floor((lat + 90) / self.cell_size)),
+            int(math.floor((lng + 180) / self.cell_size)) % self._columns,
+        )
+
+    def update(self, place_id: int, lat: float, lng: float, score: float) -> None:
+        """Insert a place or move it to new coordinates or a new score"""
+        self.remove(place_id)
+        bisect.insort(self._cells.setdefault(self._cell(lat, lng), []), (-float(score), place_id))
+        self._points[place_id] = (lat, lng, float(score))
+
+    def set_score(self, place_id: int, score: float) -> None:
+        point = self._points.get(place_id)
+        if point is not None and point[2] != float(score):
+            self.update(place_id, point[0], point[1], score)
+
+    def remove(self, place_id: int) -> None:
+        point = self._points.pop(place_id, None)
+        if point is None:
+            return
+        cell_key = self._cell(point[0], point[1])
+        cell = self._cells[cell_key]
+        del cell[bisect.bisect_left(cell, (-point[2], place_id))]
+        if not cell:
+            del self._cells[cell_key]
+
+    def _cells_in_box(self, south: float, west: float, north: float, east: float) -> Iterator[List[Tuple[float, int]]]:
+        south_row, west_column = self._cell(max(south, -90), west)
+        north_row, east_column = self._cell(min(north, 90), east)
+        # Boxes crossing the antimeridian wrap around the columns
+        span = (east_column - west_column) % self._columns
+        if east - west >= 360:
+            span = self._columns - 1
+        if (north_row - south_row + 1) * (span + 1) > len(self._cells):
+            # The box covers more cells than hold places, visit those instead
+            for (row, column), cell in self._cells.items():
+                if south_row <= row <= north_row and (column - west_column) % self._columns <= span:
+                    yield cell
+            return
+        for row in range(south_row, north_row + 1):
+            for offset in range(span + 1):
+                cell = self._cells.get((row, (west_column + offset) % self._columns))
+                if cell:
+                    yield cell
+
+    def _best(self, cells, accept, limit: int) -> List[Tuple[int, float]]:
+        results = []
+        for neg_score, place_id in heapq.merge(*cells):
+            if accept(place_id):
+                results.append((place_id, -neg_score))
+                if len(results) == limit:
+                    break
+        return results
+
+    def nearby(self, lat: float, lng: float, radius_km: float, limit: int) -> List[Tuple[int, float, float]]:
+        """Highest scored places within radius_km, as (place id, score, distance in km)"""
+        lat_span = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(lat) + lat_span, 90)))
+        lng_span = 180 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE * cos_lat), 180)
+        cells = list(self._cells_in_box(lat - lat_span, lng - lng_span, lat + lat_span, lng + lng_span))
+
+        distances = {}
+
+        def accept(place_id):
+            point = self._points[place_id]
+            distances[place_id] = haversine_km(lat, lng, point[0], point[1])
+            return distances[place_id] <= radius_km
+
+        return [
+            (place_id, score, distances[place_id])
+            for place_id, score in self._best(cells, accept, limit)
+        ]
+
+    def in_box(self, south: float, west: float, north: float, east: float, limit: int) -> List[Tuple[int, float]]:
+        """Highest scored places inside a bounding box, which may cross the antimeridian"""
+        cells = list(self._cells_in_box(south, west, north, east))
+
+        def accept(place_id):
+            lat, lng, _ = self._points[place_id]
+            in_longitude = west <= lng <= east if west <= east else (lng >= west or lng <= east)
+            return south <= lat <= north and in_longitude
+
+        return self._best(cells, accept, limit)
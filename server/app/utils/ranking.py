@@ -0,0 +1,208 @@
+import itertools
+import random
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+class _Node:
+    __slots__ = ('key', 'priority', 'left', 'right', 'size')
+
+    def __init__(self, key, priority):
+        self.key = key
+        self.priority = priority
+        self.left = None
+        self.right = None
+        self.size = 1
+
+def _size(node):
+    return node.size if node else 0
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+def _split(node, key):
+    """Split into (keys < key, keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        return _update(node), right
+    left, right = _split(node.left, key)
+    node.left = right
+    return left, _update(node)
+
+def _merge(left, right):
+    """Merge two treaps where every key in left is smaller than every key in right"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+def _delete(node, key):
+    if node is None:
+        return None
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _delete(node.left, key)
+    else:
+        node.right = _delete(node.right, key)
+    return _update(node)
+
+class RankIndex:
+    """
+    Order-statistic index of places by score, highest score first.
+
+    Backed by a treap augmented with subtree sizes, so updating a score, looking up
+    the rank of a place and selecting the place at a rank are all O(log n). Ties are
+    broken by place id to keep ranks deterministic.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, float]] = ()):
+        self._scores: Dict[int, float] = {}
+        self._root = None
+        self.load(items)
+
+    @staticmethod
+    def _key(place_id, score):
+        return (-score, place_id)
+
+    def load(self, items: Iterable[Tuple[int, float]]) -> None:
+        """Replace the contents of the index, building it in O(n log n)"""
+        self._scores = {place_id: float(score) for place_id, score in items}
+        keys = sorted(self._key(pid, score) for pid, score in self._scores.items())
+
+        # Priorities are handed out in level order so every parent outranks its children
+        priorities = sorted((random.random() for _ in keys), reverse=True)
+        nodes = [None] * len(keys)
+
+        def build(lo, hi, slot):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = _Node(keys[mid], 0.0)
+            nodes[mid] = (slot, node)
+            node.left = build(lo, mid, 2 * slot + 1)
+            node.right = build(mid + 1, hi, 2 * slot + 2)
+            return _update(node)
+
+        self._root = build(0, len(keys), 0)
+        for priority, (_, node) in zip(priorities, sorted(nodes, key=lambda n: n[0])):
+            node.priority = priority
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, place_id) -> bool:
+        return place_id in self._scores
+
+    def score(self, place_id: int) -> Optional[float]:
+        return self._scores.get(place_id)
+
+    def update(self, place_id: int, score: float) -> None:
+        """Insert a place or move it to its new score"""
+        score = float(score)
+        if place_id in self._scores:
+            if self._scores[place_id] == score:
+                return
+            self._root = _delete(self._root, self._key(place_id, self._scores[place_id]))
+
+        key = self._key(place_id, score)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, random.random())), right)
+        self._scores[place_id] = score
+
+    def remove(self, place_id: int) -> None:
+        if place_id not in self._scores:
+            return
+        self._root = _delete(self._root, self._key(place_id, self._scores.pop(place_id)))
+
+    def rank(self, place_id: int) -> Optional[int]:
+        """1-based rank of a place, or None if it isn't indexed"""
+        if place_id not in self._scores:
+            return None
+        key = self._key(place_id, self._scores[place_id])
+        node, rank = self._root, 0
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            else:
+                rank += _size(node.left) + 1
+                if key == node.key:
+                    return rank
+                node = node.right
+        return None
+
+    def place_at(self, rank: int) -> Optional[int]:
+        """Place id at a 1-based rank"""
+        if rank < 1 or rank > len(self):
+            return None
+        node = self._root
+        while node is not None:
+            left_size = _size(node.left)
+            if rank <= left_size:
+                node = node.left
+            elif rank == left_size + 1:
+                return node.key[1]
+            else:
+                rank -= left_size + 1
+                node = node.right
+        return None
+
+    def count_before(self, score: float, place_id: int, inclusive: bool = False) -> int:
+        """
+        Number of places ranked ahead of a (score, place id) position, indexed or not,
+        counting a place at exactly that position if inclusive
+        """
+        key = self._key(place_id, float(score))
+        node, count = self._root, 0
+        while node is not None:
+            if node.key < key or (inclusive and node.key == key):
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def iter_from(self, start: int) -> Iterator[int]:
+        """Place ids from a 1-based rank onwards, in rank order"""
+        if start > len(self):
+            return
+        start = max(start, 1)
+
+        # Descend to the start rank, remembering the ancestors still to be visited
+        stack = []
+        node, rank = self._root, start
+        while node is not None:
+            left_size = _size(node.left)
+            if rank <= left_size:
+                stack.append(node)
+                node = node.left
+            elif rank == left_size + 1:
+                stack.append(node)
+                break
+            else:
+                rank -= left_size + 1
+                node = node.right
+
+        # In-order walk from there
+        while stack:
+            node = stack.pop()
+            yield node.key[1]
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+    def range(self, start: int, stop: int) -> List[int]:
+        """Place ids ranked start..stop (1-based, inclusive) in O(log n + k)"""
+        start = max(start, 1)
+        stop = min(stop, len(self))
+        if start > stop:
+            return []
+        return list(itertools.islice(self.iter_from(start), stop - start + 1))
@@ -0,0 +1,85 @@
+import bisect
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def _tokens(username: str) -> List[str]:
+    """The full lowercased username, then each word in it, e.g. 'Jane_Doe' -> jane_doe, jane, doe"""
+    name = username.lower()
+    words = [word for word in re.split(r'[^0-9a-z]+', name) if word]
+    return [name] + [word for word in words if word != name]
+
+class PrefixIndex:
+    """
+    Autocomplete over usernames backed by a sorted array of (token, user id).
+
+    Every username is indexed whole and by each of its words, so a prefix is found with
+    two binary searches and the matches are contiguous. Matches are ranked by quality:
+    an exact username, then usernames starting with the prefix, then usernames with a
+    word starting with it, shorter usernames first.
+    """
+
+    def __init__(self, users: Iterable[Tuple[int, str]] = (), scan_limit: int = 1000):
+        self.scan_limit = scan_limit
+        self._names: Dict[int, str] = {}
+        self._entries: List[Tuple[str, int]] = []
+        self.load(users)
+
+    def load(self, users: Iterable[Tuple[int, str]]) -> None:
+        self._names = {user_id: username for user_id, username in users if username}
+        self._entries = sorted(
+            (token, user_id)
+            for user_id, username in self._names.items()
+            for token in _tokens(username)
+        )
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._names
+
+    def update(self, user_id: int, username: Optional[str]) -> None:
+        """Add a user or reindex them under a new username"""
+        if self._names.get(user_id) == username:
+            return
+        self.remove(user_id)
+        if not username:
+            return
+        self._names[user_id] = username
+        for token in _tokens(username):
+            bisect.insort(self._entries, (token, user_id))
+
+    def remove(self, user_id: int) -> None:
+        username = self._names.pop(user_id, None)
+        if username is None:
+            return
+        for token in _tokens(username):
+            i = bisect.bisect_left(self._entries, (token, user_id))
+            if i < len(self._entries) and self._entries[i] == (token, user_id):
+                del self._entries[i]
+
+    def search(self, prefix: str, limit: int) -> List[int]:
+        """Ids of the best matching users for a prefix"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        start = bisect.bisect_left(self._entries, (prefix,))
+        # Scores of the first scan_limit matches; on very short prefixes a few matches
+        # beyond them may be skipped in exchange for bounded work per keystroke
+        best: Dict[int, Tuple] = {}
+        for token, user_id in self._entries[start:start + self.scan_limit]:
+            if not token.startswith(prefix):
+                break
+            name = self._names[user_id]
+            lowered = name.lower()
+            if lowered == prefix:
+                quality = 0
+            elif lowered.startswith(prefix):
+                quality = 1
+            else:
+                quality = 2
+            score = (quality, len(name), lowered, user_id)
+            if user_id not in best or score < best[user_id]:
+                best[user_id] = score
+        return [user_id for *_, user_id in sorted(best.values())[:limit]]
@@ -0,0 +1,35 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from quart.json.provider import JSONProvider
+
+# Dict keys may be ints (e.g. updated places keyed by id), numpy values come from the
+# in-memory indexes
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+def dumps(obj: Any) -> bytes:
+    """Encode obj as JSON. Dataclasses, including the row models, and datetimes (ISO
+    8601) are encoded natively, Decimals as numbers."""
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+class OrjsonProvider(JSONProvider):
+    """The app's JSON provider, so jsonify and dict responses are encoded by orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Skip the round trip through str, the response body is bytes anyway
+        return self._app.response_class(dumps(obj), mimetype='application/json')
@@ -0,0 +1,38 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Dict
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode((data + '=' * (-len(data) % 4)).encode())
+
+def sign_token(payload: Dict[str, Any], key: str, ttl: float) -> str:
+    """
+    Encode payload as a token that expires after ttl seconds, signed with key so the
+    client can hold state between requests without being able to change it
+    """
+    body = _b64encode(json.dumps(
+        {**payload, 'exp': int(time.time() + ttl)}, separators=(',', ':')
+    ).encode())
+    signature = hmac.new(key.encode(), body.encode(), hashlib.sha256).digest()
+    return f'{body}.{_b64encode(signature)}'
+
+def verify_token(token: str, key: str) -> Dict[str, Any]:
+    """Decode a token made by sign_token, raising ValueError if it was altered or expired"""
+    try:
+        body, signature = token.split('.')
+        expected = hmac.new(key.encode(), body.encode(), hashlib.sha256).digest()
+        valid = hmac.compare_digest(_b64decode(signature), expected)
+        payload = json.loads(_b64decode(body)) if valid else None
+    except Exception:
+        raise ValueError('Invalid token')
+    if not isinstance(payload, dict):
+        raise ValueError('Invalid token')
+    if payload.pop('exp', 0) < time.time():
+        raise ValueError('Token expired')
+    return payload
@@ -0,0 +1 @@
+"""Synthetic data generator and load test, see the Benchmarks section of the README"""
@@ -0,0 +1,107 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+class HttpError(Exception):
+    pass
+
+class HttpClient:
+    """
+    Minimal keep-alive HTTP/1.1 client over one connection, enough to drive the API
+    without adding a dependency. Not safe for concurrent use: give each worker its own.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http':
+            raise ValueError('Only http:// URLs are supported')
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+            self._reader = self._writer = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Send a request and read the whole response, reconnecting once if the server hung up"""
+        for attempt in (1, 2):
+            if self._writer is None:
+                await self._connect()
+            try:
+                return await asyncio.wait_for(
+                    self._exchange(method, path, body, headers or {}), self.timeout
+                )
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                await self.close()
+                if attempt == 2:
+                    raise HttpError(str(e)) from e
+            except asyncio.TimeoutError as e:
+                await self.close()
+                raise HttpError('Timed out') from e
+
+    async def _exchange(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        lines = [f'{method} {self.prefix}{path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        if body is not None:
+            lines.append(f'Content-Length: {len(body)}')
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b''))
+        await self._writer.drain()
+
+        status_line = await self._reader.readuntil(b'\r\n')
+        if not status_line.startswith(b'HTTP/1.'):
+            raise ConnectionError(f'Unexpected response: {status_line[:40]!r}')
+        status = int(status_line.split()[1])
+
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = await self._reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    # Trailers, if any, end with an empty line
+                    while await self._reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readexactly(2)
+            content = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            content = await self._reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = await self._reader.read()
+            await self.close()
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, content
@@ -0,0 +1,221 @@
+"""
+Simulate votes on places of known strength and report how many it takes for the
+ratings to settle, for each way DynamicEloSystem can size a rating change:
+
+- submission: K from the number of matches in the submission, as ratings were
+  computed before per-place counts existed
+- count: K from the place's own comparison count
+- uncertainty: the Glicko update of both places' rating deviations
+
+    python -m bench.convergence --places 500 --submissions 50000 --json convergence.json
+
+Places are picked by a Zipf popularity, so a few landmarks collect most votes. Half
+way through, newcomers join the pool, and the report shows how many comparisons they
+need before their rating stays within --tolerance of their true strength. Nothing
+touches the database.
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.elo import DynamicEloSystem, BASELINE
+
+SCHEMES = ('submission', 'count', 'uncertainty')
+
+Submission = Tuple[List[int], List[int], List[float], int]
+
+def spearman(x: np.ndarray, y: np.ndarray) -> float:
+    """Rank correlation, ties broken by position, which is enough for continuous values"""
+    rx = np.empty(len(x))
+    ry = np.empty(len(y))
+    rx[np.argsort(x)] = np.arange(len(x))
+    ry[np.argsort(y)] = np.arange(len(y))
+    return float(np.corrcoef(rx, ry)[0, 1])
+
+def simulate_votes(args: argparse.Namespace) -> Tuple[np.ndarray, List[Submission], int]:
+    """
+    True strengths and the submissions voted on them, the same for every scheme.
+    Newcomers are the last places and only appear from the returned submission index on.
+    """
+    rng = np.random.default_rng(args.seed)
+    n_places = args.places
+    n_newcomers = int(n_places * args.newcomers)
+    n_established = n_places - n_newcomers
+    strengths = rng.normal(1000, args.spread, n_places)
+
+    popularity = 1 / np.arange(1, n_places + 1) ** args.zipf
+    popularity = popularity[rng.permutation(n_places)]
+    joined_at = args.submissions // 2
+
+    def expected(a, b):
+        return 1 / (1 + 10 ** ((b - a) / 400))
+
+    submissions = []
+    for s in range(args.submissions):
+        pool = n_established if s < joined_at else n_places
+        weights = popularity[:pool] / popularity[:pool].sum()
+        size = min(pool, 1 + rng.poisson(args.mean_places - 1))
+        places = rng.choice(pool, size=size, replace=False, p=weights)
+
+        a, b, outcomes = [], [], []
+        if size == 1:
+            # A single place vote against the baseline rating
+            a.append(int(places[0]))
+            b.append(BASELINE)
+            outcomes.append(float(rng.random() < expected(strengths[places[0]], 1000)))
+        else:
+            # The places the user compared, as consecutive winner/loser matches
+            for i, j in zip(places[:-1], places[1:]):
+                a.append(int(i))
+                b.append(int(j))
+                outcomes.append(float(rng.random() < expected(strengths[i], strengths[j])))
+        submissions.append((a, b, outcomes, len(a)))
+    return strengths, submissions, joined_at
+
+def _apply_submission_k(elo: DynamicEloSystem, ratings: List[float], submission: Submission) -> None:
+    """The pre-count update: every comparison of a submission uses K of its match count"""
+    a, b, outcomes, n_matches = submission
+    for i, j, outcome in zip(a, b, outcomes):
+        if j == BASELINE:
+            expected = elo.expected_score(ratings[i], elo.baseline_rating)
+            ratings[i] = elo.update_rating(ratings[i], expected, outcome, n_matches)
+        else:
+            ratings[i], ratings[j] = elo.compare(ratings[i], ratings[j], outcome, n_matches)
+
+def _settled_after(errors: List[Tuple[int, float]], tolerance: float) -> Optional[int]:
+    """Comparisons after which a place's error stayed within tolerance, None if it never did"""
+    settled = None
+    for count, error in errors:
+        if error > tolerance:
+            settled = None
+        elif settled is None:
+            settled = count
+    return settled
+
+def run_scheme(
+    scheme: str,
+    strengths: np.ndarray,
+    submissions: List[Submission],
+    joined_at: int,
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    elo = DynamicEloSystem(uncertainty=scheme == 'uncertainty')
+    n_places = len(strengths)
+    n_established = n_places - int(n_places * args.newcomers)
+    ratings = np.full(n_places, float(elo.baseline_rating))
+    matches = np.zeros(n_places, dtype=np.int64)
+    deviations = np.full(n_places, float(elo.rd_initial))
+    newcomer_errors: Dict[int, List[Tuple[int, float]]] = {
+        pid: [] for pid in range(n_established, n_places)
+    }
+
+    every = max(1, args.submissions // args.checkpoints)
+    curve = []
+    started = time.perf_counter()
+    for s, submission in enumerate(submissions):
+        a, b, outcomes, _ = submission
+        if scheme == 'submission':
+            values = ratings.tolist()
+            _apply_submission_k(elo, values, submission)
+            ratings = np.array(values)
+            np.add.at(matches, a + [j for j in b if j != BASELINE], 1)
+        else:
+            ratings, matches, deviations = elo.apply_batch(
+                ratings, a, b, outcomes, matches, deviations
+            )
+
+        if s >= joined_at:
+            # Error against the true strength, net of the pool's drift from it
+            rated = matches > 0
+            offset = float(np.mean(ratings[rated] - strengths[rated]))
+            for pid in set(a) | set(b):
+                if pid in newcomer_errors:
+                    error = abs(ratings[pid] - strengths[pid] - offset)
+                    newcomer_errors[pid].append((int(matches[pid]), float(error)))
+
+        if (s + 1) % every == 0 or s + 1 == len(submissions):
+            pool = n_established if s < joined_at else n_places
+            errors = ratings[:pool] - strengths[:pool]
+            curve.append({
+                'submissions': s + 1,
+                'comparisons_per_place': float(matches[:pool].mean()),
+                'spearman': spearman(ratings[:pool], strengths[:pool]),
+                'rmse': float(np.sqrt(np.mean((errors - errors.mean()) ** 2))),
+            })
+
+    # Settled once the rank correlation reaches the target and stays there
+    settled = None
+    for point in curve:
+        if point['spearman'] < args.target:
+            settled = None
+        elif settled is None:
+            settled = point['comparisons_per_place']
+
+    newcomers = [_settled_after(errors, args.tolerance) for errors in newcomer_errors.values()]
+    settled_newcomers = sorted(n for n in newcomers if n is not None)
+    return {
+        'comparisons_per_place_to_settle': settled,
+        'final_spearman': curve[-1]['spearman'],
+        'final_rmse': curve[-1]['rmse'],
+        'newcomers': len(newcomers),
+        'newcomers_settled': len(settled_newcomers),
+        'newcomer_median_comparisons': (
+            settled_newcomers[len(settled_newcomers) // 2] if settled_newcomers else None
+        ),
+        'seconds': time.perf_counter() - started,
+        'curve': curve,
+    }
+
+def print_report(results: Dict[str, Any], args: argparse.Namespace) -> None:
+    header = (
+        f"{'scheme':<14}{'cmp/place':>13}{'spearman':>10}{'rmse':>8}"
+        f"{'newcomers':>11}{'median cmp':>12}"
+    )
+    print(f"Comparisons per place until spearman >= {args.target} for good, and newcomers whose "
+          f"rating settled within {args.tolerance:g} points with their median comparisons to get there")
+    print(header)
+    print('-' * len(header))
+    for scheme, r in results['schemes'].items():
+        settled = r['comparisons_per_place_to_settle']
+        median = r['newcomer_median_comparisons']
+        print(
+            f"{scheme:<14}{'-' if settled is None else f'{settled:.1f}':>13}"
+            f"{r['final_spearman']:>10.3f}{r['final_rmse']:>8.1f}"
+            f"{r['newcomers_settled']:>6}/{r['newcomers']:<4}"
+            f"{'-' if median is None else median:>12}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--places', type=int, default=500)
+    parser.add_argument('--submissions', type=int, default=50_000)
+    parser.add_argument('--mean-places', type=float, default=3, help='Mean places compared per submission')
+    parser.add_argument('--spread', type=float, default=200, help='Standard deviation of true strengths')
+    parser.add_argument('--zipf', type=float, default=0.8, help='Exponent of place popularity')
+    parser.add_argument('--newcomers', type=float, default=0.05, help='Share of places that join half way')
+    parser.add_argument('--target', type=float, default=0.9, help='Rank correlation counted as settled')
+    parser.add_argument('--tolerance', type=float, default=100, help='Rating error counted as settled for newcomers')
+    parser.add_argument('--checkpoints', type=int, default=200)
+    parser.add_argument('--scheme', action='append', choices=SCHEMES, help='Defaults to all')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Write the results, with every scheme\'s curve, to this file')
+    args = parser.parse_args()
+
+    strengths, submissions, joined_at = simulate_votes(args)
+    results = {
+        'params': vars(args),
+        'schemes': {
+            scheme: run_scheme(scheme, strengths, submissions, joined_at, args)
+            for scheme in args.scheme or SCHEMES
+        },
+    }
+    print_report(results, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+Fill a local Postgres with a synthetic, reproducible data set for load tests.
+
+    python -m bench.generate --reset --users 20000 --places 10000 --reviews 2000000
+
+The same seed and sizes always produce the same rows. Popularity is skewed: a few
+users are followed by many and a few places get most of the reviews, like production.
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import asyncpg
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# (city, state, country, latitude, longitude, postal code prefix)
+CITIES = [
+    ('New York', 'NY', 'USA', 40.7128, -74.0060, '100'),
+    ('Los Angeles', 'CA', 'USA', 34.0522, -118.2437, '900'),
+    ('Chicago', 'IL', 'USA', 41.8781, -87.6298, '606'),
+    ('San Francisco', 'CA', 'USA', 37.7749, -122.4194, '941'),
+    ('Austin', 'TX', 'USA', 30.2672, -97.7431, '787'),
+    ('Seattle', 'WA', 'USA', 47.6062, -122.3321, '981'),
+    ('Boston', 'MA', 'USA', 42.3601, -71.0589, '021'),
+    ('Miami', 'FL', 'USA', 25.7617, -80.1918, '331'),
+    ('London', None, 'UK', 51.5074, -0.1278, None),
+    ('Paris', None, 'France', 48.8566, 2.3522, None),
+    ('Tokyo', None, 'Japan', 35.6762, 139.6503, None),
+    ('Toronto', 'ON', 'Canada', 43.6532, -79.3832, None),
+]
+
+TYPES = [
+    'restaurant', 'cafe', 'bar', 'bakery', 'museum', 'park', 'tourist_attraction',
+    'night_club', 'book_store', 'art_gallery', 'gym', 'movie_theater',
+]
+
+STREETS = ['Main St', 'Oak Ave', 'Park Blvd', 'Market St', 'High St', 'Elm St', 'Broadway', 'King St']
+NAME_WORDS = ['Blue', 'Golden', 'Little', 'Old', 'Corner', 'Green', 'Lucky', 'Royal', 'Hidden', 'Urban']
+NAME_NOUNS = ['Spoon', 'Garden', 'House', 'Room', 'Table', 'Market', 'Hall', 'Kitchen', 'Club', 'Lab']
+USER_WORDS = ['sunny', 'quiet', 'happy', 'brave', 'clever', 'lazy', 'rapid', 'tiny', 'wild', 'calm']
+USER_NOUNS = ['otter', 'falcon', 'maple', 'river', 'comet', 'panda', 'cedar', 'tiger', 'harbor', 'fox']
+REVIEW_TEXTS = [
+    'Great spot, would come back.', 'Overrated.', 'Loved the atmosphere.', '',
+    'Service was slow but worth it.', 'Hidden gem!', 'Fine, nothing special.', '',
+    'Best in the neighborhood.', 'Too crowded on weekends.',
+]
+
+TABLES = ['timeline_entries', 'personal_rankings', 'match_events', 'place_ratings', 'reviews', 'followers', 'places', 'users']
+
+CHUNK = 100_000
+
+def is_local(dsn: str) -> bool:
+    """Whether the DSN points at this machine: a Unix socket or a loopback host"""
+    parts = urlsplit(dsn)
+    host = parts.hostname or parse_qs(parts.query).get('host', [''])[0]
+    return not host or host.startswith('/') or host in ('localhost', '127.0.0.1', '::1')
+
+def zipf_weights(n: int, alpha: float, rng: np.random.Generator) -> np.ndarray:
+    """Probabilities proportional to 1 / rank ** alpha, with ranks shuffled over the ids"""
+    weights = 1.0 / np.arange(1, n + 1) ** alpha
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def follow_graph(
+    n_users: int,
+    mean_follows: float,
+    alpha: float,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (follower, followee) index pairs. Out-degrees are log-normal around mean_follows and
+    followees are drawn by a power-law popularity, so in-degrees have a long tail.
+    """
+    sigma = 1.0
+    degrees = rng.lognormal(math.log(max(mean_follows, 1e-9)) - sigma ** 2 / 2, sigma, n_users)
+    degrees = np.minimum(degrees.astype(np.int64), n_users - 1)
+    followers = np.repeat(np.arange(n_users, dtype=np.int64), degrees)
+    followees = rng.choice(n_users, size=len(followers), p=zipf_weights(n_users, alpha, rng))
+    keep = followers != followees
+    keys = np.unique(followers[keep] * n_users + followees[keep])
+    return keys // n_users, keys % n_users
+
+def review_pairs(
+    n_users: int,
+    n_places: int,
+    n_reviews: int,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct (user, place) index pairs, active users and popular places drawn more often"""
+    n_reviews = min(n_reviews, n_users * n_places)
+    user_weights = zipf_weights(n_users, 0.8, rng)
+    place_weights = zipf_weights(n_places, 1.0, rng)
+    keys = np.empty(0, dtype=np.int64)
+    # Popular pairs repeat, draw until there are enough distinct ones
+    while len(keys) < n_reviews:
+        draw = int((n_reviews - len(keys)) * 1.3) + 1
+        users = rng.choice(n_users, size=draw, p=user_weights)
+        places = rng.choice(n_places, size=draw, p=place_weights)
+        keys = np.unique(np.concatenate([keys, users * n_places + places]))
+    keys = rng.permutation(keys)[:n_reviews]
+    return keys // n_places, keys % n_places
+
+def _chunks(rows: Iterator[tuple], size: int = CHUNK) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def _copy(conn, table: str, columns: Sequence[str], rows: Iterator[tuple]) -> int:
+    count = 0
+    for chunk in _chunks(rows):
+        await conn.copy_records_to_table(table, records=chunk, columns=list(columns))
+        count += len(chunk)
+    return count
+
+def _log(message: str, started: float) -> None:
+    print(f'[{time.monotonic() - started:7.1f}s] {message}', flush=True)
+
+async def generate(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(args.seed)
+    started = time.monotonic()
+    now = datetime(2025, 1, 1)
+
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        existing = await conn.fetchval('SELECT EXISTS (SELECT 1 FROM users)')
+        if existing and not args.reset:
+            raise SystemExit('The database already has users, pass --reset to replace them')
+        if args.reset:
+            await conn.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+        # Users
+        n_users = args.users
+        usernames = [
+            f'{USER_WORDS[i % 10]}_{USER_NOUNS[(i // 10) % 10]}{i}' for i in range(n_users)
+        ]
+        count = await _copy(conn, 'users', ('id', 'username', 'email', 'clerk_id', 'image_url', 'created_at'), (
+            (
+                i + 1, usernames[i], f'{usernames[i]}@bench.example', f'user_bench{i + 1}',
+                f'https://images.bench.example/u/{i + 1}.jpg',
+                now - timedelta(days=int(rng.integers(0, 730))),
+            )
+            for i in range(n_users)
+        ))
+        _log(f'{count} users', started)
+
+        # Follow graph
+        followers, followees = follow_graph(n_users, args.follows, args.follow_alpha, rng)
+        count = await _copy(conn, 'followers', ('id', 'follower', 'followee'), (
+            (i + 1, int(a) + 1, int(b) + 1) for i, (a, b) in enumerate(zip(followers, followees))
+        ))
+        _log(f'{count} follows', started)
+
+        # Places, spread around cities, bigger cities get more of them
+        n_places = args.places
+        city_of = rng.choice(len(CITIES), size=n_places, p=zipf_weights(len(CITIES), 0.7, rng))
+        latitudes = np.array([CITIES[c][3] for c in city_of]) + rng.normal(0, 0.04, n_places)
+        longitudes = np.array([CITIES[c][4] for c in city_of]) + rng.normal(0, 0.05, n_places)
+        quality = np.clip(rng.normal(1000, 150, n_places), 200, 1800)
+
+        def place_row(i: int) -> tuple:
+            city, state, country, _, _, postal = CITIES[city_of[i]]
+            region = f'{state} {postal}{i % 100:02d}' if state and postal else state
+            address = ', '.join(filter(None, [
+                f'{i % 900 + 1} {STREETS[i % len(STREETS)]}', city, region, country
+            ]))
+            n_types = 1 + i % 3
+            types = ' · '.join(TYPES[(i * 7 + k * 5) % len(TYPES)] for k in range(n_types))
+            lat, lng = round(float(latitudes[i]), 6), round(float(longitudes[i]), 6)
+            return (
+                i + 1, f'bench_place_{i + 1}',
+                f'{NAME_WORDS[i % 10]} {NAME_NOUNS[(i // 10) % 10]} {i + 1}',
+                f'{lat},{lng}', lat, lng, f'https://images.bench.example/p/{i + 1}.jpg',
+                f'https://bench.example/{i + 1}', address, types,
+            )
+
+        count = await _copy(conn, 'places', (
+            'id', 'place_id', 'name', 'location', 'latitude', 'longitude', 'image', 'website',
+            'formatted_address', 'types'
+        ), (place_row(i) for i in range(n_places)))
+        await conn.copy_records_to_table('place_ratings', records=[
+            (i + 1, float(quality[i])) for i in range(n_places)
+        ], columns=['place_id', 'elo_rating'])
+        _log(f'{count} places', started)
+
+        # Reviews, ordered by time so ids grow with created_at like real ones
+        users, places = review_pairs(n_users, n_places, args.reviews, rng)
+        ages = np.sort(rng.exponential(120, len(users)))[::-1]
+        elo = np.clip(quality[places] + rng.normal(0, 60, len(users)), 0, 2000)
+        edited = rng.random(len(users)) < 0.1
+        edit_hours = rng.exponential(48, len(users))
+
+        def review_row(i: int) -> tuple:
+            user, place = int(users[i]), int(places[i])
+            created_at = now - timedelta(days=float(ages[i]))
+            updated_at = created_at + timedelta(hours=float(edit_hours[i])) if edited[i] else None
+            name = f'{NAME_WORDS[place % 10]} {NAME_NOUNS[(place // 10) % 10]} {place + 1}'
+            return (
+                i + 1, REVIEW_TEXTS[i % len(REVIEW_TEXTS)], user + 1, place + 1, name,
+                round(float(elo[i]) / 200, 4), float(elo[i]), usernames[user],
+                f'https://images.bench.example/u/{user + 1}.jpg', created_at, updated_at,
+            )
+
+        count = await _copy(conn, 'reviews', (
+            'id', 'text_review', 'user_id', 'place_id', 'place_name', 'rating', 'elo_rating',
+            'username', 'image', 'created_at', 'updated_at'
+        ), (review_row(i) for i in range(len(users))))
+        _log(f'{count} reviews', started)
+
+        # Counters and aggregates the app keeps up to date on write
+        for table in ('users', 'places', 'reviews', 'followers'):
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"GREATEST((SELECT MAX(id) FROM {table}), 1))"
+            )
+        await conn.execute('''
+            UPDATE users u SET follower_count = agg.n
+            FROM (SELECT followee, COUNT(*) AS n FROM followers GROUP BY followee) agg
+            WHERE u.id = agg.followee
+        ''')
+        await conn.execute('''
+            UPDATE users u SET following_count = agg.n
+            FROM (SELECT follower, COUNT(*) AS n FROM followers GROUP BY follower) agg
+            WHERE u.id = agg.follower
+        ''')
+        await conn.execute('''
+            UPDATE places p
+            SET rating_sum = agg.rating_sum, rating_count = agg.rating_count,
+                avg_rating = agg.rating_sum / agg.rating_count
+            FROM (
+                SELECT place_id, SUM(rating) AS rating_sum, COUNT(rating) AS rating_count
+                FROM reviews
+                GROUP BY place_id
+            ) agg
+            WHERE p.id = agg.place_id
+        ''')
+        await conn.execute('''
+            WITH ranked AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY COALESCE(avg_rating, 0) DESC, id) AS new_rank
+                FROM places
+            )
+            UPDATE places SET ranking = ranked.new_rank::text
+            FROM ranked
+            WHERE places.id = ranked.id
+        ''')
+        # Every user's own ranking, best rated review first, as migration 0011 seeds it
+        await conn.execute('''
+            INSERT INTO personal_rankings (user_id, place_id, position)
+            SELECT user_id, place_id,
+                ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY elo_rating DESC NULLS LAST, id)
+            FROM reviews
+        ''')
+        _log('counters, aggregates and rankings', started)
+
+        if args.timelines:
+            # Fan-out on write copies reviews into followers' timelines, except for
+            # authors over the fan-out limit whose reviews are merged in on read
+            await conn.execute('''
+                INSERT INTO timeline_entries (user_id, review_id, author_id, activity_at)
+                SELECT f.follower, r.id, r.user_id, COALESCE(r.updated_at, r.created_at)
+                FROM followers f
+                JOIN users a ON a.id = f.followee AND a.follower_count <= $1
+                JOIN reviews r ON r.user_id = f.followee
+                ON CONFLICT (user_id, review_id) DO NOTHING
+            ''', args.fanout_limit)
+            _log('timelines', started)
+
+        await conn.execute('ANALYZE')
+        _log('analyzed', started)
+    finally:
+        await conn.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL'), help='Defaults to DATABASE_URL')
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--places', type=int, default=5_000)
+    parser.add_argument('--reviews', type=int, default=1_000_000)
+    parser.add_argument('--follows', type=float, default=20, help='Mean follows per user')
+    parser.add_argument('--follow-alpha', type=float, default=1.1, help='Power-law exponent of followee popularity')
+    parser.add_argument('--timelines', action='store_true', help='Also fill the feed timelines')
+    parser.add_argument('--fanout-limit', type=int, default=int(os.getenv('FEED_FANOUT_LIMIT', 10000)))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Truncate the app tables first')
+    parser.add_argument('--allow-remote', action='store_true', help='Allow a database that is not on this machine')
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error('Set DATABASE_URL or pass --dsn')
+    if not is_local(args.dsn) and not args.allow_remote:
+        parser.error('Refusing to write synthetic data to a remote database without --allow-remote')
+    asyncio.run(generate(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""
+Replay a realistic traffic mix against a running server and report throughput,
+latency percentiles and database round trips per request.
+
+    python -m bench.load --url http://localhost:5001 --duration 60 --concurrency 32 \\
+        --json results.json --baseline baseline.json
+
+Request targets are sampled from the database the server uses (see bench.generate),
+with popular users and places requested more often. Round trips come from the
+server's /metrics, so they are exact for a single server process and a sample of one
+worker's traffic when there are several.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import asyncpg
+from dotenv import load_dotenv
+
+from bench.client import HttpClient, HttpError
+
+load_dotenv()
+
+# Endpoint name -> route template the server labels its metrics with
+ROUTES = {
+    'profile': '/profile/<clerk_id>',
+    'place': '/places/<place_id>',
+    'search': '/users/search',
+    'rankings': '/rankings',
+    'process_matches': '/process-matches',
+}
+
+DEFAULT_MIX = 'profile=30,place=25,search=15,rankings=15,process_matches=15'
+
+Request = Tuple[str, str, Optional[bytes]]
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {', '.join(ROUTES)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class Workload:
+    """Targets sampled from the database, and the requests built from them"""
+
+    def __init__(self, review_rate: float):
+        self.review_rate = review_rate
+        self.users: List[Tuple[int, str, str]] = []
+        self.user_weights: List[float] = []
+        self.places: List[str] = []
+        self.place_weights: List[float] = []
+        # Place ids by city, a submission compares places of one city
+        self.cities: Dict[str, List[int]] = {}
+        self.city_names: List[str] = []
+        self.city_weights: List[int] = []
+        self.types: List[str] = []
+
+    async def load(self, dsn: str, sample: int) -> None:
+        conn = await asyncpg.connect(dsn)
+        try:
+            users = await conn.fetch(
+                'SELECT id, clerk_id, username, follower_count FROM users '
+                'WHERE clerk_id IS NOT NULL AND username IS NOT NULL '
+                'ORDER BY follower_count DESC, id LIMIT $1',
+                sample
+            )
+            places = await conn.fetch(
+                '''
+                SELECT id, place_id, rating_count, types,
+                    lower(trim(split_part(formatted_address, ',', 2))) AS city
+                FROM places
+                WHERE place_id IS NOT NULL
+                ORDER BY rating_count DESC, id
+                LIMIT $1
+                ''',
+                sample
+            )
+        finally:
+            await conn.close()
+        if not users or not places:
+            raise SystemExit('No users or places to request, run bench.generate first')
+
+        self.users = [(row['id'], row['clerk_id'], row['username']) for row in users]
+        self.user_weights = [row['follower_count'] + 1 for row in users]
+        self.places = [row['place_id'] for row in places]
+        self.place_weights = [row['rating_count'] + 1 for row in places]
+        for row in places:
+            self.cities.setdefault(row['city'] or '', []).append(row['id'])
+        self.city_names = [city for city, ids in self.cities.items() if len(ids) >= 2]
+        self.city_weights = [len(self.cities[city]) for city in self.city_names]
+        self.types = sorted({
+            t.strip() for row in places for t in re.split(r'[·,]', row['types'] or '') if t.strip()
+        })
+
+    def _user(self, rng: random.Random) -> Tuple[int, str, str]:
+        return rng.choices(self.users, self.user_weights)[0]
+
+    def profile(self, rng: random.Random) -> Request:
+        return 'GET', f'/profile/{quote(self._user(rng)[1])}', None
+
+    def place(self, rng: random.Random) -> Request:
+        return 'GET', f'/places/{quote(rng.choices(self.places, self.place_weights)[0])}', None
+
+    def search(self, rng: random.Random) -> Request:
+        viewer_id, _, username = self._user(rng)
+        # What someone has typed so far: a prefix of a name, or of a word in it
+        word = rng.choice(re.split(r'[_\W]+', username) or [username]) or username
+        term = word[:rng.randint(2, max(2, min(len(word), 6)))]
+        return 'GET', f'/users/search?username={quote(term)}&viewer_id={viewer_id}', None
+
+    def rankings(self, rng: random.Random) -> Request:
+        roll = rng.random()
+        if roll < 0.15 and self.types:
+            return 'GET', f'/rankings?type={quote(rng.choice(self.types))}', None
+        if roll < 0.3 and self.city_names:
+            return 'GET', f'/rankings?region={quote(rng.choice(self.city_names))}', None
+        return 'GET', '/rankings', None
+
+    def process_matches(self, rng: random.Random) -> Request:
+        """A rating submission as the client sends it: the new place against a few others"""
+        user_id, _, username = self._user(rng)
+        city = rng.choices(self.city_names, self.city_weights)[0]
+        place, *others = rng.sample(self.cities[city], min(len(self.cities[city]), rng.randint(2, 5)))
+
+        matches = []
+        for other in others:
+            winner, loser = (place, other) if rng.random() < 0.5 else (other, place)
+            matches.append({'winner': winner, 'loser': loser, 'tie': []})
+        verdict = rng.random()
+        if verdict < 0.4:
+            matches.append({'winner': place, 'loser': None, 'tie': []})
+        elif verdict < 0.7:
+            matches.append({'winner': None, 'loser': None, 'tie': [place]})
+        else:
+            matches.append({'winner': None, 'loser': place, 'tie': []})
+
+        data: Dict[str, Any] = {'matches': matches}
+        if rng.random() < self.review_rate:
+            data.update({
+                'user_id': user_id,
+                'place_id': place,
+                'username': username,
+                'text_review': 'Benchmark review',
+                'review_id': None,
+                'image': None,
+            })
+        return 'POST', '/process-matches', json.dumps(data).encode()
+
+async def scrape_db_queries(url: str) -> Optional[Dict[str, Tuple[float, float]]]:
+    """(sum, count) of http_request_db_queries per route, None if metrics are off"""
+    client = HttpClient(url)
+    try:
+        status, _, body = await client.request('GET', '/metrics')
+    except HttpError:
+        return None
+    finally:
+        await client.close()
+    if status != 200:
+        return None
+
+    totals: Dict[str, List[float]] = {}
+    pattern = re.compile(r'^http_request_db_queries_(sum|count)\{route="((?:[^"\\]|\\.)*)"\} (\S+)$')
+    for line in body.decode().splitlines():
+        match = pattern.match(line)
+        if match:
+            kind, route, value = match.groups()
+            totals.setdefault(route, [0.0, 0.0])[kind == 'count'] = float(value)
+    return {route: (s, c) for route, (s, c) in totals.items()}
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    workload = Workload(args.review_rate)
+    await workload.load(args.dsn, args.sample)
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    started = time.monotonic()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.duration
+    before: Optional[Dict[str, Tuple[float, float]]] = None
+
+    async def worker(index: int) -> None:
+        rng = random.Random(args.seed * 100_003 + index)
+        client = HttpClient(args.url, timeout=args.timeout)
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    return
+                name = rng.choices(names, weights)[0]
+                method, path, body = getattr(workload, name)(rng)
+                headers = {'Content-Type': 'application/json'} if body is not None else None
+                sent = time.perf_counter()
+                try:
+                    status, _, _ = await client.request(method, path, body, headers)
+                    failed = status >= 400
+                except HttpError:
+                    failed = True
+                elapsed = time.perf_counter() - sent
+                if now >= measure_from:
+                    latencies[name].append(elapsed)
+                    errors[name] += failed
+        finally:
+            await client.close()
+
+    async def snapshot() -> None:
+        nonlocal before
+        await asyncio.sleep(args.warmup)
+        before = await scrape_db_queries(args.url)
+
+    await asyncio.gather(snapshot(), *(worker(i) for i in range(args.concurrency)))
+    after = await scrape_db_queries(args.url)
+
+    def round_trips(name: str) -> Optional[float]:
+        if before is None or after is None:
+            return None
+        s1, c1 = after.get(ROUTES[name], (0.0, 0.0))
+        s0, c0 = before.get(ROUTES[name], (0.0, 0.0))
+        return round((s1 - s0) / (c1 - c0), 2) if c1 > c0 else None
+
+    def summary(samples: List[float], failed: int) -> Dict[str, Any]:
+        ordered = sorted(samples)
+        return {
+            'requests': len(ordered),
+            'errors': failed,
+            'rps': round(len(ordered) / args.duration, 1),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        }
+
+    endpoints = {
+        name: {**summary(latencies[name], errors[name]), 'db_round_trips': round_trips(name)}
+        for name in names
+    }
+    return {
+        'config': {
+            'url': args.url, 'duration': args.duration, 'warmup': args.warmup,
+            'concurrency': args.concurrency, 'mix': mix, 'seed': args.seed,
+        },
+        'endpoints': endpoints,
+        'total': summary(
+            [latency for samples in latencies.values() for latency in samples],
+            sum(errors.values())
+        ),
+    }
+
+def print_report(results: Dict[str, Any]) -> None:
+    header = f"{'endpoint':<16}{'reqs':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'db/req':>8}"
+    print(header)
+    print('-' * len(header))
+    rows = list(results['endpoints'].items()) + [('total', results['total'])]
+    for name, r in rows:
+        trips = r.get('db_round_trips')
+        print(
+            f"{name:<16}{r['requests']:>8}{r['errors']:>8}{r['rps']:>9.1f}{r['p50_ms']:>9.2f}"
+            f"{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}"
+            f"{'-' if trips is None else f'{trips:.2f}':>8}"
+        )
+
+def regressions(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """What got worse than the baseline by more than tolerance, as readable lines"""
+    found = []
+    for name, current in results['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(name)
+        if not base or not base['requests']:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if current[key] > base[key] * (1 + tolerance):
+                found.append(f'{name}: {key} {base[key]} -> {current[key]}')
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            found.append(f"{name}: req/s {base['rps']} -> {current['rps']}")
+        if current['errors'] > base['errors']:
+            found.append(f"{name}: errors {base['errors']} -> {current['errors']}")
+        trips, base_trips = current.get('db_round_trips'), base.get('db_round_trips')
+        # Round trips barely vary between runs, any real increase is a new query
+        if trips is not None and base_trips is not None and trips > base_trips + 0.25:
+            found.append(f'{name}: db round trips {base_trips} -> {trips}')
+    return found
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=f"http://localhost:{os.getenv('PORT', 5001)}")
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL'), help='Database to sample targets from, defaults to DATABASE_URL')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds measured')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds run before measuring')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent connections')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Endpoint weights, default {DEFAULT_MIX}')
+    parser.add_argument('--review-rate', type=float, default=0.3, help='Share of submissions that also write a review')
+    parser.add_argument('--sample', type=int, default=50_000, help='Users and places sampled as targets')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--baseline', help='Results file to compare with, exits 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown against the baseline')
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error('Set DATABASE_URL or pass --dsn')
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        if found:
+            print('\nRegressions against the baseline:')
+            for line in found:
+                print(f'  {line}')
+            sys.exit(1)
+        print('\nNo regressions against the baseline')
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,113 @@ class Config:
     QUART_DEBUG = True
     QUART_AUTO_OPTIONS = True
     
+    # Read replicas, comma separated. Reads go to a replica at most REPLICA_MAX_LAG_SECONDS
+    # behind the primary; writers get a token that keeps their own reads on a replica
+    # that has replayed their writes, for READ_YOUR_WRITES_SECONDS
+    DATABASE_REPLICA_URLS = [
+        url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+    ]
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 2))
+    READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', 60))
+
+    # Connection pool. Set DB_STATEMENT_CACHE_SIZE=0 behind a transaction-mode pooler
+    # such as PgBouncer, which can't keep prepared statements across transactions
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 256))
+    DB_PREPARE_STATEMENTS = os.getenv('DB_PREPARE_STATEMENTS', 'true').lower() == 'true'
+    DB_MAX_QUERIES = int(os.getenv('DB_MAX_QUERIES', 50000))
+    DB_MAX_INACTIVE_LIFETIME = float(os.getenv('DB_MAX_INACTIVE_LIFETIME', 300))
+    DB_CONNECT_TIMEOUT = float(os.getenv('DB_CONNECT_TIMEOUT', 30))
+    DB_ACQUIRE_TIMEOUT = float(os.getenv('DB_ACQUIRE_TIMEOUT', 10))
+
+    # Observability: Prometheus metrics at /metrics, and statements slower than
+    # SLOW_QUERY_MS (0 disables) logged with the shape of their parameters
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_MAX_LENGTH = int(os.getenv('SLOW_QUERY_MAX_LENGTH', 1000))
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
     # Server
     PORT = int(os.getenv('PORT', 5001))
-    HOST = os.getenv('HOST', '0.0.0.0')
\ No newline at end of file
+    HOST = os.getenv('HOST', '0.0.0.0')
+    # Worker processes, each with its own event loop, caches and indexes. EVENT_LOOP is
+    # 'asyncio' or 'uvloop', which needs the uvloop package
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 1))
+    EVENT_LOOP = os.getenv('EVENT_LOOP', 'asyncio').lower()
+
+    # Cross-process invalidation: writes publish their changes to the in-memory state on
+    # a Postgres NOTIFY channel and every worker applies them. On by default with more
+    # than one worker, turn it on for several single-worker servers sharing a database
+    INVALIDATION_ENABLED = os.getenv(
+        'INVALIDATION_ENABLED', str(WEB_WORKERS > 1)
+    ).lower() == 'true'
+    INVALIDATION_CHANNEL = os.getenv('INVALIDATION_CHANNEL', 'app_invalidation')
+    INVALIDATION_KEEPALIVE_SECONDS = float(os.getenv('INVALIDATION_KEEPALIVE_SECONDS', 30))
+    INVALIDATION_MAX_BACKOFF = float(os.getenv('INVALIDATION_MAX_BACKOFF', 30))
+    INVALIDATION_SYNC_TIMEOUT = float(os.getenv('INVALIDATION_SYNC_TIMEOUT', 1))
+
+    # Ratings: each place's K factor falls with its own comparison count. With
+    # ELO_UNCERTAINTY, ratings move by the Glicko update of their rating deviations instead
+    ELO_UNCERTAINTY = os.getenv('ELO_UNCERTAINTY', 'false').lower() == 'true'
+
+    # Personal rankings: seconds a signed insertion session stays valid
+    RANKING_SESSION_SECONDS = int(os.getenv('RANKING_SESSION_SECONDS', 3600))
+
+    # Vote ingestion: 'sync' applies /process-matches inside the request, 'async' queues
+    # submissions for background workers that coalesce writes per place
+    INGEST_MODE = os.getenv('INGEST_MODE', 'sync')
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 4))
+    INGEST_MAX_BATCH = int(os.getenv('INGEST_MAX_BATCH', 200))
+    INGEST_MAX_DEPTH = int(os.getenv('INGEST_MAX_DEPTH', 10000))
+
+    # Feed: reviews are fanned out to followers' timelines on write, except for authors
+    # with more than FEED_FANOUT_LIMIT followers whose reviews are merged in on read
+    FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+    # Reviews copied into a follower's timeline when they follow someone
+    FEED_BACKFILL = int(os.getenv('FEED_BACKFILL', 50))
+    FEED_PAGE_SIZE = int(os.getenv('FEED_PAGE_SIZE', 20))
+    FEED_MAX_PAGE_SIZE = int(os.getenv('FEED_MAX_PAGE_SIZE', 100))
+
+    # Profile: size of the first page of each section returned by /profile
+    PROFILE_PAGE_SIZE = int(os.getenv('PROFILE_PAGE_SIZE', 20))
+    PROFILE_MAX_PAGE_SIZE = int(os.getenv('PROFILE_MAX_PAGE_SIZE', 100))
+
+    # Place detail: reviews per page, and rows fetched per round trip by the NDJSON export
+    PLACE_REVIEWS_PAGE_SIZE = int(os.getenv('PLACE_REVIEWS_PAGE_SIZE', 20))
+    PLACE_REVIEWS_MAX_PAGE_SIZE = int(os.getenv('PLACE_REVIEWS_MAX_PAGE_SIZE', 100))
+    EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', 500))
+
+    # Place creation: most places accepted by one /places/bulk request, and the Bloom
+    # filter of known Google place ids that answers lookups of unknown places
+    PLACES_BULK_MAX_SIZE = int(os.getenv('PLACES_BULK_MAX_SIZE', 1000))
+    PLACE_FILTER_ENABLED = os.getenv('PLACE_FILTER_ENABLED', 'true').lower() == 'true'
+    PLACE_FILTER_ERROR_RATE = float(os.getenv('PLACE_FILTER_ERROR_RATE', 0.01))
+    PLACE_FILTER_RELOAD_SECONDS = float(os.getenv('PLACE_FILTER_RELOAD_SECONDS', 300))
+
+    # Response cache for hot GET endpoints, invalidated by the writes that change them
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 2048))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_TTL = float(os.getenv('CACHE_TTL', 60))
+
+    # Leaderboard
+    RANKINGS_PAGE_SIZE = int(os.getenv('RANKINGS_PAGE_SIZE', 20))
+    RANKINGS_MAX_PAGE_SIZE = int(os.getenv('RANKINGS_MAX_PAGE_SIZE', 100))
+
+    # Nearby places: in-process grid index of place coordinates
+    GEO_CELL_SIZE = float(os.getenv('GEO_CELL_SIZE', 0.05))
+    # Reload the index periodically to pick up ratings written by other processes
+    GEO_RELOAD_SECONDS = float(os.getenv('GEO_RELOAD_SECONDS', 300))
+    NEARBY_RADIUS_KM = float(os.getenv('NEARBY_RADIUS_KM', 5))
+    NEARBY_MAX_RADIUS_KM = float(os.getenv('NEARBY_MAX_RADIUS_KM', 50))
+    NEARBY_MAX_BOX_DEGREES = float(os.getenv('NEARBY_MAX_BOX_DEGREES', 1))
+
+    # User search: in-memory username autocomplete, reloaded to pick up other processes' writes
+    SEARCH_RELOAD_SECONDS = float(os.getenv('SEARCH_RELOAD_SECONDS', 300))
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+
+    # Follow graph: pending follows folded into the in-memory CSR arrays past this size
+    GRAPH_COMPACT_THRESHOLD = int(os.getenv('GRAPH_COMPACT_THRESHOLD', 10000))
+    SUGGESTIONS_PAGE_SIZE = int(os.getenv('SUGGESTIONS_PAGE_SIZE', 10))
@@ -0,0 +1,47 @@
+-- The tables every later migration builds on, as the app uses them. Databases created
+-- before migrations were tracked already have them, and nothing here changes them.
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    username TEXT,
+    email TEXT,
+    clerk_id TEXT,
+    bio TEXT,
+    image_url TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS places (
+    id SERIAL PRIMARY KEY,
+    place_id TEXT,
+    name TEXT,
+    location TEXT,
+    image TEXT,
+    website TEXT,
+    formatted_address TEXT,
+    types TEXT,
+    avg_rating NUMERIC DEFAULT 0,
+    ranking TEXT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    place_id INTEGER REFERENCES places(id) ON DELETE CASCADE,
+    place_name TEXT,
+    username TEXT,
+    text_review TEXT,
+    rating NUMERIC,
+    elo_rating NUMERIC,
+    image TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS followers (
+    id SERIAL PRIMARY KEY,
+    follower INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    followee INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT NOW()
+);
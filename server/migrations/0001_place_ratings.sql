@@ -0,0 +1,19 @@
+-- Current ELO rating per place, kept in step by RatingService on every write
+CREATE TABLE IF NOT EXISTS place_ratings (
+    place_id INTEGER PRIMARY KEY REFERENCES places(id) ON DELETE CASCADE,
+    elo_rating DOUBLE PRECISION NOT NULL DEFAULT 1000,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Seed from the latest review of every place
+INSERT INTO place_ratings (place_id, elo_rating, created_at, updated_at)
+SELECT DISTINCT ON (place_id)
+    place_id,
+    elo_rating,
+    created_at,
+    COALESCE(updated_at, created_at)
+FROM reviews
+WHERE elo_rating IS NOT NULL
+ORDER BY place_id, id DESC
+ON CONFLICT (place_id) DO NOTHING;
@@ -0,0 +1,14 @@
+-- Running aggregates of normalized review ratings, updated by delta on every review write
+ALTER TABLE places
+    ADD COLUMN IF NOT EXISTS rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE places
+SET rating_sum = agg.rating_sum,
+    rating_count = agg.rating_count
+FROM (
+    SELECT place_id, SUM(rating) AS rating_sum, COUNT(rating) AS rating_count
+    FROM reviews
+    GROUP BY place_id
+) agg
+WHERE places.id = agg.place_id;
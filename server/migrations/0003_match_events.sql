@@ -0,0 +1,15 @@
+-- Append-only log of every comparison applied by /process-matches, in application order.
+-- Ties are stored expanded into their pairs, place_b is NULL for a single place vote
+-- against the baseline rating and outcome is the score of place_a.
+CREATE TABLE IF NOT EXISTS match_events (
+    id BIGSERIAL PRIMARY KEY,
+    place_a INTEGER NOT NULL,
+    place_b INTEGER,
+    outcome REAL NOT NULL,
+    n_ranked INTEGER NOT NULL,
+    user_id INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Replay streams each independent group of places by place_a in log order
+CREATE INDEX IF NOT EXISTS match_events_place_a_id_idx ON match_events (place_a, id);
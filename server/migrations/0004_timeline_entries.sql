@@ -0,0 +1,30 @@
+-- Home timeline of every user: one row per followee review, fanned out when the
+-- review is written. Authors with very large follower counts are not fanned out,
+-- their reviews are merged into followers' feeds at read time instead.
+CREATE TABLE IF NOT EXISTS timeline_entries (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    review_id INTEGER NOT NULL REFERENCES reviews(id) ON DELETE CASCADE,
+    author_id INTEGER NOT NULL,
+    activity_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, review_id)
+);
+
+-- Keyset pagination of a user's feed, newest first
+CREATE INDEX IF NOT EXISTS timeline_entries_feed_idx
+    ON timeline_entries (user_id, activity_at DESC, review_id DESC);
+
+-- Removing an author's entries on unfollow
+CREATE INDEX IF NOT EXISTS timeline_entries_author_idx
+    ON timeline_entries (user_id, author_id);
+
+-- Read-time merge of a large author's reviews into their followers' feeds
+CREATE INDEX IF NOT EXISTS reviews_user_activity_idx
+    ON reviews (user_id, (COALESCE(updated_at, created_at)) DESC, id DESC);
+
+-- Backfill from the current follow graph
+INSERT INTO timeline_entries (user_id, review_id, author_id, activity_at)
+SELECT f.follower, r.id, r.user_id, COALESCE(r.updated_at, r.created_at)
+FROM followers f
+JOIN reviews r ON r.user_id = f.followee
+WHERE COALESCE(r.updated_at, r.created_at) IS NOT NULL
+ON CONFLICT (user_id, review_id) DO NOTHING;
@@ -0,0 +1,8 @@
+-- Profile sections are read as independent, individually limited queries
+
+-- Followers and following, newest follow first
+CREATE INDEX IF NOT EXISTS followers_followee_id_idx ON followers (followee, id);
+CREATE INDEX IF NOT EXISTS followers_follower_id_idx ON followers (follower, id);
+
+-- A user's reviews in their personal ranking order
+CREATE INDEX IF NOT EXISTS reviews_user_elo_idx ON reviews (user_id, elo_rating, id);
@@ -0,0 +1,17 @@
+-- Numeric coordinates parsed from the "lat,lng" places.location string
+ALTER TABLE places
+    ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+UPDATE places
+SET latitude = split_part(location, ',', 1)::double precision,
+    longitude = split_part(location, ',', 2)::double precision
+WHERE latitude IS NULL
+  AND location ~ '^\s*-?[0-9]+(\.[0-9]+)?\s*,\s*-?[0-9]+(\.[0-9]+)?\s*$'
+  AND abs(split_part(location, ',', 1)::double precision) <= 90
+  AND abs(split_part(location, ',', 2)::double precision) <= 180;
+
+-- Bounding box lookups outside the in-process grid index
+CREATE INDEX IF NOT EXISTS places_latitude_longitude_idx
+    ON places (latitude, longitude)
+    WHERE latitude IS NOT NULL;
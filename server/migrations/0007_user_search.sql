@@ -0,0 +1,16 @@
+-- Username search: trigram index for substring matches, pattern index for prefixes
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS users_username_trgm_idx
+    ON users USING gin (lower(username) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS users_username_prefix_idx
+    ON users (lower(username) text_pattern_ops);
+
+-- Follower counters, maintained by /follow and /unfollow
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS follower_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS following_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE users
+SET follower_count = (SELECT COUNT(*) FROM followers WHERE followee = users.id),
+    following_count = (SELECT COUNT(*) FROM followers WHERE follower = users.id);
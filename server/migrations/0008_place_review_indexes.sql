@@ -0,0 +1,8 @@
+-- Reviews on a place's detail page are read as keyset pages
+
+-- Most recent first
+CREATE INDEX IF NOT EXISTS reviews_place_activity_idx
+    ON reviews (place_id, (COALESCE(updated_at, created_at)) DESC, id DESC);
+
+-- Highest rated first
+CREATE INDEX IF NOT EXISTS reviews_place_rating_idx ON reviews (place_id, rating DESC, id DESC);
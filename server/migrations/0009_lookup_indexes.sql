@@ -0,0 +1,9 @@
+-- Lookups by external id on every request: the signed-in user by Clerk id, and a
+-- place by Google place id. Partial, since rows without an id are never looked up
+-- by it and equality only matches non-null values.
+CREATE INDEX IF NOT EXISTS users_clerk_id_idx ON users (clerk_id) WHERE clerk_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS places_place_id_idx ON places (place_id) WHERE place_id IS NOT NULL;
+
+-- Whether one user follows another, checked by /follow and /unfollow. The indexes
+-- from 0005 only narrow it down to all of the follower's follows.
+CREATE INDEX IF NOT EXISTS followers_follower_followee_idx ON followers (follower, followee);
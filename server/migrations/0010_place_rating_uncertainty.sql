@@ -0,0 +1,24 @@
+-- How many comparisons each place's rating has absorbed and its Glicko rating deviation,
+-- which set how far the place's next comparison moves it
+ALTER TABLE place_ratings
+    ADD COLUMN IF NOT EXISTS match_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_deviation DOUBLE PRECISION NOT NULL DEFAULT 350;
+
+-- Counts from the match event log. Deviations are estimated as if every comparison was
+-- against an equally rated, settled place, 1 / sqrt(1 / 350^2 + n q^2 / 4) with
+-- q = ln(10) / 400, down to 40. `quart replay-ratings` recomputes both exactly.
+UPDATE place_ratings
+SET match_count = counts.match_count,
+    rating_deviation = GREATEST(
+        40, 1 / SQRT(1 / 350.0 ^ 2 + counts.match_count * (LN(10) / 400) ^ 2 / 4)
+    )
+FROM (
+    SELECT place_id, COUNT(*) AS match_count
+    FROM (
+        SELECT place_a AS place_id FROM match_events
+        UNION ALL
+        SELECT place_b FROM match_events WHERE place_b IS NOT NULL
+    ) sides
+    GROUP BY place_id
+) counts
+WHERE place_ratings.place_id = counts.place_id;
@@ -0,0 +1,27 @@
+-- Every user's own ordered list of the places they reviewed, best first. Positions are
+-- fractional so a place is inserted between two others by writing its row alone.
+CREATE TABLE IF NOT EXISTS personal_rankings (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    place_id INTEGER NOT NULL REFERENCES places(id) ON DELETE CASCADE,
+    position DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, place_id)
+);
+
+-- Insertion sessions pick the middle of a range of a user's list
+CREATE INDEX IF NOT EXISTS personal_rankings_user_position_idx
+    ON personal_rankings (user_id, position);
+
+-- Seed from reviews, ordered by the rating snapshotted on each user's latest review of a place
+INSERT INTO personal_rankings (user_id, place_id, position)
+SELECT user_id, place_id, ROW_NUMBER() OVER (
+    PARTITION BY user_id ORDER BY elo_rating DESC NULLS LAST, id
+)
+FROM (
+    SELECT DISTINCT ON (user_id, place_id) id, user_id, place_id, elo_rating
+    FROM reviews
+    WHERE user_id IS NOT NULL AND place_id IS NOT NULL
+    ORDER BY user_id, place_id, id DESC
+) latest
+ON CONFLICT (user_id, place_id) DO NOTHING;
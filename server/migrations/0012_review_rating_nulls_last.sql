@@ -0,0 +1,4 @@
+-- Highest rated reviews of a place first, unrated ones last
+DROP INDEX IF EXISTS reviews_place_rating_idx;
+CREATE INDEX IF NOT EXISTS reviews_place_rating_idx
+    ON reviews (place_id, rating DESC NULLS LAST, id DESC);
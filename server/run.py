@@ -1,13 +1,47 @@
 from app import create_app
+from config import Config
 import asyncio
+import logging
 import hypercorn.asyncio
+import hypercorn.run
+
+logger = logging.getLogger(__name__)
 
 app = create_app()
 
-async def main():
+def event_loop() -> str:
+    """The configured event loop, falling back to asyncio when uvloop isn't installed"""
+    if Config.EVENT_LOOP == 'uvloop':
+        try:
+            import uvloop  # noqa: F401
+        except ImportError:
+            logger.warning("EVENT_LOOP=uvloop but uvloop is not installed, using asyncio")
+            return 'asyncio'
+        return 'uvloop'
+    return 'asyncio'
+
+def hypercorn_config() -> hypercorn.Config:
     config = hypercorn.Config()
-    config.bind = ["0.0.0.0:5001"]
-    await hypercorn.asyncio.serve(app, config)
+    config.bind = [f"{Config.HOST}:{Config.PORT}"]
+    config.workers = Config.WEB_WORKERS
+    config.worker_class = event_loop()
+    # Each worker process imports the app from here
+    config.application_path = 'run:app'
+    return config
+
+async def main():
+    await hypercorn.asyncio.serve(app, hypercorn_config())
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    config = hypercorn_config()
+    if config.workers > 1:
+        # Workers share the listening socket, each on its own event loop, and keep
+        # their caches and indexes in step over the invalidation bus
+        if not Config.INVALIDATION_ENABLED:
+            logger.warning("Running several workers with INVALIDATION_ENABLED=false, their caches will go stale")
+        hypercorn.run.run(config)
+    else:
+        if config.worker_class == 'uvloop':
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(main())